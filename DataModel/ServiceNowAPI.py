@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 
 class Task(BaseModel):
@@ -86,3 +86,20 @@ class Task(BaseModel):
 
 class APIResponse(BaseModel):
     result: List[Task]
+
+class LeanTask(BaseModel):
+    """
+    The task fields the engine reads (task_store.TASK_FIELDS). Used to
+    validate request bodies without building a full Task; the rest of the
+    task is passed through untouched as raw JSON.
+    """
+    model_config = ConfigDict(extra="ignore")
+
+    sys_id: Optional[str]
+    number: str
+    sys_class_name: str
+    short_description: str
+    description: Optional[str] = None
+
+class LeanAPIResponse(BaseModel):
+    result: List[LeanTask]
@@ -1,9 +1,16 @@
-const inputs = JSON.parse(process.argv[2]);
+// script-io: 1
+const fs = require("fs");
+
+const inputs = JSON.parse(fs.readFileSync(0, "utf8"));
 
 function main(inputs) {
     // Example operation: return inputs as outputs
     return inputs;
 }
 
-const outputs = main(inputs);
-console.log(JSON.stringify(outputs));
+const outputs = JSON.stringify(main(inputs));
+if (process.env.SCRIPT_IO_RESULT_FD) {
+    fs.writeSync(Number(process.env.SCRIPT_IO_RESULT_FD), outputs);
+} else {
+    console.log(outputs);
+}
@@ -1,3 +1,5 @@
+# script-io: 1
+import os
 import sys
 import json
 
@@ -6,6 +8,11 @@ def main(inputs):
     return inputs
 
 if __name__ == "__main__":
-    inputs = json.loads(sys.argv[1])
-    outputs = main(inputs)
-    print(json.dumps(outputs))
+    inputs = json.load(sys.stdin)
+    outputs = json.dumps(main(inputs))
+    result_fd = os.environ.get("SCRIPT_IO_RESULT_FD")
+    if result_fd:
+        with os.fdopen(int(result_fd), "w") as result_file:
+            result_file.write(outputs)
+    else:
+        print(outputs)
@@ -1,4 +1,6 @@
+# script-io: 1
 import requests
+import os
 import sys
 import json
 
@@ -9,7 +11,7 @@ outputs = {
     "ErrorMessage": ""
 }
 
-inputs = json.loads(sys.argv[1])
+inputs = json.load(sys.stdin)
 
 url = 'https://hexawaretechnologiesincdemo8.service-now.com/api/now/table/sys_user_group'
 
@@ -34,4 +36,9 @@ else:
 
 result = json.dumps(outputs)
 
-print(result)
\ No newline at end of file
+result_fd = os.environ.get("SCRIPT_IO_RESULT_FD")
+if result_fd:
+    with os.fdopen(int(result_fd), "w") as result_file:
+        result_file.write(result)
+else:
+    print(result)
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Memoized results of cacheable actions (flow.yml `cacheable`).
+
+Results are keyed by the script's content hash and the action's input
+variables, so editing a script or asking about a different owner/user is
+always a miss. A result is cached only if the script exited 0 and its
+own JSON output reports "Status": "Success"; check scripts that catch an
+AD error exit 0 but report "Error". Cached results live in a bounded
+in-memory LRU for the action's TTL and, when ACTION_CACHE_DB_PATH is set,
+in a SQLite tier that survives restarts and is shared by workers using the
+same file. Concurrent misses on one key wait for a single run instead of
+each running the script.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiosqlite
+from dotenv import load_dotenv
+
+from checkpoint_maintenance import apply_pragmas
+from metrics import ACTION_CACHE_REQUESTS
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+ACTION_CACHE_ENABLED = os.getenv("ACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ACTION_CACHE_SIZE = int(os.getenv("ACTION_CACHE_SIZE", "4096"))
+# Empty keeps the cache in memory only.
+ACTION_CACHE_DB_PATH = os.getenv("ACTION_CACHE_DB_PATH", "")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS action_cache (
+    cache_key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def action_cache_key(script_sha256: str, inputs: dict, names: Optional[tuple] = None) -> str:
+    """sha256 over the script hash and the (selected) input variables."""
+    if names is not None:
+        inputs = {name: inputs.get(name) for name in names}
+    text = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{script_sha256}\0{text}".encode()).hexdigest()
+
+
+def reports_success(result: dict) -> bool:
+    """
+    True if run_script succeeded and the script's JSON output (OutputMessage,
+    read the way flow_logic.parse_powershell_output reads it) has
+    Status == "Success".
+    """
+    if result.get("Status") != "Success":
+        return False
+    try:
+        output = json.loads(result.get("OutputMessage") or "{}")
+        if isinstance(output, str):
+            output = json.loads(output)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(output, dict) and output.get("Status") == "Success"
+
+
+# -----------------------------------------------------------------------
+# Action Cache
+# -----------------------------------------------------------------------
+class ActionCache:
+    """TTL'd LRU of run_script results with an optional SQLite tier."""
+
+    def __init__(self, size: int = ACTION_CACHE_SIZE, db_path: str = ACTION_CACHE_DB_PATH, enabled: bool = ACTION_CACHE_ENABLED):
+        self.size = size
+        self.db_path = db_path
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, result)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._conn: Optional[aiosqlite.Connection] = None
+
+    async def open(self) -> None:
+        if self._conn is not None or not (self.enabled and self.db_path):
+            return
+        self._conn = await aiosqlite.connect(self.db_path, check_same_thread=False)
+        await apply_pragmas(self._conn)
+        await self._conn.execute(SCHEMA)
+        await self._conn.execute("DELETE FROM action_cache WHERE expires_at < ?", (time.time(),))
+        await self._conn.commit()
+        logging.info(f"Action cache persisted at {self.db_path}")
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _remember(self, key: str, expires_at: float, result: dict) -> None:
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[tuple]:
+        """(result, tier) for a live entry, else None."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1], "memory"
+            del self._entries[key]
+        if self._conn is not None:
+            rows = await self._conn.execute_fetchall(
+                "SELECT result, expires_at FROM action_cache WHERE cache_key = ? AND expires_at > ?", (key, now)
+            )
+            if rows:
+                result = json.loads(rows[0][0])
+                self._remember(key, rows[0][1], result)
+                return result, "sqlite"
+        return None
+
+    async def put(self, key: str, result: dict, ttl: float) -> None:
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, result)
+        if self._conn is not None:
+            await self._conn.execute(
+                "INSERT OR REPLACE INTO action_cache (cache_key, result, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result, default=str), expires_at),
+            )
+            await self._conn.commit()
+
+    async def get_or_run(self, key: str, ttl: float, run: Callable[[], Awaitable[dict]], **labels) -> dict:
+        """
+        Return the cached result for `key`, or run the action once (callers
+        racing on the same key share that run). Only results for which
+        reports_success() holds are stored. Cached results carry Stats.Cached.
+        """
+        if not self.enabled:
+            return await run()
+        hit = await self.get(key)
+        if hit is not None:
+            result, tier = hit
+            ACTION_CACHE_REQUESTS.inc(result=f"hit_{tier}", **labels)
+            return {**result, "Stats": {**result.get("Stats", {}), "Cached": tier}}
+
+        waiting = self._inflight.get(key)
+        if waiting is not None:
+            ACTION_CACHE_REQUESTS.inc(result="coalesced", **labels)
+            try:
+                result = await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                if not waiting.cancelled():
+                    raise
+                # The run we waited on was cancelled, not us: run it ourselves.
+                return await self.get_or_run(key, ttl, run, **labels)
+            return {**result, "Stats": {**result.get("Stats", {}), "Cached": "inflight"}}
+
+        ACTION_CACHE_REQUESTS.inc(result="miss", **labels)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run()
+            if reports_success(result):
+                await self.put(key, result, ttl)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; do not warn about an unretrieved exception.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "inflight": len(self._inflight), "persistent": self._conn is not None}
+
+
+_cache: Optional[ActionCache] = None
+
+
+def get_action_cache() -> ActionCache:
+    """Return the process-wide ActionCache. Call `await cache.open()` at startup for the SQLite tier."""
+    global _cache
+    if _cache is None:
+        _cache = ActionCache()
+    return _cache
@@ -0,0 +1,67 @@
+"""
+Checkpoint-write throughput of the SQLite checkpointer by shard count.
+
+Many concurrent graph threads each write a sequence of checkpoints (plus
+their pending writes, as LangGraph does after every superstep) straight
+to the saver, so the numbers isolate the storage path from the graph.
+
+Usage:
+    python benchmarks/bench_checkpointer.py [--threads 64] [--steps 20]
+        [--shards 1 2 4 8] [--synchronous NORMAL] [--payload-kb 4]
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(shards: int, threads: int, steps: int, payload_kb: int, workdir: str) -> float:
+    from langgraph.checkpoint.base import empty_checkpoint
+    from sharded_checkpointer import open_checkpointer
+
+    saver = await open_checkpointer(os.path.join(workdir, f"bench-{shards}.sqlite"), shards)
+    payload = "x" * (payload_kb * 1024)
+
+    async def one_thread(index: int) -> None:
+        config = {"configurable": {"thread_id": f"task_BENCH{index:05d}", "checkpoint_ns": ""}}
+        for step in range(steps):
+            checkpoint = empty_checkpoint()
+            checkpoint["id"] = str(uuid.uuid4())
+            checkpoint["channel_values"] = {"task_response": payload, "action_index": step}
+            config = await saver.aput(config, checkpoint, {"source": "loop", "step": step}, {})
+            await saver.aput_writes(config, [("completed_actions", [f"step {step}"]), ("worknotes", "ok")], str(uuid.uuid4()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_thread(i) for i in range(threads)))
+    elapsed = time.perf_counter() - start
+
+    for shard in getattr(saver, "shards", [saver]):
+        await shard.conn.close()
+    return threads * steps / elapsed
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = None
+        for shards in args.shards:
+            rate = await run(shards, args.threads, args.steps, args.payload_kb, workdir)
+            baseline = baseline or rate
+            print(f"shards={shards:<3} {rate:10.0f} checkpoints/s  ({rate / baseline:4.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--payload-kb", type=int, default=4)
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous for every shard (FULL = fsync per commit).")
+    args = parser.parse_args()
+    # Read by checkpoint_maintenance at import time.
+    os.environ["CHECKPOINT_SYNCHRONOUS"] = args.synchronous
+    asyncio.run(main(args))
@@ -0,0 +1,78 @@
+"""
+Per-ticket flow lookup cost: re-parsing flow_details.yml (old behaviour)
+versus the in-memory FlowRegistry index.
+
+Usage:
+    python benchmarks/bench_flow_registry.py [--sizes 1000 100000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flow_registry import FlowRegistry
+
+
+def write_flow_file(path: str, count: int) -> None:
+    flows = [
+        {
+            "short_description": f"Synthetic Flow {i}",
+            "flow_name": f"Flow{i}",
+            "reassignment_group": f"{i:032x}",
+        }
+        for i in range(count)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump({"flows": flows}, f, sort_keys=False)
+
+
+def parse_per_ticket(path: str, key: str) -> dict:
+    """What initialize_flow_state used to do for every ticket."""
+    with open(path, "r", encoding="utf-8") as f:
+        yaml_data = yaml.safe_load(f)
+        flow_map = {
+            item["short_description"]: {
+                "flow_name": item["flow_name"],
+                "reassignment_group": item["reassignment_group"],
+            }
+            for item in yaml_data.get("flows", [])
+        }
+    return flow_map[key]
+
+
+def time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def run(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "flow_details.yml")
+        write_flow_file(path, count)
+        key = f"Synthetic Flow {count - 1}"
+
+        parse_iterations = max(1, 10_000 // count)
+        before = time_per_call(lambda: parse_per_ticket(path, key), parse_iterations)
+
+        registry = FlowRegistry(path, poll_interval=0)
+        registry.load()
+        after = time_per_call(lambda: registry.lookup(key), 1_000_000)
+
+        print(
+            f"{count:>8} flows | yaml parse per ticket: {before * 1e3:10.3f} ms"
+            f" | registry lookup: {after * 1e9:8.1f} ns | speedup: {before / after:,.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size)
@@ -0,0 +1,76 @@
+"""
+Per-task cost of turning a POST /api/task body into the task_response dict:
+json.loads + APIResponse validation + model_dump() (old path) versus
+fast_json.loads + LeanAPIResponse validation of the decoded dict (new
+path), and json.dumps versus fast_json.dumps for the response.
+
+Usage:
+    python benchmarks/bench_ingest.py [--repeat 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json
+from DataModel.ServiceNowAPI import APIResponse, LeanAPIResponse, Task
+
+
+def synthesize_body(count: int) -> bytes:
+    tasks = []
+    for index in range(count):
+        task = {name: "" for name in Task.model_fields}
+        task.update(
+            sys_id=f"bench{index:08d}",
+            number=f"SCTASK{index:07d}",
+            short_description="Create a security group",
+            description="Synthesized by benchmarks/bench_ingest.py",
+            state="1",
+            sys_class_name="sc_task",
+        )
+        tasks.append(task)
+    return json.dumps({"result": tasks}).encode()
+
+
+def old_path(body: bytes) -> dict:
+    return APIResponse.model_validate(json.loads(body)).model_dump()
+
+
+def lean_path(body: bytes) -> dict:
+    payload = fast_json.loads(body)
+    LeanAPIResponse.model_validate(payload)
+    return payload
+
+
+def measure(label: str, function, argument, count: int, repeat: int) -> None:
+    function(argument)
+    best = min(_time_once(function, argument) for _ in range(repeat))
+    print(f"{label:<28} {count:>6} tasks {best / count * 1e6:10.2f} us/task")
+
+
+def _time_once(function, argument) -> float:
+    start = time.perf_counter()
+    function(argument)
+    return time.perf_counter() - start
+
+
+def main(repeat: int) -> None:
+    codec = "orjson" if fast_json.orjson is not None else "json"
+    print(f"fast_json codec: {codec}")
+    for count in (1, 100, 10000):
+        body = synthesize_body(count)
+        measure("parse: old path", old_path, body, count, repeat)
+        measure("parse: lean path", lean_path, body, count, repeat)
+        payload = json.loads(body)
+        measure("respond: json.dumps", lambda p: json.dumps(p).encode(), payload, count, repeat)
+        measure("respond: fast_json.dumps", fast_json.dumps, payload, count, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.repeat)
@@ -0,0 +1,79 @@
+"""
+Per-action overhead of .py actions: spawning `python <script> <json>` for
+every call versus the PythonActionExecutor (process pool and in-loop).
+
+Each action imports `requests` (like the ServiceNow update action) and
+returns its inputs, so the numbers are pure dispatch overhead.
+
+Usage:
+    python benchmarks/bench_python_executor.py [--calls 50]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_runner import run_script
+from python_executor import get_python_executor
+
+SYNC_ACTION = '''
+import sys
+import json
+import requests
+
+def main(inputs):
+    return {"Status": "Success", "OutputMessage": "ok", **inputs}
+
+if __name__ == "__main__":
+    print(json.dumps(main(json.loads(sys.argv[1]))))
+'''
+
+ASYNC_ACTION = '''
+import requests
+
+TRUSTED = True
+
+async def main(inputs):
+    return {"Status": "Success", "OutputMessage": "ok", **inputs}
+'''
+
+
+async def measure(label: str, path: str, calls: int) -> None:
+    inputs = {"uniquegroupname": "SG-Benchmark"}
+    # Warm up once so pool start-up and first import are not counted per call.
+    result = await run_script(path, inputs, {})
+    assert result["Status"] == "Success", result
+    start = time.perf_counter()
+    for _ in range(calls):
+        await run_script(path, inputs, {})
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / calls * 1e3:9.2f} ms/action")
+
+
+async def main(calls: int) -> None:
+    executor = get_python_executor()
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_path = os.path.join(tmp, "sync_action.py")
+        async_path = os.path.join(tmp, "async_action.py")
+        with open(sync_path, "w") as f:
+            f.write(SYNC_ACTION)
+        with open(async_path, "w") as f:
+            f.write(ASYNC_ACTION)
+
+        executor.enabled = False
+        await measure("subprocess spawn (old path)", sync_path, calls)
+        executor.enabled = True
+        await measure("executor: process pool", sync_path, calls)
+        await measure("executor: in-loop (trusted)", async_path, calls)
+        await executor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
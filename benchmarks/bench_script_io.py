@@ -0,0 +1,74 @@
+"""
+Per-step cost on the service side of handing a ticket to a .ps1 action:
+the old string-interpolated header / pool request that embedded the whole
+ticket JSON in every step, versus the script_io protocol that writes the
+ticket to a task file once per payload and sends only the path and the
+step's inputs.
+
+Usage:
+    python benchmarks/bench_script_io.py [--steps 1000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_io import POWERSHELL_HEADER, PROTOCOL_VERSION, TaskFileStore
+
+INPUTS = {"uniquegroupname": "SG-Benchmark", "OwnerEmail": "owner@example.com", "Userstobeadded": "a@example.com"}
+
+
+def synthesize_task_json(size: int) -> str:
+    task = {"number": "SCTASK0000001", "short_description": "Create a security group", "description": "x" * size}
+    return json.dumps({"result": [task]})
+
+
+def old_step(task_json: str, script: str) -> int:
+    header = (
+        f"$jsonObject = '{task_json}' | ConvertFrom-Json; "
+        f"$SCTASK_RESPONSE = $jsonObject.result; "
+        f"$ADDITIONAL_VARIABLES = '{json.dumps(INPUTS)}' | ConvertFrom-Json; "
+    )
+    command = header + script
+    request = json.dumps({"op": "run", "script": script, "task_response": task_json, "inputs": json.dumps(INPUTS)})
+    return len(command) + len(request)
+
+
+def new_step(files: TaskFileStore, task_json: str, task_ref: str, script: str) -> int:
+    task_file = files.path_for(task_json, task_ref)
+    inputs_json = json.dumps(INPUTS)
+    command = POWERSHELL_HEADER + script
+    request = json.dumps({"op": "run", "v": PROTOCOL_VERSION, "script": script, "task_file": task_file, "inputs": INPUTS})
+    return len(command) + len(inputs_json) + len(request)
+
+
+def main(steps: int) -> None:
+    script = "Write-Output 'ok'\n" * 20
+    files = TaskFileStore()
+    try:
+        for size in (1_000, 100_000, 1_000_000):
+            task_json = synthesize_task_json(size)
+            task_ref = f"bench{size}"
+            for label, step in (
+                ("old: embedded ticket", lambda: old_step(task_json, script)),
+                ("new: task file + stdin", lambda: new_step(files, task_json, task_ref, script)),
+            ):
+                sent = step()
+                start = time.perf_counter()
+                for _ in range(steps):
+                    step()
+                elapsed = time.perf_counter() - start
+                print(f"{label:<24} ticket {size:>9} B {elapsed / steps * 1e6:10.2f} us/step {sent:>9} B/step")
+        print(f"task files written: {files.writes}")
+    finally:
+        files.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.steps)
@@ -0,0 +1,96 @@
+"""
+ServiceNow PUT cost: a new httpx.AsyncClient per call (old behaviour)
+versus the shared, pooled ServiceNowClient, against a local Table API stub.
+
+The stub speaks plain HTTP/1.1 with keep-alive, so the numbers exclude TLS;
+against a real instance the per-call handshake cost is considerably higher.
+
+Usage:
+    python benchmarks/bench_servicenow_client.py [--calls 2000] [--concurrency 20]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicenow_client import ServiceNowClient
+
+RESPONSE_BODY = b'{"result": {}}'
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: " + str(len(RESPONSE_BODY)).encode() + b"\r\n"
+    b"\r\n" + RESPONSE_BODY
+)
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, stats: dict) -> None:
+    stats["connections"] += 1
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_batch(label: str, put, calls: int, concurrency: int, stats: dict) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    stats["connections"] = 0
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            resp = await put(i)
+            assert resp.status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<28} {calls / elapsed:10.0f} req/s | {elapsed / calls * 1e3:7.3f} ms/req"
+        f" | TCP connections opened: {stats['connections']}"
+    )
+
+
+async def main(calls: int, concurrency: int) -> None:
+    stats = {"connections": 0}
+    server = await asyncio.start_server(lambda r, w: handle_connection(r, w, stats), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    url = f"{base_url}/api/now/table/sc_task/abc123"
+
+    async def per_call_client(i: int) -> httpx.Response:
+        async with httpx.AsyncClient() as client:
+            return await client.put(url, auth=("user", "pwd"), json={"work_notes": f"note {i}"})
+
+    shared = ServiceNowClient(base_url=base_url, auth=("user", "pwd"), max_connections=concurrency)
+
+    async def shared_client(i: int) -> httpx.Response:
+        return await shared.update_record("sc_task", "abc123", {"work_notes": f"note {i}"})
+
+    async with server:
+        await run_batch("new AsyncClient per call", per_call_client, calls, concurrency, stats)
+        await run_batch("shared ServiceNowClient", shared_client, calls, concurrency, stats)
+        await shared.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency))
@@ -0,0 +1,401 @@
+"""
+End-to-end load generator: replays APIResponse payloads against main.app
+and reports throughput, per-ticket latency, per-node timing and event-loop lag.
+
+Payloads come from a JSON-lines file (one APIResponse per line; lines
+without a "result" list are ignored) or, when none are found, are
+synthesized from the Task model. Each task is posted to POST /api/task
+as its own ticket through an in-process ASGI transport.
+
+Everything external is stubbed locally:
+  - ServiceNow is an HTTP/1.1 stub on its own thread (--sn-latency).
+  - Every short_description is routed to a generated flow of --steps
+    actions, each sleeping --script-latency seconds. --script-kind picks
+    how they run: "module" (main(inputs) via the Python executor),
+    "spawn" (a legacy script per subprocess) or "powershell" (.ps1 via
+    benchmarks/stub_powershell_worker.py, pooled when --ps-pool > 0).
+
+Arrivals are open-loop at --rate tickets/s (0 = as fast as --concurrency
+allows) and latency is measured from the scheduled arrival, so queueing
+behind the concurrency cap is included.
+
+Usage:
+    python benchmarks/load_replay.py [--source requests.jsonl] [--tickets 200]
+        [--rate 20] [--concurrency 16] [--output results.json] [--compare old.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUB_FLOW = "LoadReplayFlow"
+STUB_POWERSHELL = os.path.join(ROOT, "benchmarks", "stub_powershell_worker.py")
+
+MODULE_ACTION = '''
+import time
+
+def main(inputs):
+    time.sleep({latency})
+    return {{"Status": "Success", "OutputMessage": "step {index} ok", "step_{index}": {index}}}
+'''
+
+SPAWN_ACTION = '''
+import sys
+import json
+import time
+
+time.sleep({latency})
+print(json.dumps({{"Status": "Success", "OutputMessage": "step {index} ok", "step_{index}": {index}}}))
+'''
+
+
+# -----------------------------------------------------------------------
+# Payloads
+# -----------------------------------------------------------------------
+def load_tasks(source: str) -> list:
+    """Every task of every APIResponse line in `source` (missing file -> [])."""
+    tasks = []
+    if not source or not os.path.exists(source):
+        return tasks
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(payload, dict) and isinstance(payload.get("result"), list):
+                tasks.extend(t for t in payload["result"] if isinstance(t, dict) and t.get("number"))
+    return tasks
+
+
+def synthesize_task(index: int) -> dict:
+    from DataModel.ServiceNowAPI import Task
+    task = {name: "" for name in Task.model_fields}
+    task.update(
+        sys_id=f"loadreplay{index:08d}",
+        number=f"SCTASK{index:07d}",
+        short_description="Load replay ticket",
+        description="Synthesized by benchmarks/load_replay.py",
+        state="1",
+        sys_class_name="sc_task",
+    )
+    return task
+
+
+def build_tickets(tasks: list, count: int, run_id: str) -> list:
+    """`count` single-task APIResponse payloads, cycling over `tasks` with unique numbers."""
+    tickets = []
+    for i in range(count):
+        task = dict(tasks[i % len(tasks)]) if tasks else synthesize_task(i)
+        task["number"] = f"{task['number']}-{run_id}-{i}"
+        tickets.append({"result": [task]})
+    return tickets
+
+
+# -----------------------------------------------------------------------
+# Stubs
+# -----------------------------------------------------------------------
+def start_servicenow_stub(latency: float) -> tuple:
+    """Table API stub on a background thread. Returns (base_url, stats)."""
+    body = b'{"result": {}}'
+    response = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+    stats = {"requests": 0}
+    ready = threading.Event()
+    address = []
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                stats["requests"] += 1
+                if latency:
+                    await asyncio.sleep(latency)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        address.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{address[0]}", stats
+
+
+def write_stub_flow(workdir: str, short_descriptions: set, steps: int, kind: str, latency: float) -> None:
+    flow_dir = os.path.join(workdir, "UseCases", STUB_FLOW)
+    os.makedirs(flow_dir)
+    for index in range(1, steps + 1):
+        if kind == "powershell":
+            name, text = f"{index} - step.ps1", f"Write-Output 'step {index}'\n"
+        else:
+            template = MODULE_ACTION if kind == "module" else SPAWN_ACTION
+            name, text = f"{index} - step.py", template.format(index=index, latency=latency)
+        with open(os.path.join(flow_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    with open(os.path.join(workdir, "flow_details.yml"), "w", encoding="utf-8") as f:
+        f.write("flows:\n")
+        for description in sorted(short_descriptions):
+            f.write(f"  - short_description: {json.dumps(description)}\n")
+            f.write(f"    flow_name: \"{STUB_FLOW}\"\n")
+            f.write("    reassignment_group: \"load-replay\"\n")
+
+
+def configure_environment(args, workdir: str, servicenow_url: str) -> None:
+    """Point every module at the stubs. Must run before main/flow_logic are imported."""
+    os.environ.update({
+        "DATABASE_PATH": os.path.join(workdir, "checkpoints.sqlite"),
+        "FLOW_DETAILS_PATH": os.path.join(workdir, "flow_details.yml"),
+        "USE_CASES_DIR": os.path.join(workdir, "UseCases"),
+        "SERVICENOW_ENDPOINT": servicenow_url,
+        "SERVICENOW_USER": "load",
+        "SERVICENOW_PWD": "replay",
+        "PYTHON_EXECUTOR_ENABLED": "true" if args.script_kind == "module" else "false",
+    })
+    if args.script_kind == "powershell":
+        os.environ.update({
+            # POWERSHELL_EXECUTABLE is a single path (the stub's shebang picks the interpreter);
+            # POWERSHELL_POOL_COMMAND is a full command line.
+            "POWERSHELL_EXECUTABLE": STUB_POWERSHELL,
+            "POWERSHELL_POOL_COMMAND": f"{sys.executable} {STUB_POWERSHELL}",
+            "POWERSHELL_POOL_SIZE": str(args.ps_pool),
+            "STUB_STARTUP_SECONDS": str(args.ps_startup),
+            "STUB_LATENCY_SECONDS": str(args.script_latency),
+        })
+
+
+# -----------------------------------------------------------------------
+# Measurement
+# -----------------------------------------------------------------------
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a fixed sleep."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def make_node_timer(timings: dict):
+    """LangGraph callback handler recording wall time per graph node."""
+    from langchain_core.callbacks import AsyncCallbackHandler
+
+    class NodeTimer(AsyncCallbackHandler):
+        def __init__(self):
+            self._started = {}
+
+        async def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node and kwargs.get("name") == node:
+                self._started[run_id] = (node, time.perf_counter())
+
+        async def on_chain_end(self, outputs, *, run_id, **kwargs):
+            started = self._started.pop(run_id, None)
+            if started:
+                timings.setdefault(started[0], []).append(time.perf_counter() - started[1])
+
+        async def on_chain_error(self, error, *, run_id, **kwargs):
+            await self.on_chain_end(None, run_id=run_id)
+
+    return NodeTimer()
+
+
+# -----------------------------------------------------------------------
+# Run
+# -----------------------------------------------------------------------
+async def replay(args, tickets: list) -> dict:
+    import httpx
+    import main as service
+
+    node_timings = {}
+    timer = make_node_timer(node_timings)
+
+    run_flow = service.run_flow
+
+    async def timed_run_flow(thread_id: str, task_response: dict, **kwargs) -> dict:
+        return await run_flow(thread_id, task_response, callbacks=[timer], **kwargs)
+
+    # The endpoint looks run_flow up at call time, so this adds the node timer
+    # without touching the service code.
+    service.run_flow = timed_run_flow
+    await service.startup_event()
+    logging.getLogger().setLevel(args.log_level)
+
+    monitor = LoopLagMonitor()
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies, service_times, failures = [], [], []
+    transport = httpx.ASGITransport(app=service.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://load-replay", timeout=None)
+
+    async def fire(index: int, payload: dict, arrival: float) -> None:
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with slots:
+            sent_at = time.perf_counter()
+            try:
+                response = await client.post("/api/task", json=payload)
+                ok = response.status_code == 200 and not response.json().get("error_occurred")
+                if not ok:
+                    failures.append({"ticket": index, "status_code": response.status_code, "body": response.text[:300]})
+            except Exception as e:
+                failures.append({"ticket": index, "error": f"{type(e).__name__}: {e}"})
+            done_at = time.perf_counter()
+        latencies.append(done_at - arrival)
+        service_times.append(done_at - sent_at)
+
+    monitor.start()
+    started_at = time.perf_counter()
+    spacing = 1.0 / args.rate if args.rate > 0 else 0.0
+    await asyncio.gather(*(fire(i, t, started_at + i * spacing) for i, t in enumerate(tickets)))
+    elapsed = time.perf_counter() - started_at
+    await monitor.stop()
+
+    await client.aclose()
+    await service.shutdown_event()
+
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "tickets": len(tickets),
+        "failed": len(failures),
+        "throughput_per_second": round(len(tickets) / elapsed, 2),
+        "latency_seconds": percentiles(latencies),
+        "service_time_seconds": percentiles(service_times),
+        "node_seconds": {node: percentiles(values) for node, values in sorted(node_timings.items())},
+        "loop_lag_seconds": percentiles(monitor.samples),
+        "failures": failures[:20],
+    }
+
+
+def print_report(results: dict, baseline: dict = None) -> None:
+    def delta(path: list, value: float) -> str:
+        if baseline is None:
+            return ""
+        old = baseline
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else {}
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f"  ({(value - old) / old * 100:+.1f}% vs baseline)"
+
+    print(f"tickets: {results['tickets']}  failed: {results['failed']}  elapsed: {results['elapsed_seconds']}s")
+    print(f"throughput: {results['throughput_per_second']} tickets/s" + delta(["throughput_per_second"], results["throughput_per_second"]))
+    for key in ("latency_seconds", "service_time_seconds", "loop_lag_seconds"):
+        stats = results[key]
+        if stats["count"]:
+            print(f"{key:<22} p50 {stats['p50']:8.4f}  p95 {stats['p95']:8.4f}  p99 {stats['p99']:8.4f}  max {stats['max']:8.4f}"
+                  + delta([key, "p95"], stats["p95"]))
+    print("per node (seconds):")
+    for node, stats in results["node_seconds"].items():
+        print(f"  {node:<36} n={stats['count']:<6} mean {stats['mean']:8.4f}  p95 {stats['p95']:8.4f}"
+              + delta(["node_seconds", node, "p95"], stats["p95"]))
+
+
+async def main(args) -> dict:
+    tasks = load_tasks(args.source)
+    logging.info(f"Loaded {len(tasks)} recorded tasks from {args.source}")
+    run_id = time.strftime("%H%M%S")
+    tickets = build_tickets(tasks, args.tickets, run_id)
+    short_descriptions = {t["result"][0].get("short_description") or "" for t in tickets}
+
+    with tempfile.TemporaryDirectory(prefix="load_replay_") as workdir:
+        servicenow_url, servicenow_stats = start_servicenow_stub(args.sn_latency)
+        write_stub_flow(workdir, short_descriptions, args.steps, args.script_kind, args.script_latency)
+        configure_environment(args, workdir, servicenow_url)
+        results = await replay(args, tickets)
+        results["servicenow_requests"] = servicenow_stats["requests"]
+
+    results["config"] = {
+        "source": args.source if tasks else "synthesized",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "steps": args.steps,
+        "script_kind": args.script_kind,
+        "script_latency": args.script_latency,
+        "sn_latency": args.sn_latency,
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=os.path.join(ROOT, "requests.jsonl"), help="JSON-lines file of APIResponse payloads.")
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivals per second (0 = unthrottled).")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=3, help="Actions in the stub flow.")
+    parser.add_argument("--script-kind", choices=("module", "spawn", "powershell"), default="module")
+    parser.add_argument("--script-latency", type=float, default=0.01)
+    parser.add_argument("--ps-pool", type=int, default=4, help="POWERSHELL_POOL_SIZE for --script-kind powershell.")
+    parser.add_argument("--ps-startup", type=float, default=0.3, help="Simulated PowerShell start-up seconds.")
+    parser.add_argument("--sn-latency", type=float, default=0.02, help="ServiceNow stub response delay.")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Write results JSON here.")
+    parser.add_argument("--compare", help="Baseline results JSON to diff against.")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    # aiosqlite's connection thread is not daemonic; do not wait on it.
+    sys.stdout.flush()
+    os._exit(1 if results["failed"] else 0)
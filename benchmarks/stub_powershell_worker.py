@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Stand-in for PowerShell on machines without pwsh.
+
+Two modes, matching how script_runner calls PowerShell:
+  - `stub_powershell_worker.py ... -Command <script>` runs one script and exits
+    (the per-action spawn path, POWERSHELL_EXECUTABLE). Like the script_io
+    header it reads the inputs from stdin and the ticket from
+    SCRIPT_IO_TASK_FILE, and writes its result to SCRIPT_IO_RESULT_FD.
+  - `stub_powershell_worker.py` with no -Command speaks the powershell_pool
+    worker protocol on stdin/stdout (POWERSHELL_POOL_COMMAND).
+
+STUB_STARTUP_SECONDS simulates interpreter start + module import,
+STUB_LATENCY_SECONDS simulates the script body. A `Start-Sleep <seconds>`
+in the script adds to it, and `[Console]::WriteLine` in a pooled script
+produces a stray, unmarked line on stdout before the response.
+"""
+import os
+import re
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from powershell_pool import RESPONSE_MARKER
+
+STARTUP = float(os.getenv("STUB_STARTUP_SECONDS", "0.3"))
+LATENCY = float(os.getenv("STUB_LATENCY_SECONDS", "0.01"))
+
+
+def script_output(script: str, task_file: str, inputs: dict) -> str:
+    sleep = re.search(r"Start-Sleep\s+(?:-Seconds\s+)?([\d.]+)", script)
+    time.sleep(LATENCY + (float(sleep.group(1)) if sleep else 0))
+    with open(task_file, encoding="utf-8") as f:
+        number = (json.load(f).get("result") or [{}])[0].get("number")
+    return json.dumps({
+        "Status": "Success",
+        "OutputMessage": f"stub ran {len(script)} bytes for {number}",
+        "InputCount": len(inputs),
+    })
+
+
+def serve() -> None:
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("op") == "ping":
+            response = {"id": request["id"], "op": "pong"}
+        else:
+            if "[Console]::WriteLine" in request["script"]:
+                sys.stdout.write("stray host output\n")
+            result = script_output(request["script"], request["task_file"], request["inputs"])
+            response = {"id": request["id"], "exit_code": 0, "stdout": "", "stderr": "", "result": result}
+        sys.stdout.write(RESPONSE_MARKER + json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    time.sleep(STARTUP)
+    if "-Command" in sys.argv:
+        script = sys.argv[sys.argv.index("-Command") + 1]
+        result = script_output(script, os.environ["SCRIPT_IO_TASK_FILE"], json.load(sys.stdin))
+        result_fd = os.environ.get("SCRIPT_IO_RESULT_FD")
+        if result_fd:
+            print(f"stub log line for {len(script)} bytes")
+            with os.fdopen(int(result_fd), "w") as f:
+                f.write(result)
+        else:
+            print(result)
+    else:
+        serve()
@@ -0,0 +1,290 @@
+"""
+Maintenance for the SQLite checkpoint database (DATABASE_PATH).
+
+- Tuned PRAGMAs on the checkpointer connection (WAL, synchronous, cache, mmap).
+- Periodic `wal_checkpoint(TRUNCATE)` so the -wal file does not grow unbounded.
+- Retention: completed threads are pruned down to their final checkpoint;
+  execution log runs and ticket payloads older than TASK_DATA_RETENTION_DAYS
+  are deleted unless their thread is still mid-run.
+- VACUUM on a schedule (CHECKPOINT_VACUUM_HOURS) or on demand.
+
+With CHECKPOINT_SHARDS > 1 every operation runs on each shard file.
+
+CLI (run against an idle database, or while the service is up; SQLite
+serialises the writers):
+    python checkpoint_maintenance.py {stats,prune,checkpoint,vacuum} [--db DATABASE_PATH] [--shards N]
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Optional
+
+import aiosqlite
+from dotenv import load_dotenv
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+CHECKPOINT_SYNCHRONOUS = os.getenv("CHECKPOINT_SYNCHRONOUS", "NORMAL")
+# Negative values are KiB, as in PRAGMA cache_size.
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "-65536"))
+CHECKPOINT_MMAP_SIZE = int(os.getenv("CHECKPOINT_MMAP_SIZE", str(256 * 1024 * 1024)))
+CHECKPOINT_BUSY_TIMEOUT_MS = int(os.getenv("CHECKPOINT_BUSY_TIMEOUT_MS", "5000"))
+CHECKPOINT_WAL_AUTOCHECKPOINT = int(os.getenv("CHECKPOINT_WAL_AUTOCHECKPOINT", "1000"))
+CHECKPOINT_JOURNAL_SIZE_LIMIT = int(os.getenv("CHECKPOINT_JOURNAL_SIZE_LIMIT", str(64 * 1024 * 1024)))
+# How often to checkpoint the WAL and apply retention (0 disables the loop).
+CHECKPOINT_MAINTENANCE_SECONDS = float(os.getenv("CHECKPOINT_MAINTENANCE_SECONDS", "300"))
+CHECKPOINT_RETENTION_ENABLED = os.getenv("CHECKPOINT_RETENTION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Age of execution log runs and ticket payloads kept by retention (0 keeps them forever).
+TASK_DATA_RETENTION_DAYS = float(os.getenv("TASK_DATA_RETENTION_DAYS", "30"))
+# 0 disables scheduled VACUUM; it can still be run via the CLI or the API.
+CHECKPOINT_VACUUM_HOURS = float(os.getenv("CHECKPOINT_VACUUM_HOURS", "0"))
+
+
+async def apply_pragmas(conn: aiosqlite.Connection) -> None:
+    """Tune a checkpointer connection. Call before the saver's first use."""
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={CHECKPOINT_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA cache_size={CHECKPOINT_CACHE_SIZE}")
+    await conn.execute(f"PRAGMA mmap_size={CHECKPOINT_MMAP_SIZE}")
+    await conn.execute(f"PRAGMA busy_timeout={CHECKPOINT_BUSY_TIMEOUT_MS}")
+    await conn.execute(f"PRAGMA wal_autocheckpoint={CHECKPOINT_WAL_AUTOCHECKPOINT}")
+    await conn.execute(f"PRAGMA journal_size_limit={CHECKPOINT_JOURNAL_SIZE_LIMIT}")
+    await conn.execute("PRAGMA temp_store=MEMORY")
+
+
+# -----------------------------------------------------------------------
+# Maintenance
+# -----------------------------------------------------------------------
+class CheckpointMaintenance:
+    """
+    Keeps the checkpoint database small while the service runs. Uses each
+    saver's own connection and lock (every shard of a ShardedSqliteSaver),
+    so maintenance statements never interleave with a checkpoint write.
+    """
+
+    def __init__(
+        self,
+        saver,
+        graph,
+        interval: float = CHECKPOINT_MAINTENANCE_SECONDS,
+        retention: bool = CHECKPOINT_RETENTION_ENABLED,
+        vacuum_hours: float = CHECKPOINT_VACUUM_HOURS,
+        task_data_days: float = TASK_DATA_RETENTION_DAYS,
+    ):
+        self.savers = list(getattr(saver, "shards", [saver]))
+        self.graph = graph
+        self.interval = interval
+        self.retention = retention
+        self.vacuum_hours = vacuum_hours
+        self.task_data_days = task_data_days
+        self._task: Optional[asyncio.Task] = None
+        self._last_vacuum = time.monotonic()
+
+    async def stats(self) -> dict:
+        totals = {"shards": len(self.savers), "threads": 0, "checkpoints": 0, "writes": 0,
+                  "db_bytes": 0, "free_bytes": 0, "wal_bytes": 0}
+        for saver in self.savers:
+            await saver.setup()
+            async with saver.lock:
+                (threads, checkpoints), = await saver.conn.execute_fetchall(
+                    "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints"
+                )
+                (writes,), = await saver.conn.execute_fetchall("SELECT COUNT(*) FROM writes")
+                (page_count,), = await saver.conn.execute_fetchall("PRAGMA page_count")
+                (page_size,), = await saver.conn.execute_fetchall("PRAGMA page_size")
+                (freelist,), = await saver.conn.execute_fetchall("PRAGMA freelist_count")
+                databases = await saver.conn.execute_fetchall("PRAGMA database_list")
+            wal_path = (databases[0][2] if databases else "") + "-wal"
+            totals["threads"] += threads
+            totals["checkpoints"] += checkpoints
+            totals["writes"] += writes
+            totals["db_bytes"] += page_count * page_size
+            totals["free_bytes"] += freelist * page_size
+            totals["wal_bytes"] += os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        return totals
+
+    async def wal_checkpoint(self) -> list:
+        """Copy each WAL into its database and truncate it. Returns (busy, log, checkpointed) per shard."""
+        results = []
+        for saver in self.savers:
+            async with saver.lock:
+                rows = await saver.conn.execute_fetchall("PRAGMA wal_checkpoint(TRUNCATE)")
+            results.append(tuple(rows[0]) if rows else ())
+        return results
+
+    async def prune_completed(self) -> dict:
+        """
+        Delete every checkpoint except the latest (and its writes) for threads
+        whose flow has finished. Threads that are mid-run are left alone.
+        Only checkpoints older than the one inspected are removed, so a run
+        that restarts on the same thread meanwhile is never touched.
+        """
+        pruned_threads = deleted_checkpoints = deleted_writes = 0
+        for saver in self.savers:
+            await saver.setup()
+            async with saver.lock:
+                candidates = await saver.conn.execute_fetchall(
+                    "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints WHERE checkpoint_ns = '' "
+                    "GROUP BY thread_id HAVING COUNT(*) > 1"
+                )
+            for thread_id, latest_id in candidates:
+                snapshot = await self.graph.aget_state({"configurable": {"thread_id": thread_id}})
+                if snapshot.next:
+                    continue
+                async with saver.lock:
+                    cursor = await saver.conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id < ?",
+                        (thread_id, latest_id),
+                    )
+                    deleted_checkpoints += cursor.rowcount
+                    cursor = await saver.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id < ?",
+                        (thread_id, latest_id),
+                    )
+                    deleted_writes += cursor.rowcount
+                    await saver.conn.execute(
+                        "UPDATE checkpoints SET parent_checkpoint_id = NULL "
+                        "WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?",
+                        (thread_id, latest_id),
+                    )
+                    await saver.conn.commit()
+                pruned_threads += 1
+
+        result = {"threads": pruned_threads, "checkpoints": deleted_checkpoints, "writes": deleted_writes}
+        if pruned_threads:
+            logging.info(f"Checkpoint retention pruned {result}")
+        return result
+
+    async def prune_task_data(self, max_age_seconds: Optional[float] = None) -> dict:
+        """
+        Delete execution log runs whose newest entry is older than
+        `max_age_seconds` (default TASK_DATA_RETENTION_DAYS) and ticket
+        payloads last submitted before then. Runs of threads that are still
+        mid-run, and the payloads those threads reference, are kept so the
+        threads can still resume.
+        """
+        # Imported lazily: both stores import apply_pragmas from this module.
+        from execution_log import get_execution_log
+        from task_store import get_task_store
+
+        if max_age_seconds is None:
+            max_age_seconds = self.task_data_days * 86400
+        cutoff = time.time() - max_age_seconds
+        execution_log = get_execution_log()
+        runs = await execution_log.stale_runs(cutoff)
+        active_threads, keep_refs = set(), set()
+        for thread_id in {thread_id for thread_id, _ in runs}:
+            snapshot = await self.graph.aget_state({"configurable": {"thread_id": thread_id}})
+            if snapshot.next:
+                active_threads.add(thread_id)
+                if snapshot.values.get("task_ref"):
+                    keep_refs.add(snapshot.values["task_ref"])
+        log_rows = await execution_log.prune([run for run in runs if run[0] not in active_threads])
+        blobs = await get_task_store().prune(cutoff, keep_refs)
+        result = {"log_rows": log_rows, "task_blobs": blobs}
+        if log_rows or blobs:
+            logging.info(f"Task data retention pruned {result}")
+        return result
+
+    async def vacuum(self) -> None:
+        """Rebuild the database files to return free pages to the OS. Blocks checkpoint writes while it runs."""
+        started_at = time.perf_counter()
+        for saver in self.savers:
+            async with saver.lock:
+                await saver.conn.execute("VACUUM")
+                await saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._last_vacuum = time.monotonic()
+        logging.info(f"Checkpoint database vacuumed in {time.perf_counter() - started_at:.2f}s")
+
+    async def run_once(self) -> dict:
+        result = {}
+        if self.retention:
+            result["pruned"] = await self.prune_completed()
+            if self.task_data_days > 0:
+                result["pruned_task_data"] = await self.prune_task_data()
+        if self.vacuum_hours > 0 and time.monotonic() - self._last_vacuum >= self.vacuum_hours * 3600:
+            await self.vacuum()
+            result["vacuumed"] = True
+        result["wal_checkpoint"] = await self.wal_checkpoint()
+        return result
+
+    async def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.wal_checkpoint()
+        except Exception as e:
+            logging.error(f"Final WAL checkpoint failed: {e}")
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"Checkpoint maintenance failed: {e}")
+
+
+_maintenance: Optional[CheckpointMaintenance] = None
+
+
+def init_checkpoint_maintenance(saver, graph) -> CheckpointMaintenance:
+    """Create the process-wide maintenance task for the compiled graph's saver."""
+    global _maintenance
+    if _maintenance is None:
+        _maintenance = CheckpointMaintenance(saver, graph)
+    return _maintenance
+
+
+def get_checkpoint_maintenance() -> Optional[CheckpointMaintenance]:
+    """Return the maintenance instance created by init_graph(), if any."""
+    return _maintenance
+
+
+async def _cli(command: str, db_path: str, shards: int) -> dict:
+    from flow_logic import builder
+    from sharded_checkpointer import open_checkpointer
+
+    saver = await open_checkpointer(db_path, shards)
+    try:
+        maintenance = CheckpointMaintenance(saver, builder.compile(checkpointer=saver))
+        before = await maintenance.stats()
+        if command == "prune":
+            result = await maintenance.prune_completed()
+            await maintenance.wal_checkpoint()
+        elif command == "checkpoint":
+            result = {"wal_checkpoint": await maintenance.wal_checkpoint()}
+        elif command == "vacuum":
+            await maintenance.vacuum()
+            result = {"vacuumed": True}
+        else:
+            return before
+        return {**result, "before": before, "after": await maintenance.stats()}
+    finally:
+        for shard in getattr(saver, "shards", [saver]):
+            await shard.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and compact the checkpoint database.")
+    parser.add_argument("command", choices=("stats", "prune", "checkpoint", "vacuum"))
+    parser.add_argument("--db", default=os.getenv("DATABASE_PATH"), help="Defaults to DATABASE_PATH.")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("CHECKPOINT_SHARDS", "1")), help="Defaults to CHECKPOINT_SHARDS.")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("--db is required when DATABASE_PATH is not set")
+    print(json.dumps(asyncio.run(_cli(args.command, args.db, args.shards)), indent=2))
@@ -0,0 +1,191 @@
+"""
+Append-only execution log kept outside graph state.
+
+Nodes append entries here instead of to a list channel, so checkpoints
+no longer re-serialize the whole history every superstep and parallel
+action branches never contend on one list. Entries are buffered and
+written with batched inserts; FlowState only keeps `run_id` and an entry
+counter. Reads flush first, so a page always includes everything logged.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import List, Optional
+
+import aiosqlite
+from dotenv import load_dotenv
+
+from checkpoint_maintenance import apply_pragmas
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+# Defaults to <DATABASE_PATH without extension>.log.sqlite next to the checkpoints.
+EXECUTION_LOG_DB_PATH = os.getenv("EXECUTION_LOG_DB_PATH", "")
+EXECUTION_LOG_FLUSH_SECONDS = float(os.getenv("EXECUTION_LOG_FLUSH_SECONDS", "0.5"))
+EXECUTION_LOG_BATCH_SIZE = int(os.getenv("EXECUTION_LOG_BATCH_SIZE", "500"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS execution_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_execution_log_thread ON execution_log (thread_id, run_id, id);
+"""
+
+
+# -----------------------------------------------------------------------
+# Log Store
+# -----------------------------------------------------------------------
+class ExecutionLogStore:
+    """Buffered, append-only SQLite log of flow entries keyed by (thread_id, run_id)."""
+
+    def __init__(
+        self,
+        db_path: str = EXECUTION_LOG_DB_PATH,
+        flush_interval: float = EXECUTION_LOG_FLUSH_SECONDS,
+        batch_size: int = EXECUTION_LOG_BATCH_SIZE,
+    ):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._pending: List[tuple] = []
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+    async def open(self) -> None:
+        if self._conn is not None:
+            return
+        if not self.db_path:
+            base, _ = os.path.splitext(os.getenv("DATABASE_PATH") or "state.sqlite")
+            self.db_path = base + ".log.sqlite"
+        self._conn = await aiosqlite.connect(self.db_path, check_same_thread=False)
+        await apply_pragmas(self._conn)
+        await self._conn.executescript(SCHEMA)
+        await self._conn.commit()
+        self._flush_lock = asyncio.Lock()
+        logging.info(f"Execution log store opened at {self.db_path}")
+
+    async def start(self) -> None:
+        await self.open()
+        if self._timer_task is None and self.flush_interval > 0:
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        if self._conn is not None:
+            await self.flush()
+            await self._conn.close()
+            self._conn = None
+
+    def append(self, thread_id: str, run_id: str, entries: List[dict]) -> int:
+        """Queue entries for the next batched insert. Returns how many were queued."""
+        now = time.time()
+        for entry in entries:
+            self._pending.append((thread_id, run_id, now, json.dumps(entry, default=str)))
+        if len(self._pending) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+        return len(entries)
+
+    async def flush(self) -> int:
+        """Write every queued entry in one transaction. Returns the number written."""
+        if not self._pending:
+            return 0
+        await self.open()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                await self._conn.executemany(
+                    "INSERT INTO execution_log (thread_id, run_id, created_at, entry) VALUES (?, ?, ?, ?)", batch
+                )
+                await self._conn.commit()
+            except Exception:
+                # Keep the entries for the next attempt, ahead of anything queued meanwhile.
+                self._pending = batch + self._pending
+                raise
+        return len(batch)
+
+    async def stale_runs(self, before: float) -> List[tuple]:
+        """(thread_id, run_id) of every run whose newest entry was written before `before` (epoch seconds)."""
+        await self.flush()
+        return await self._conn.execute_fetchall(
+            "SELECT thread_id, run_id FROM execution_log GROUP BY thread_id, run_id HAVING MAX(created_at) < ?",
+            (before,),
+        )
+
+    async def prune(self, runs: List[tuple]) -> int:
+        """Delete every entry of the given (thread_id, run_id) runs. Returns the rows removed."""
+        await self.open()
+        deleted = 0
+        async with self._flush_lock:
+            for thread_id, run_id in runs:
+                cursor = await self._conn.execute(
+                    "DELETE FROM execution_log WHERE thread_id = ? AND run_id = ?", (thread_id, run_id)
+                )
+                deleted += cursor.rowcount
+            await self._conn.commit()
+        return deleted
+
+    async def latest_run(self, thread_id: str) -> Optional[str]:
+        rows = await self._conn.execute_fetchall(
+            "SELECT run_id FROM execution_log WHERE thread_id = ? ORDER BY id DESC LIMIT 1", (thread_id,)
+        )
+        return rows[0][0] if rows else None
+
+    async def read(self, thread_id: str, run_id: Optional[str] = None, after: int = 0, limit: Optional[int] = 100) -> dict:
+        """
+        One page of a thread's log, oldest first. `run_id` defaults to the
+        latest run of the thread; pass the returned `next_after` as `after`
+        to get the next page (it is None on the last page).
+        """
+        await self.flush()
+        run_id = run_id or await self.latest_run(thread_id)
+        sql = "SELECT id, created_at, entry FROM execution_log WHERE thread_id = ? AND run_id = ? AND id > ? ORDER BY id"
+        params = [thread_id, run_id, after]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = await self._conn.execute_fetchall(sql, params)
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if limit is not None else rows
+        return {
+            "thread_id": thread_id,
+            "run_id": run_id,
+            "entries": [{"id": r[0], "created_at": r[1], **json.loads(r[2])} for r in rows],
+            "next_after": rows[-1][0] if has_more else None,
+        }
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Execution log flush failed: {e}")
+
+
+_store: Optional[ExecutionLogStore] = None
+
+
+def get_execution_log() -> ExecutionLogStore:
+    """Return the process-wide ExecutionLogStore. Call `await store.start()` at startup."""
+    global _store
+    if _store is None:
+        _store = ExecutionLogStore()
+    return _store
@@ -0,0 +1,46 @@
+"""
+JSON codec for request and response bodies.
+
+Uses orjson when it is installed (several times faster than the stdlib
+for both directions) and falls back to the json module otherwise, so the
+service runs either way. Responses built with FastJSONResponse also skip
+FastAPI's jsonable_encoder pass over the content.
+"""
+import json
+import logging
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logging.info("orjson is not installed; using the json module for request/response bodies.")
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON; unknown types are rendered with str()."""
+        return orjson.dumps(obj, default=str, option=_OPTIONS)
+else:
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON; unknown types are rendered with str()."""
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
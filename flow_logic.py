@@ -1,11 +1,11 @@
 import os
 import json
+import time
 import logging
-import asyncio
-import subprocess
-import yaml
+import operator
+import uuid
 from enum import IntEnum
-from typing import Literal
+from typing import Annotated
 from typing_extensions import TypedDict
  
 # Third-party libs
@@ -13,40 +13,63 @@ from dotenv import load_dotenv
  
 # LangGraph imports
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Overwrite, Send
+from langgraph.config import get_config
+
+from flow_registry import get_flow_registry
+from servicenow_client import init_servicenow_client
+from servicenow_writes import get_write_buffer
+from script_runner import run_script, INTERPRETERS
+from powershell_pool import get_powershell_pool
+from flow_manifest import get_manifest_store
+from checkpoint_maintenance import init_checkpoint_maintenance
+from sharded_checkpointer import close_checkpointer, open_checkpointer
+from task_store import get_task_store
+from execution_log import get_execution_log
+from logging_setup import configure_logging, log_state
+from metrics import SCRIPT_SECONDS, timed_node, instrument_checkpointer, observe
+from tracing import span, traced_node
+from action_cache import get_action_cache, action_cache_key
  
 # -----------------------------------------------------------------------
 # Configure Logging
 # -----------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+configure_logging()
  
 # -----------------------------------------------------------------------
 # Load Environment Variables
 # -----------------------------------------------------------------------
 load_dotenv()
-user = os.getenv('SERVICENOW_USER')
-pwd = os.getenv('SERVICENOW_PWD')
-endpoint = "https://hexawaretechnologiesincdemo8.service-now.com"
 db_path = os.getenv('DATABASE_PATH')
  
 # -----------------------------------------------------------------------
 # Define the FlowState
 # -----------------------------------------------------------------------
+def merge_dicts(left: dict, right: dict) -> dict:
+    """Reducer for additional_variables: later branch outputs win per key."""
+    return {**(left or {}), **(right or {})}
+ 
 class FlowState(TypedDict):
-    task_response: dict
+    task_ref: str  # key of the full ticket payload in the TaskBlobStore
+    task: dict  # slim projection of the ticket (task_store.TASK_FIELDS)
     flow_name: str
     actions_list: list
+    action_dependencies: dict  # action -> actions it waits for
+    completed_actions: Annotated[list, operator.add]
+    failed_actions: Annotated[list, operator.add]  # completed_actions that ended in an error
+    pending_actions: list  # actions fanned out in the current step
     current_action: str
-    additional_variables: dict
+    additional_variables: Annotated[dict, merge_dicts]
     worknote_content: str
-    execution_log: list  # We'll store logs & updates here
-    action_index: int
+    worknotes: Annotated[list, operator.add]  # notes produced by actions
+    worknote_cursor: int  # notes before this index are already staged
+    run_id: str  # key of this run's entries in the execution log store
+    execution_log_count: Annotated[int, operator.add]  # entries appended to the execution log store
+    action_index: int  # number of completed actions
     next_action: bool
-    error_occurred: bool
+    error_occurred: Annotated[bool, operator.or_]
     reassignment_group: str
+    resume: bool  # set by run_flow: keep the successful actions of the previous run
  
 # -----------------------------------------------------------------------
 # Define TicketState
@@ -61,106 +84,6 @@ class TicketState(IntEnum):
     RESOLVED = 6
 
 
-# Asynchronous Helper Functions
-async def run_script(script_path: str, inputs: dict, task_response: dict) -> dict:
-    """
-    Execute a script based on its file extension asynchronously.
-    Supports:
-      - Python (.py): Runs with 'python' interpreter; inputs passed as a JSON string.
-      - Node.js (.js): Runs with 'node' interpreter; inputs passed as a JSON string.
-      - PowerShell (.ps1): Runs with 'powershell'; inputs passed as individual key-value arguments.
-
-    Args:
-        script_path (str): Path to the script file.
-        inputs (dict): Input data for the script.
-
-    Returns:
-        dict: Execution result containing:
-            - Status: "Success" or "Error"
-            - Outputs: Parsed outputs from the script (if available)
-            - ErrorMessage: Any error message encountered
-    """
-    if not os.path.exists(script_path):
-        error_msg = f"Script file not found: {script_path}"
-        logging.error(error_msg)
-        return {"Status": "Error", "Outputs": {}, "ErrorMessage": error_msg}
-
-    ext = os.path.splitext(script_path)[1].lower()
-
-    try:
-        if ext in [".py", ".js"]:
-            interpreter = "python" if ext == ".py" else "node"
-            inputs_json = json.dumps(inputs)
-            command = [interpreter, script_path, inputs_json]
-        elif ext == ".ps1":
-            header = (
-                f"$jsonObject = '{json.dumps(task_response)}' | ConvertFrom-Json; "
-                f"$SCTASK_RESPONSE = $jsonObject.result; "
-                f"$ADDITIONAL_VARIABLES = '{json.dumps(inputs)}' | ConvertFrom-Json; "
-            )
-            with open(script_path, 'r') as script_file:
-                file_content = script_file.read()
-
-            powershell_script = header + file_content
-            # command = ["powershell", "-File", script_path]
-            # for key, value in inputs.items():
-            #     command.extend([f"-{key}", str(value)])
-            return run_powershell_command(powershell_script)
-        else:
-            error_msg = f"Unsupported script file type: {ext}"
-            logging.error(error_msg)
-            return {"Status": "Error", "Outputs": {}, "ErrorMessage": error_msg}
-
-        logging.info(f"Executing command: {' '.join(command)}")
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-
-        stdout_decoded = stdout.decode().strip().replace('\r\n',' ')
-        stderr_decoded = stderr.decode().strip().replace('\r\n',' ')
-
-        if process.returncode == 0:
-            try:
-                outputs = json.loads(stdout_decoded)
-            except json.JSONDecodeError:
-                outputs = stdout_decoded
-            return {"Status": "Success", "Outputs": outputs, "ErrorMessage": ""}
-        else:
-            logging.error(f"Script execution error: {stderr_decoded}")
-            return {"Status": "Error", "Outputs": {}, "ErrorMessage": stderr_decoded}
-
-    except Exception as e:
-        logging.error(f"Exception occurred during script execution: {e}")
-        return {"Status": "Error", "Outputs": {}, "ErrorMessage": str(e)}
-
-
-# -----------------------------------------------------------------------
-# Asynchronous Helper Functions
-# -----------------------------------------------------------------------
-async def run_powershell_command(command: str):
-    """Execute a PowerShell command and return status and output."""
-    try:
-        logging.debug(f"Executing PowerShell command: {command}")
-        result = subprocess.run(
-            ["powershell", "-Command", command],
-            capture_output=True,
-            text=True
-        )
-        return {
-            "Status": "Success" if result.returncode == 0 else "Error",
-            "OutputMessage": result.stdout.strip(),
-            "ErrorMessage": result.stderr.strip(),
-        }
-    except Exception as e:
-        return {
-            "Status": "Error",
-            "OutputMessage": "",
-            "ErrorMessage": str(e)
-        }
- 
 def parse_powershell_output(powershell_response: dict, additional_variables: dict):
     """
     Parse JSON output from the PowerShell script and update additional_variables.
@@ -196,267 +119,336 @@ def parse_powershell_output(powershell_response: dict, additional_variables: dic
 # -----------------------------------------------------------------------
 # Flow Node Functions (Async)
 # -----------------------------------------------------------------------
-import httpx
+# Nodes return only the channels they change. Channels with reducers
+# (completed_actions, failed_actions, additional_variables, worknotes,
+# execution_log_count, error_occurred) are merged across parallel action branches.
  
-async def initialize_flow_state(state: FlowState) -> FlowState:
+async def initialize_flow_state(state: FlowState) -> dict:
     """
     Determine the flow name from the short_description and initialize the state.
-    Now reading from a YAML file instead of CSV.
+    Flows are looked up in the FlowRegistry index built from flow_details.yml.
     """
     logging.debug("Checking flow name.")
-    task_response = state["task_response"]
-    if "result" not in task_response or not task_response["result"]:
+    task = state.get("task")
+    if not task:
         raise ValueError("Task response is missing 'result' data.")
  
-    short_description = task_response["result"][0].get("short_description")
+    short_description = task.get("short_description")
     if not short_description:
         raise ValueError("Short description is missing in the task response.")
  
-    # --- Load from YAML ---
-    try:
-        with open("flow_details.yml", "r", encoding="utf-8") as f:
-            yaml_data = yaml.safe_load(f)  # e.g., {"flows": [ {...}, {...} ]}
-            # Create a dict that maps a short_description -> { flow_name, reassignment_group, ... }
-            flow_map = {
-                item["short_description"]: {
-                    "flow_name": item["flow_name"],
-                    "reassignment_group": item["reassignment_group"],
-                }
-                for item in yaml_data.get("flows", [])
-            }
-    except FileNotFoundError:
-        raise ValueError("flow_details.yml file not found.")
-    except KeyError as e:
-        raise ValueError(f"Missing key in flow_details.yml: {e}")
- 
-    # Lookup the short_description
-    if short_description not in flow_map:
+    # --- Lookup in the in-memory flow registry ---
+    registry = get_flow_registry()
+    if not registry.loaded:
+        await registry.start()
+    mapping_data = registry.lookup(short_description)
+    if mapping_data is None:
         logging.error(f"No flow found for: {short_description}")
         raise ValueError(f"No flow found for short description: {short_description}")
  
-    mapping_data = flow_map[short_description]
-    state["flow_name"] = mapping_data["flow_name"]
-    logging.debug(f"Flow name determined: {state['flow_name']}")
- 
-    # Optionally store the reassignment_group in state["additional_variables"]
-    state["reassignment_group"] = mapping_data["reassignment_group"]
- 
-    # Initialize state fields
-    state["actions_list"] = []
-    state["current_action"] = ""
-    state["worknote_content"] = ""
-    state["execution_log"] = []
-    state["action_index"] = 0
-    state["next_action"] = False
-    state["error_occurred"] = False
-    state["additional_variables"] = {}
- 
-    # Mark ticket as WORK_IN_PROGRESS
-    updated_state = await update_ticket_state(state, TicketState.WORK_IN_PROGRESS)
-    return updated_state
- 
-async def update_ticket_state(state: FlowState, task_state: TicketState) -> FlowState:
+    logging.debug(f"Flow name determined: {mapping_data['flow_name']}")
+ 
+    # Mark ticket as WORK_IN_PROGRESS (sent with the next flush)
+    log_entry = await update_ticket_state(state, TicketState.WORK_IN_PROGRESS)
+    if state.get("resume") and state.get("run_id"):
+        return resume_flow_state(state, mapping_data, log_entry)
+    run_id = uuid.uuid4().hex
+ 
+    # Initialize state fields; Overwrite resets reducer channels left over
+    # from a previous run on the same thread_id.
+    return {
+        "flow_name": mapping_data["flow_name"],
+        "reassignment_group": mapping_data["reassignment_group"],
+        "actions_list": [],
+        "action_dependencies": {},
+        "completed_actions": Overwrite([]),
+        "failed_actions": Overwrite([]),
+        "pending_actions": [],
+        "current_action": "",
+        "worknote_content": "Worknotes updated successfully",
+        "worknotes": Overwrite([]),
+        "worknote_cursor": 0,
+        "run_id": run_id,
+        "execution_log_count": Overwrite(log_execution(run_id, log_entry)),
+        "action_index": 0,
+        "next_action": False,
+        "error_occurred": Overwrite(False),
+        "additional_variables": Overwrite({}),
+    }
+ 
+def resume_flow_state(state: FlowState, mapping_data: dict, log_entry: dict) -> dict:
+    """
+    Re-enter a thread whose previous run ended in an error: actions that
+    succeeded stay completed (with their variables and work notes), failed
+    ones run again, and the execution log continues under the same run_id.
     """
-    Update the ticket state in ServiceNow using the given task_state and log the change.
+    failed = set(state.get("failed_actions") or [])
+    kept = [action for action in state.get("completed_actions") or [] if action not in failed]
+    logging.info(f"Resuming flow {mapping_data['flow_name']}: skipping {len(kept)} completed action(s), retrying {sorted(failed)}")
+    resume_entry = {"action": "resume_flow", "skipped_actions": kept, "retried_actions": sorted(failed)}
+    return {
+        "flow_name": mapping_data["flow_name"],
+        "reassignment_group": mapping_data["reassignment_group"],
+        "completed_actions": Overwrite(kept),
+        "failed_actions": Overwrite([]),
+        "pending_actions": [],
+        "current_action": "",
+        "execution_log_count": log_execution(state["run_id"], log_entry, resume_entry),
+        "action_index": len(kept),
+        "next_action": False,
+        "error_occurred": Overwrite(False),
+    }
+ 
+def log_execution(run_id: str, *entries: dict) -> int:
+    """Append entries to this thread's execution log store; returns the count for execution_log_count."""
+    thread_id = get_config()["configurable"]["thread_id"]
+    return get_execution_log().append(thread_id, run_id, list(entries))
+ 
+def get_record_key(state: FlowState) -> tuple:
+    """Return (table_name, sys_id) of the ServiceNow record this flow works on."""
+    task = state["task"]
+    return task["sys_class_name"], task["sys_id"]
+ 
+async def update_ticket_state(state: FlowState, task_state: TicketState) -> dict:
+    """
+    Stage the ticket state change in the write-behind buffer and return the
+    execution log entry for it. The update reaches ServiceNow on the next
+    flush of the record.
     """
     try:
-        task_response = state["task_response"]
-        state_request = {"state": str(task_state.value)}
-        updated_state_json = json.dumps(state_request)
- 
-        table_name = task_response["result"][0]["sys_class_name"]
-        sys_id = task_response["result"][0]["sys_id"]
- 
-        url = f"{endpoint}/api/now/table/{table_name}/{sys_id}"
-        async with httpx.AsyncClient() as client:
-            auth = (user, pwd)
-            resp = await client.put(
-                url,
-                auth=auth,
-                headers={"Content-Type": "application/json", "Accept": "application/json"},
-                content=updated_state_json
-            )
-            if resp.status_code != 200:
-                raise Exception(f"Failed to update state: {resp.json()}")
+        table_name, sys_id = get_record_key(state)
+        get_write_buffer().stage(table_name, sys_id, state=str(task_state.value))
  
-        state["worknote_content"] = "Worknotes updated successfully"
-        # Log the updated ticket state in execution_log
-        state["execution_log"].append({
+        return {
             "action": "update_ticket_state",
             "ticket_state_value": task_state.value,
             "ticket_state_name": task_state.name,
             "description": f"Ticket state successfully updated to {task_state.name} ({task_state.value})."
-        })
+        }
     except Exception as e:
         raise RuntimeError(f"Error updating state: {e}")
-    return state
  
-async def retrieve_flow_scripts(state: FlowState) -> FlowState:
-    """Fetch PowerShell scripts from UseCases/<flow_name>."""
+async def retrieve_flow_scripts(state: FlowState) -> dict:
+    """Fetch the ordered action scripts of UseCases/<flow_name> and their dependencies from the compiled manifest."""
     logging.debug("Fetching actions for the flow.")
-    flow_dir = "UseCases"
-    try:
-        actions_dir = os.path.join(flow_dir, state["flow_name"])
-        actions_list = os.listdir(actions_dir)
-    except Exception as e:
-        logging.error(f"Error fetching actions: {e}")
-        raise RuntimeError(f"Error fetching actions: {e}")
- 
-    state["actions_list"] = actions_list
-    logging.debug(f"Actions found: {actions_list}")
-    return state
- 
-async def evaluate_flow_decision(state: FlowState) -> FlowState:
-    """Decide whether to continue or end the flow."""
+    store = get_manifest_store()
+    if not store.loaded:
+        await store.start()
+    manifest = store.get(state["flow_name"])
+    if manifest is None:
+        logging.error(f"Error fetching actions: no manifest for flow {state['flow_name']}")
+        raise RuntimeError(f"Error fetching actions: no manifest for flow {state['flow_name']}")
+ 
+    actions_list = manifest.action_names()
+    log_state("Actions found", actions_list)
+    return {"actions_list": actions_list, "action_dependencies": manifest.dependencies}
+ 
+def get_ready_actions(state: FlowState) -> list:
+    """Actions not yet run whose dependencies have all completed, in flow order."""
+    completed = set(state["completed_actions"])
+    dependencies = state["action_dependencies"]
+    return [
+        action for action in state["actions_list"]
+        if action not in completed and all(dep in completed for dep in dependencies.get(action, []))
+    ]
+ 
+async def evaluate_flow_decision(state: FlowState) -> dict:
+    """
+    Decide which actions run next (possibly several in parallel) or end the
+    flow, then flush every ServiceNow update staged since the last decision
+    as a single PATCH.
+    """
     logging.debug("Assistant node: deciding next step.")
+    completed = state["completed_actions"]
     if state["error_occurred"]:
-        state["next_action"] = False
-        updated_state = await update_servicenow_assignment_group(state)
+        log_entry = await update_servicenow_assignment_group(state)
+        await flush_servicenow_updates(state, final=True)
         logging.debug("Assistant: error_occured=True, will end flow.")
-        return updated_state
- 
-    if state["action_index"] < len(state["actions_list"]):
-        state["next_action"] = True
-        state["current_action"] = state["actions_list"][state["action_index"]]
-        logging.debug(f"Assistant: next_action=True. Next script: {state['current_action']}")
-    else:
-        state["next_action"] = False
-        state["current_action"] = ""
-        state = await update_ticket_state(state, TicketState.CLOSED_COMPLETE)
-        logging.debug("Assistant: no more actions, ending flow.")
- 
-    return state
+        return {
+            "next_action": False,
+            "pending_actions": [],
+            "action_index": len(completed),
+            "execution_log_count": log_execution(state["run_id"], log_entry),
+        }
+ 
+    ready = get_ready_actions(state)
+    if ready:
+        logging.debug(f"Assistant: next_action=True. Next scripts: {ready}")
+        await flush_servicenow_updates(state)
+        return {
+            "next_action": True,
+            "pending_actions": ready,
+            "current_action": ", ".join(ready),
+            "action_index": len(completed),
+        }
+ 
+    if len(completed) < len(state["actions_list"]):
+        # Remaining actions wait on something that can never complete.
+        blocked = [a for a in state["actions_list"] if a not in completed]
+        logging.error(f"Unresolvable action dependencies for: {blocked}")
+        table_name, sys_id = get_record_key(state)
+        get_write_buffer().stage(table_name, sys_id, work_notes=f"Unresolvable action dependencies for: {', '.join(blocked)}")
+        log_entry = await update_servicenow_assignment_group(state)
+        await flush_servicenow_updates(state, final=True)
+        return {
+            "next_action": False,
+            "pending_actions": [],
+            "action_index": len(completed),
+            "error_occurred": True,
+            "execution_log_count": log_execution(state["run_id"], log_entry),
+        }
+ 
+    log_entry = await update_ticket_state(state, TicketState.CLOSED_COMPLETE)
+    logging.debug("Assistant: no more actions, ending flow.")
+    await flush_servicenow_updates(state, final=True)
+    return {
+        "next_action": False,
+        "pending_actions": [],
+        "current_action": "",
+        "action_index": len(completed),
+        "execution_log_count": log_execution(state["run_id"], log_entry),
+    }
 
-async def execute_flow_script(state: FlowState) -> FlowState:
+async def execute_flow_script(state: FlowState) -> dict:
+    """
+    Run one action. Invoked once per entry of pending_actions via Send, with
+    current_action naming the action this branch runs.
+    """
     logging.debug("Executing current action.")
-    idx = state["action_index"]
-    actions = state["actions_list"]
+    action_name = state["current_action"]
     additional_vars = state["additional_variables"]
-    task_response = state["task_response"]
- 
-    if idx < len(actions):
-        action_name = actions[idx]
-        action_path = os.path.join("UseCases", state["flow_name"], action_name)
-        logging.debug(f"Running action script: {action_path}")
- 
-        try:
- 
-            ps_result = await run_script(action_path, additional_vars, task_response)
-            state["execution_log"].append({
-                "script": action_name,
-                "Status": ps_result["Status"],
-                "OutputMessage": ps_result["Outputs"],
-                "ErrorMessage": ps_result["ErrorMessage"]
-            })
- 
-            if ps_result["Status"] == "Error":
-                logging.error(f"Error executing {action_name}: {ps_result['ErrorMessage']}")
-                state["worknote_content"] = f"Error in {action_name}: {ps_result['ErrorMessage']}"
-                state["error_occurred"] = True
-            else:
-                updated_vars, note_content, error_occurred = parse_powershell_output(ps_result, additional_vars)
-                state["additional_variables"] = updated_vars
-                state["worknote_content"] = note_content
-                state["error_occurred"] = error_occurred
- 
-        except Exception as e:
-            logging.error(f"Execution failed for {action_name}: {e}")
-            state["worknote_content"] = f"Execution failed for {action_name}: {e}"
-            state["error_occurred"] = True
- 
-        state["action_index"] = idx + 1
-    else:
-        state["worknote_content"] = "All actions executed."
-        state["error_occurred"] = False
- 
-    logging.debug(f"State after executing action: {state}")
-    return state
- 
-async def update_servicenow_worknotes(state: FlowState) -> FlowState:
-    """Update the ServiceNow record's worknotes with the result of the action."""
-    logging.debug("Updating worknotes on ServiceNow.")
+ 
+    action = None
+    manifest = get_manifest_store().get(state["flow_name"])
+    if manifest is not None:
+        action = manifest.get(action_name)
+    action_path = action.path if action else os.path.join("UseCases", state["flow_name"], action_name)
+    logging.debug(f"Running action script: {action_path}")
+ 
+    updates = {"completed_actions": [action_name]}
     try:
-        task_response = state["task_response"]
-        content = state["worknote_content"]
- 
-        table_name = task_response["result"][0]["sys_class_name"]
-        sys_id = task_response["result"][0]["sys_id"]
-        url = f"{endpoint}/api/now/table/{table_name}/{sys_id}"
- 
-        body = {"work_notes": content}
- 
-        async with httpx.AsyncClient() as client:
-            auth = (user, pwd)
-            resp = await client.put(
-                url,
-                auth=auth,
-                headers={"Content-Type": "application/json", "Accept": "application/json"},
-                json=body
+        # Full payload as cached JSON text; script_io writes it to a task file once per ticket.
+        task_json = await get_task_store().get_json(state["task_ref"])
+        started = time.perf_counter()
+
+        async def run_action() -> dict:
+            with span("run_script", "script", script=action_name):
+                return await run_script(
+                    action_path,
+                    additional_vars,
+                    task_json,
+                    script_text=action.text if action else None,
+                    version=action.sha256 if action else None,
+                    task_ref=state["task_ref"],
+                )
+
+        policy = manifest.cache_policies.get(action_name) if action else None
+        if policy is not None:
+            key = action_cache_key(action.sha256, additional_vars, policy.inputs)
+            ps_result = await get_action_cache().get_or_run(
+                key, policy.ttl, run_action, flow_name=state["flow_name"], script=action_name
             )
-            if resp.status_code != 200:
-                logging.error(f"Failed to update worknotes: {resp.json()}")
-                raise Exception(f"Failed to update worknotes: {resp.json()}")
+        else:
+            ps_result = await run_action()
+        observe(
+            SCRIPT_SECONDS, started,
+            flow_name=state["flow_name"],
+            script=action_name,
+            interpreter=INTERPRETERS.get(os.path.splitext(action_path)[1].lower(), "unknown"),
+            status=ps_result["Status"],
+        )
+        updates["execution_log_count"] = log_execution(state["run_id"], {
+            "script": action_name,
+            "Status": ps_result["Status"],
+            "OutputMessage": ps_result["Outputs"],
+            "ErrorMessage": ps_result["ErrorMessage"],
+            "Stats": ps_result.get("Stats", {})
+        })
+ 
+        if ps_result["Status"] == "Error":
+            logging.error(f"Error executing {action_name}: {ps_result['ErrorMessage']}")
+            updates["worknotes"] = [f"Error in {action_name}: {ps_result['ErrorMessage']}"]
+            updates["error_occurred"] = True
+        else:
+            new_vars, note_content, error_occurred = parse_powershell_output(ps_result, {})
+            updates["additional_variables"] = new_vars
+            updates["worknotes"] = [note_content]
+            updates["error_occurred"] = error_occurred
  
-        state["worknote_content"] = "Worknotes updated successfully"
+    except Exception as e:
+        logging.error(f"Execution failed for {action_name}: {e}")
+        updates["worknotes"] = [f"Execution failed for {action_name}: {e}"]
+        updates["error_occurred"] = True
+ 
+    if updates.get("error_occurred"):
+        updates["failed_actions"] = [action_name]
+ 
+    log_state("Updates after executing action", updates)
+    return updates
+ 
+async def update_servicenow_worknotes(state: FlowState) -> dict:
+    """Stage the work notes produced since the last call on the ServiceNow record."""
+    logging.debug("Staging worknotes for ServiceNow.")
+    try:
+        table_name, sys_id = get_record_key(state)
+        notes = state["worknotes"][state["worknote_cursor"]:]
+        buffer = get_write_buffer()
+        for note in notes:
+            buffer.stage(table_name, sys_id, work_notes=note)
     except Exception as e:
         logging.error(f"Error updating worknotes: {e}")
         raise RuntimeError(f"Error updating worknotes: {e}")
  
-    logging.debug(f"State after updating worknotes: {state}")
-    return state
+    return {"worknote_cursor": len(state["worknotes"]), "worknote_content": "Worknotes updated successfully"}
  
 
-async def update_servicenow_assignment_group(state: FlowState):
+async def update_servicenow_assignment_group(state: FlowState) -> dict:
+    """Stage the reassignment of the ticket to the flow's fallback group and return its execution log entry."""
     try:
-        task_response = state["task_response"]
-        reassignment_group_sys_id = state["reassignment_group"]
-        data = {"assignment_group": reassignment_group_sys_id}
- 
-        table_name = task_response["result"][0]["sys_class_name"]
-        sys_id = task_response["result"][0]["sys_id"]
-        url = f"{endpoint}/api/now/table/{table_name}/{sys_id}"
- 
-        async with httpx.AsyncClient() as client:
-            auth = (user, pwd)
-            resp = await client.put(
-                url,
-                auth=auth,
-                headers={"Content-Type": "application/json", "Accept": "application/json"},
-                data=json.dumps(data)
-            )
-            if resp.status_code != 200:
-                raise Exception(f"Failed to update assignment group: {resp.json()}")
- 
-        state["worknote_content"] = "Worknotes updated successfully"
-        # Log the updated ticket state in execution_log
-        state["execution_log"].append({
+        table_name, sys_id = get_record_key(state)
+        get_write_buffer().stage(table_name, sys_id, assignment_group=state["reassignment_group"])
+        return {
             "action": "update_servicenow_assignment_group",
-        })
+        }
     except Exception as e:
         raise RuntimeError(f"Error updating assignment group: {e}")
-    return state
+ 
+async def flush_servicenow_updates(state: FlowState, final: bool = False) -> None:
+    """
+    Send everything staged for this ticket as one PATCH. With consolidated
+    work notes enabled, notes are only sent when `final` is True.
+    """
+    table_name, sys_id = get_record_key(state)
+    await get_write_buffer().flush(table_name, sys_id, final=final)
  
 # -----------------------------------------------------------------------
 # Decide Whether to Continue or End
 # -----------------------------------------------------------------------
-def determine_flow_outcome(state: FlowState) -> Literal["execute_flow_script", END]:  # type: ignore
-    return "execute_flow_script" if state["next_action"] else END
+def determine_flow_outcome(state: FlowState):
+    """Fan out one execute_flow_script branch per ready action, or end the flow."""
+    if not state["next_action"]:
+        return END
+    return [Send("execute_flow_script", {**state, "current_action": action}) for action in state["pending_actions"]]
  
 # -----------------------------------------------------------------------
 # Build and Compile the StateGraph
 # -----------------------------------------------------------------------
+def instrument_node(node):
+    """Latency histogram (metrics) plus a span when the run is traced."""
+    return timed_node(traced_node(node))
+
 builder = StateGraph(FlowState)
  
-builder.add_node("initialize_flow_state", initialize_flow_state)
-builder.add_node("retrieve_flow_scripts", retrieve_flow_scripts)
-builder.add_node("evaluate_flow_decision", evaluate_flow_decision)
-builder.add_node("execute_flow_script", execute_flow_script)
-builder.add_node("update_servicenow_worknotes", update_servicenow_worknotes)
+builder.add_node("initialize_flow_state", instrument_node(initialize_flow_state))
+builder.add_node("retrieve_flow_scripts", instrument_node(retrieve_flow_scripts))
+builder.add_node("evaluate_flow_decision", instrument_node(evaluate_flow_decision))
+builder.add_node("execute_flow_script", instrument_node(execute_flow_script))
+builder.add_node("update_servicenow_worknotes", instrument_node(update_servicenow_worknotes))
  
 builder.add_edge(START, "initialize_flow_state")
 builder.add_edge("initialize_flow_state", "retrieve_flow_scripts")
 builder.add_edge("retrieve_flow_scripts", "evaluate_flow_decision")
-builder.add_conditional_edges("evaluate_flow_decision", determine_flow_outcome)
+builder.add_conditional_edges("evaluate_flow_decision", determine_flow_outcome, ["execute_flow_script", END])
 builder.add_edge("execute_flow_script", "update_servicenow_worknotes")
 builder.add_edge("update_servicenow_worknotes", "evaluate_flow_decision")
  
@@ -465,13 +457,29 @@ _graph = None
  
 async def init_graph():
     """
-    Initialize and return the compiled StateGraph with the AsyncSqliteSaver.
+    Initialize and return the compiled StateGraph with the SQLite checkpointer
+    (sharded across CHECKPOINT_SHARDS files when > 1).
     This will be called once in the FastAPI startup event.
     """
     global _graph
     if _graph is None:
-        import aiosqlite
-        conn = await aiosqlite.connect(db_path, check_same_thread=False)
-        memory = AsyncSqliteSaver(conn)
+        await get_flow_registry().start()
+        await get_manifest_store().start()
+        await init_servicenow_client()
+        await get_write_buffer().start()
+        await get_powershell_pool().start()
+        await get_task_store().open()
+        await get_execution_log().start()
+        await get_action_cache().open()
+        memory = await open_checkpointer(db_path)
+        instrument_checkpointer(memory)
         _graph = builder.compile(checkpointer=memory)
-    return _graph
\ No newline at end of file
+        await init_checkpoint_maintenance(memory, _graph).start()
+    return _graph
+
+async def close_graph():
+    """Close the checkpointer connections. Called from the FastAPI shutdown event."""
+    global _graph
+    if _graph is not None:
+        await close_checkpointer(_graph.checkpointer)
+        _graph = None
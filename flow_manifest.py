@@ -0,0 +1,361 @@
+"""
+Compiled flow manifests.
+
+Scans UseCases/<flow_name>/ once and produces, per flow, the ordered list of
+action scripts with their interpreter, content hash and cached text, so the
+graph never lists directories or re-reads scripts per ticket.
+
+A flow folder may contain a flow.yml declaring action dependencies:
+
+    depends_on:
+      "2 - Check_Ad_Group_Existence.ps1": ["1 - parse_variables.ps1"]
+      "3 - Check_Owner_Existance.ps1": ["1 - parse_variables.ps1"]
+
+Actions that are not listed depend on the action before them, so a flow
+without flow.yml runs strictly in order.
+
+Pure lookup actions can be marked cacheable; their successful results are
+reused for `ttl` seconds by tickets whose listed input variables match
+(all of additional_variables when `inputs` is omitted):
+
+    cacheable:
+      "3 - Check_Owner_Existance.ps1": {ttl: 300, inputs: [OwnerEmail]}
+
+Never mark an existence or uniqueness check that guards a create in the
+same flow: a second ticket for the same name would get the cached "free"
+answer and only fail in the create step.
+
+CLI:
+    python flow_manifest.py [--root UseCases] [--flow NAME] [--output manifest.json]
+"""
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+import argparse
+import yaml
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from script_runner import INTERPRETERS
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+USE_CASES_DIR = os.getenv("USE_CASES_DIR", "UseCases")
+FLOW_MANIFEST_POLL_SECONDS = float(os.getenv("FLOW_MANIFEST_POLL_SECONDS", "5"))
+
+FLOW_SPEC_FILE = "flow.yml"
+
+_ORDER_PREFIX = re.compile(r"^\s*(\d+)")
+
+
+# -----------------------------------------------------------------------
+# Manifest Model
+# -----------------------------------------------------------------------
+@dataclass(frozen=True)
+class ActionEntry:
+    name: str
+    path: str
+    interpreter: str
+    sha256: str
+    text: str = field(repr=False)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "path": self.path, "interpreter": self.interpreter, "sha256": self.sha256}
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float
+    inputs: Optional[Tuple[str, ...]] = None  # None: key on every additional variable
+
+    def to_dict(self) -> dict:
+        return {"ttl": self.ttl, "inputs": list(self.inputs) if self.inputs is not None else None}
+
+
+@dataclass(frozen=True)
+class FlowManifest:
+    flow_name: str
+    actions: Tuple[ActionEntry, ...]
+    dependencies: Dict[str, list] = field(default_factory=dict)
+    cache_policies: Dict[str, CachePolicy] = field(default_factory=dict)
+    signature: tuple = field(repr=False, compare=False, default=())
+
+    @property
+    def sha256(self) -> str:
+        digest = hashlib.sha256()
+        for action in self.actions:
+            digest.update(f"{action.name}\0{action.sha256}\0".encode())
+        return digest.hexdigest()
+
+    def action_names(self) -> list:
+        return [action.name for action in self.actions]
+
+    def get(self, name: str) -> Optional[ActionEntry]:
+        for action in self.actions:
+            if action.name == name:
+                return action
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "flow_name": self.flow_name,
+            "sha256": self.sha256,
+            "actions": [
+                {
+                    **a.to_dict(),
+                    "depends_on": self.dependencies.get(a.name, []),
+                    "cache": self.cache_policies[a.name].to_dict() if a.name in self.cache_policies else None,
+                }
+                for a in self.actions
+            ],
+        }
+
+
+def action_sort_key(name: str) -> tuple:
+    """Order "1 - x", "2 - y", ..., "10 - z" numerically; unnumbered files go last."""
+    match = _ORDER_PREFIX.match(name)
+    return (0, int(match.group(1)), name.lower()) if match else (1, 0, name.lower())
+
+
+def _flow_signature(flow_dir: str) -> tuple:
+    """Cheap change detector: (name, mtime_ns, size) of every file in the flow folder."""
+    with os.scandir(flow_dir) as entries:
+        return tuple(sorted(
+            (e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in entries if e.is_file()
+        ))
+
+
+def resolve_dependencies(flow_name: str, action_names: list, declared: dict) -> Dict[str, list]:
+    """
+    Combine flow.yml `depends_on` with the sequential default (each action
+    waits for the previous one). Unknown action names are dropped with an error.
+    """
+    dependencies = {}
+    for index, name in enumerate(action_names):
+        listed = declared.get(name)
+        if isinstance(listed, str):
+            listed = [listed]
+        if name in declared and not isinstance(listed, (list, type(None))):
+            logging.error(f"Flow {flow_name}: depends_on of {name} must be a list; keeping the sequential default.")
+        elif name in declared:
+            deps = []
+            for dep in listed or []:
+                if dep in action_names and dep != name:
+                    deps.append(dep)
+                else:
+                    logging.error(f"Flow {flow_name}: {name} depends on unknown action {dep!r}; ignoring it.")
+            dependencies[name] = deps
+            continue
+        dependencies[name] = [action_names[index - 1]] if index else []
+    for name in declared:
+        if name not in action_names:
+            logging.error(f"Flow {flow_name}: {FLOW_SPEC_FILE} lists unknown action {name!r}.")
+    return dependencies
+
+
+def resolve_cache_policies(flow_name: str, action_names: list, declared: dict) -> Dict[str, CachePolicy]:
+    """Validate flow.yml `cacheable` entries; invalid or unknown ones are dropped with an error."""
+    policies = {}
+    for name, options in declared.items():
+        if name not in action_names:
+            logging.error(f"Flow {flow_name}: {FLOW_SPEC_FILE} marks unknown action {name!r} cacheable.")
+            continue
+        options = options or {}
+        if not isinstance(options, dict):
+            logging.error(f"Flow {flow_name}: cacheable action {name!r} needs a mapping with a ttl; not caching it.")
+            continue
+        try:
+            ttl = float(options.get("ttl", 0))
+        except (TypeError, ValueError):
+            ttl = 0
+        if ttl <= 0:
+            logging.error(f"Flow {flow_name}: cacheable action {name!r} needs a positive ttl; not caching it.")
+            continue
+        inputs = options.get("inputs")
+        policies[name] = CachePolicy(ttl=ttl, inputs=tuple(inputs) if inputs is not None else None)
+    return policies
+
+
+def _load_flow_spec(flow_name: str, path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            spec = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except yaml.YAMLError as e:
+        logging.error(f"Flow {flow_name}: invalid {FLOW_SPEC_FILE}, running sequentially: {e}")
+        return {}
+    if not isinstance(spec, dict):
+        logging.error(f"Flow {flow_name}: {FLOW_SPEC_FILE} is not a mapping, running sequentially.")
+        return {}
+    return spec
+
+
+def _spec_section(flow_name: str, spec: dict, key: str) -> dict:
+    section = spec.get(key) or {}
+    if not isinstance(section, dict):
+        logging.error(f"Flow {flow_name}: {FLOW_SPEC_FILE} `{key}` is not a mapping; ignoring it.")
+        return {}
+    return section
+
+
+def compile_flow_manifest(flow_name: str, root: str = USE_CASES_DIR) -> FlowManifest:
+    """Build the manifest of one flow folder. Raises FileNotFoundError if it does not exist."""
+    flow_dir = os.path.join(root, flow_name)
+    signature = _flow_signature(flow_dir)
+    actions = []
+    for name in sorted((entry[0] for entry in signature), key=action_sort_key):
+        if name == FLOW_SPEC_FILE:
+            continue
+        interpreter = INTERPRETERS.get(os.path.splitext(name)[1].lower())
+        if interpreter is None:
+            logging.warning(f"Skipping unsupported file in flow {flow_name}: {name}")
+            continue
+        path = os.path.join(flow_dir, name)
+        with open(path, "rb") as f:
+            raw = f.read()
+        actions.append(ActionEntry(
+            name=name,
+            path=path,
+            interpreter=interpreter,
+            sha256=hashlib.sha256(raw).hexdigest(),
+            text=raw.decode("utf-8-sig", errors="replace"),
+        ))
+    spec = _load_flow_spec(flow_name, os.path.join(flow_dir, FLOW_SPEC_FILE))
+    action_names = [a.name for a in actions]
+    dependencies = resolve_dependencies(flow_name, action_names, _spec_section(flow_name, spec, "depends_on"))
+    cache_policies = resolve_cache_policies(flow_name, action_names, _spec_section(flow_name, spec, "cacheable"))
+    return FlowManifest(
+        flow_name=flow_name,
+        actions=tuple(actions),
+        dependencies=dependencies,
+        cache_policies=cache_policies,
+        signature=signature,
+    )
+
+
+def compile_manifests(root: str = USE_CASES_DIR) -> Dict[str, FlowManifest]:
+    """Compile every flow folder under `root`."""
+    manifests = {}
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                manifests[entry.name] = compile_flow_manifest(entry.name, root)
+    return manifests
+
+
+# -----------------------------------------------------------------------
+# Manifest Store
+# -----------------------------------------------------------------------
+class ManifestStore:
+    """
+    In-memory manifests for all flows, compiled at startup and refreshed by a
+    background watcher. Each refresh replaces the dict in one assignment, so
+    readers always see a consistent set.
+    """
+
+    def __init__(self, root: str = USE_CASES_DIR, poll_interval: float = FLOW_MANIFEST_POLL_SECONDS):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._manifests: Dict[str, FlowManifest] = {}
+        self._loaded = False
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self, flow_name: str) -> Optional[FlowManifest]:
+        return self._manifests.get(flow_name)
+
+    def load(self) -> None:
+        self._manifests = compile_manifests(self.root)
+        self._loaded = True
+        logging.info(f"Compiled manifests for {len(self._manifests)} flows from {self.root}")
+
+    def refresh(self) -> bool:
+        """Recompile flows whose folder changed (and pick up new/removed flows)."""
+        try:
+            with os.scandir(self.root) as entries:
+                flow_names = [e.name for e in entries if e.is_dir()]
+        except OSError as e:
+            logging.error(f"Manifest watcher cannot scan {self.root}: {e}")
+            return False
+
+        current = self._manifests
+        updated = {}
+        changed = set(current) - set(flow_names)
+        for flow_name in flow_names:
+            manifest = current.get(flow_name)
+            try:
+                signature = _flow_signature(os.path.join(self.root, flow_name))
+                if manifest is None or manifest.signature != signature:
+                    manifest = compile_flow_manifest(flow_name, self.root)
+                    changed.add(flow_name)
+            except OSError as e:
+                logging.error(f"Manifest watcher failed to compile {flow_name}: {e}")
+                if manifest is None:
+                    continue
+            updated[flow_name] = manifest
+
+        if changed:
+            self._manifests = updated
+            logging.info(f"Recompiled flow manifests: {sorted(changed)}")
+        return bool(changed)
+
+    async def start(self) -> None:
+        if not self._loaded:
+            await asyncio.to_thread(self.load)
+        if self._watch_task is None and self.poll_interval > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logging.error(f"Manifest watcher failed, keeping previous manifests: {e}")
+
+
+_store: Optional[ManifestStore] = None
+
+
+def get_manifest_store() -> ManifestStore:
+    """Return the process-wide ManifestStore. Call `await store.start()` before use."""
+    global _store
+    if _store is None:
+        _store = ManifestStore()
+    return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile ordered, content-hashed manifests of UseCases flows.")
+    parser.add_argument("--root", default=USE_CASES_DIR, help="Folder containing one sub-folder per flow.")
+    parser.add_argument("--flow", help="Only compile this flow.")
+    parser.add_argument("--output", help="Write the manifest JSON to this file instead of stdout.")
+    args = parser.parse_args()
+
+    if args.flow:
+        compiled = {args.flow: compile_flow_manifest(args.flow, args.root)}
+    else:
+        compiled = compile_manifests(args.root)
+    document = json.dumps({name: m.to_dict() for name, m in sorted(compiled.items())}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
@@ -0,0 +1,137 @@
+import os
+import asyncio
+import logging
+import yaml
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+# -----------------------------------------------------------------------
+# Flow Registry
+# -----------------------------------------------------------------------
+FLOW_DETAILS_PATH = os.getenv("FLOW_DETAILS_PATH", "flow_details.yml")
+FLOW_REGISTRY_POLL_SECONDS = float(os.getenv("FLOW_REGISTRY_POLL_SECONDS", "5"))
+
+# Prefer the libyaml-backed loader when PyYAML was built with it.
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_flow_index(path: str) -> Mapping[str, dict]:
+    """
+    Parse flow_details.yml and build a read-only index keyed by short_description.
+    Raises ValueError if the file is missing, is not valid YAML or an entry
+    is malformed.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            yaml_data = yaml.load(f, Loader=_YamlLoader) or {}
+        if not isinstance(yaml_data, dict):
+            raise ValueError(f"{path} must be a mapping with a 'flows' list, got {type(yaml_data).__name__}.")
+        flow_map = {
+            item["short_description"]: {
+                "flow_name": item["flow_name"],
+                "reassignment_group": item["reassignment_group"],
+                # Optional: group whose open tasks the ServiceNow poller picks up.
+                "assignment_group": item.get("assignment_group"),
+            }
+            for item in yaml_data.get("flows", [])
+        }
+    except FileNotFoundError:
+        raise ValueError(f"{path} file not found.")
+    except KeyError as e:
+        raise ValueError(f"Missing key in {path}: {e}")
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML in {path}: {e}")
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"Malformed flow entry in {path}: {e}")
+    return MappingProxyType(flow_map)
+
+
+class FlowRegistry:
+    """
+    In-memory index of flow_details.yml.
+
+    The index is loaded once and swapped atomically (a single reference
+    assignment) whenever the file's mtime changes, so `lookup` is a plain
+    dict access that never touches the filesystem. Reloads happen in a
+    worker thread driven by `start()`.
+    """
+
+    def __init__(self, path: str = FLOW_DETAILS_PATH, poll_interval: float = FLOW_REGISTRY_POLL_SECONDS):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._index: Mapping[str, dict] = MappingProxyType({})
+        self._mtime: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def loaded(self) -> bool:
+        return self._mtime is not None
+
+    def load(self) -> None:
+        """Load the index synchronously (used at startup and by the watcher thread)."""
+        mtime = os.stat(self.path).st_mtime
+        index = load_flow_index(self.path)
+        self._index, self._mtime = index, mtime
+        logging.info(f"Flow registry loaded {len(index)} flows from {self.path}")
+
+    def reload_if_changed(self) -> bool:
+        """Reload the index if the file's mtime changed. Keeps the old index on failure."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logging.error(f"Flow registry cannot stat {self.path}: {e}")
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            self.load()
+        except ValueError as e:
+            logging.error(f"Flow registry reload failed, keeping previous index: {e}")
+            return False
+        return True
+
+    def lookup(self, short_description: str) -> Optional[dict]:
+        """Return the flow mapping for a short_description, or None."""
+        return self._index.get(short_description)
+
+    def assignment_groups(self) -> list:
+        """Distinct assignment_group sys_ids declared in flow_details.yml, in file order."""
+        return list(dict.fromkeys(m["assignment_group"] for m in self._index.values() if m.get("assignment_group")))
+
+    async def start(self) -> None:
+        """Load the index off-loop and start watching the file for changes."""
+        if not self.loaded:
+            await asyncio.to_thread(self.load)
+        if self._watch_task is None and self.poll_interval > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logging.error(f"Flow registry reload failed, keeping previous index: {e}")
+
+
+_registry: Optional[FlowRegistry] = None
+
+
+def get_flow_registry() -> FlowRegistry:
+    """Return the process-wide FlowRegistry. Call `await registry.start()` before use."""
+    global _registry
+    if _registry is None:
+        _registry = FlowRegistry()
+    return _registry
@@ -0,0 +1,184 @@
+"""
+Process-wide logging: records are handed to a QueueHandler on the event
+loop and formatted/written by a QueueListener thread, so the loop never
+pays for I/O, nor for formatting messages whose arguments are scalars.
+Messages with container arguments (state dicts) are rendered when logged,
+since the graph may change those containers before the listener runs.
+
+Every record carries the ticket it belongs to (thread_id, ticket number)
+and the graph node that emitted it. Messages are truncated to
+LOG_MAX_FIELD_CHARS, and `log_state()` dumps of large payloads are
+sampled (LOG_STATE_SAMPLE_RATE).
+
+LOG_FORMAT=json emits one JSON object per line; the default text format
+matches the previous basicConfig output with the ticket appended.
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "4000"))
+# Fraction (0..1) of log_state() dumps that are emitted.
+LOG_STATE_SAMPLE_RATE = float(os.getenv("LOG_STATE_SAMPLE_RATE", "1.0"))
+# Chatty third-party loggers held at INFO even when LOG_LEVEL=DEBUG.
+LOG_QUIET_LOGGERS = os.getenv("LOG_QUIET_LOGGERS", "aiosqlite,httpcore,multipart")
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s%(ticket_suffix)s'
+# Arguments that cannot change after the call, so `msg % args` can wait for the listener.
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+_log_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+_listener: Optional[QueueListener] = None
+
+
+def bind_log_context(**fields) -> contextvars.Token:
+    """Attach fields (thread_id, ticket, ...) to every record logged from this task and its children."""
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: contextvars.Token) -> None:
+    _log_context.reset(token)
+
+
+def _current_node() -> Optional[str]:
+    # LangGraph runs each node inside a runnable config context; read it
+    # directly rather than via get_config(), which raises outside a graph.
+    from langchain_core.runnables.config import var_child_runnable_config
+    config = var_child_runnable_config.get(None)
+    return (config or {}).get("metadata", {}).get("langgraph_node")
+
+
+def _truncate(text: str) -> str:
+    if LOG_MAX_FIELD_CHARS > 0 and len(text) > LOG_MAX_FIELD_CHARS:
+        return f"{text[:LOG_MAX_FIELD_CHARS]}... [truncated {len(text) - LOG_MAX_FIELD_CHARS} chars]"
+    return text
+
+
+# -----------------------------------------------------------------------
+# Handlers and Formatters
+# -----------------------------------------------------------------------
+class ContextFilter(logging.Filter):
+    """Runs on the emitting task: stamps the record with the bound ticket context and node."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        record.thread_id = context.get("thread_id")
+        record.ticket = context.get("ticket")
+        record.node = _current_node()
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves `msg % args` to the listener thread when every
+    argument is an immutable scalar. Other arguments (dicts, lists, ...)
+    may be live graph state that keeps changing, so those messages are
+    rendered, and truncated, before the record is queued.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = _truncate(record.getMessage())
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = _truncate(record.getMessage())
+        record.asctime = self.formatTime(record, self.datefmt)
+        parts = [f"{k}={getattr(record, k)}" for k in ("thread_id", "node") if getattr(record, k, None)]
+        record.ticket_suffix = f" [{' '.join(parts)}]" if parts else ""
+        text = self.formatMessage(record)
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _truncate(record.getMessage()),
+        }
+        for key in ("thread_id", "ticket", "node"):
+            value = getattr(record, key, None)
+            if value:
+                document[key] = value
+        if record.exc_text:
+            document["exc"] = record.exc_text
+        return json.dumps(document, default=str)
+
+
+def configure_logging() -> None:
+    """Install the queue-backed root handler once per process."""
+    global _listener
+    if _listener is not None:
+        return
+    if LOG_FILE:
+        target = logging.FileHandler(LOG_FILE, encoding="utf-8")
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    for name in filter(None, (n.strip() for n in LOG_QUIET_LOGGERS.split(","))):
+        logging.getLogger(name).setLevel(max(logging.INFO, root.level))
+
+    _listener = QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Drain the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_state(message: str, payload, level: int = logging.DEBUG) -> None:
+    """
+    Log a (possibly large) state/update dict. Skipped without formatting when
+    the level is disabled or the record is sampled out; otherwise the dict is
+    rendered when logged (it may be live state) and truncated to
+    LOG_MAX_FIELD_CHARS.
+    """
+    if not logging.getLogger().isEnabledFor(level):
+        return
+    if LOG_STATE_SAMPLE_RATE < 1.0 and random.random() >= LOG_STATE_SAMPLE_RATE:
+        return
+    logging.log(level, "%s: %s", message, payload)
@@ -1,54 +1,419 @@
-import json
+import os
+import time
+import asyncio
 import logging
-from DataModel.ServiceNowAPI import APIResponse
-from fastapi import FastAPI, HTTPException
+from typing import Literal, Optional
+from DataModel.ServiceNowAPI import LeanAPIResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import uvicorn
  
 # Import our flow logic
-from flow_logic import init_graph
+from flow_logic import close_graph, init_graph
+from servicenow_client import close_servicenow_client
+from servicenow_writes import get_write_buffer
+from task_queue import TaskWorkerPool, QueueFullError
+from powershell_pool import get_powershell_pool
+from python_executor import get_python_executor
+from script_io import close_task_files
+from flow_manifest import get_manifest_store
+from flow_registry import get_flow_registry
+from checkpoint_maintenance import get_checkpoint_maintenance
+from task_store import get_task_store, slim_task
+from execution_log import get_execution_log
+from action_cache import get_action_cache
+from single_flight import get_single_flight
+from fast_json import FastJSONResponse, JSONDecodeError, dumps, loads
+from servicenow_poller import POLLER_ENABLED, get_servicenow_poller, init_servicenow_poller
+from logging_setup import bind_log_context, reset_log_context, stop_logging
+from tracing import capture_run, get_profile, get_trace
+from metrics import CONTENT_TYPE, GRAPH_RUNS, GRAPH_RUN_SECONDS, TICKETS_IN_FLIGHT, TICKETS_QUEUED, observe, render_metrics
  
+# Max tickets of one /api/tasks/batch call running through the graph at once.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
 app = FastAPI()
 graph = None  # We'll initialize this on startup
+task_pool = None  # Worker pool for async (202) submissions
+
+async def run_flow(
+    thread_id: str,
+    task_response: dict,
+    callbacks: Optional[list] = None,
+    trace: bool = False,
+    profile: bool = False,
+    restart: bool = False,
+    rerun_completed: bool = False,
+    captured: Optional[dict] = None,
+) -> dict:
+    """
+    Run one ticket through invoke_flow under single-flight: a submission
+    for a thread_id that is already running (or finished within
+    SINGLE_FLIGHT_WINDOW_SECONDS without an error) gets that run's final
+    state. `restart` and `rerun_completed` skip the finished-run window but
+    still join a run in flight. `captured` is only filled in when this
+    call ran the graph itself (see invoke_flow).
+    """
+    single_flight = get_single_flight()
+    if restart or rerun_completed:
+        single_flight.forget(thread_id)
+    final_state = await single_flight.run(
+        thread_id,
+        lambda: invoke_flow(thread_id, task_response, callbacks, trace, profile, restart, rerun_completed, captured),
+    )
+    if final_state.get("error_occurred"):
+        # A failed run is not remembered: the next submission resumes it.
+        single_flight.forget(thread_id)
+    return final_state
+
+async def invoke_flow(
+    thread_id: str,
+    task_response: dict,
+    callbacks: Optional[list] = None,
+    trace: bool = False,
+    profile: bool = False,
+    restart: bool = False,
+    rerun_completed: bool = False,
+    captured: Optional[dict] = None,
+) -> dict:
+    """
+    Invoke the graph for one ticket on its own thread_id. The payload is
+    stored once in the task blob store; state only carries its reference
+    and the slim projection nodes use. `trace`/`profile` capture a span
+    trace / sampling profile of this run (see tracing.py).
+
+    A thread_id that already has checkpoints is resumed instead of rerun:
+    an interrupted run continues from its last checkpoint, a run that
+    ended in an error retries only its failed actions, and a run that
+    completed is returned as is. `restart=True` runs from START regardless;
+    `rerun_completed=True` runs a completed thread again from START (a
+    re-opened ticket) but still resumes interrupted and failed runs.
+
+    `captured`, when given, is updated with {"trace": bool, "profile": bool}
+    for what this invocation recorded; a completed thread records nothing.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    if callbacks:
+        config["callbacks"] = callbacks
+    task = slim_task(task_response)
+    token = bind_log_context(thread_id=thread_id, ticket=task.get("number"))
+    started = time.perf_counter()
+    flow_name, outcome = "unknown", "exception"
+    TICKETS_IN_FLIGHT.inc()
+    try:
+        graph_input, mode = await plan_run(config, restart, rerun_completed)
+        if mode == "completed":
+            final_state = graph_input
+        else:
+            if graph_input is not None:
+                graph_input = {**graph_input, "task_ref": await get_task_store().put(task_response), "task": task}
+            async with capture_run(thread_id, trace=trace, profile=profile) as run:
+                final_state = await graph.ainvoke(graph_input, config=config)
+            if captured is not None:
+                captured.update(trace=run.trace is not None, profile=run.profiler is not None)
+        flow_name = final_state.get("flow_name") or "unknown"
+        outcome = mode if mode != "run" else ("error" if final_state.get("error_occurred") else "success")
+        return final_state
+    finally:
+        TICKETS_IN_FLIGHT.dec()
+        GRAPH_RUNS.inc(flow_name=flow_name, outcome=outcome)
+        observe(GRAPH_RUN_SECONDS, started, flow_name=flow_name, outcome=outcome)
+        reset_log_context(token)
  
+async def plan_run(config: dict, restart: bool, rerun_completed: bool = False) -> tuple:
+    """
+    Decide how to (re)enter a thread from its last checkpoint. Returns
+    (graph input, mode); mode is "run" for a fresh start or an error
+    resume, "resumed" for continuing an interrupted run (input None) and
+    "completed" when there is nothing left to do (input is the final state).
+    With `rerun_completed` a completed thread starts over instead.
+    """
+    if restart:
+        return {"resume": False}, "run"
+    snapshot = await graph.aget_state(config)
+    values = snapshot.values or {}
+    if not values:
+        return {"resume": False}, "run"
+    if snapshot.next:
+        logging.info(f"Continuing interrupted run of {config['configurable']['thread_id']} at {list(snapshot.next)}")
+        return None, "resumed"
+    if values.get("error_occurred"):
+        return {"resume": True}, "run"
+    if rerun_completed:
+        logging.info(f"{config['configurable']['thread_id']} completed before; running it again.")
+        return {"resume": False}, "run"
+    logging.info(f"{config['configurable']['thread_id']} already completed; returning its final state.")
+    return values, "completed"
+
 @app.on_event("startup")
 async def startup_event():
     """
     On application startup, initialize our StateGraph by calling init_graph().
     """
-    global graph
+    global graph, task_pool
     graph = await init_graph()  # This ensures the graph is compiled once.
+    task_pool = TaskWorkerPool(run_flow)
+    task_pool.start()
+    TICKETS_QUEUED.set_function(lambda: task_pool.depth)
+    if POLLER_ENABLED:
+        await init_servicenow_poller(run_flow).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    On application shutdown, flush pending ServiceNow writes, stop the script workers
+    and close the pooled connections.
+    """
+    if get_servicenow_poller() is not None:
+        await get_servicenow_poller().stop()
+    if task_pool is not None:
+        await task_pool.stop()
+    await get_write_buffer().stop()
+    await get_powershell_pool().stop()
+    await get_python_executor().stop()
+    close_task_files()
+    await get_manifest_store().stop()
+    await get_flow_registry().stop()
+    if get_checkpoint_maintenance() is not None:
+        await get_checkpoint_maintenance().stop()
+    await close_graph()
+    await get_task_store().close()
+    await get_execution_log().stop()
+    await get_action_cache().close()
+    await close_servicenow_client()
+    stop_logging()
  
 @app.get("/")
 async def read_root():
     return {"message": "LangGraph Assistant is Running (Async)!"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: graph runs, node/script/ServiceNow/checkpoint latencies and ticket gauges."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+async def read_task_payload(request: Request) -> dict:
+    """
+    Decode an APIResponse body with the fast JSON codec and validate only
+    the fields the engine reads (LeanAPIResponse). The decoded dict itself
+    is returned, so every other task field passes through untouched and no
+    model_dump() copy is built.
+    """
+    try:
+        payload = loads(await request.body())
+    except JSONDecodeError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": f"JSON decode error: {e}", "input": None}])
+    try:
+        LeanAPIResponse.model_validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)])
+    return payload
+
 @app.post("/api/task")
-async def execute_flow(task_data: APIResponse):
+async def execute_flow(
+    task_response: dict = Depends(read_task_payload),
+    mode: Literal["sync", "async"] = "sync",
+    trace: bool = False,
+    profile: bool = False,
+    restart: bool = False,
+    x_trace: Optional[str] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+):
     """
     Endpoint to handle the flow for a given "number" (e.g. the ServiceNow Task Number).
     We will parse the JSON, create a thread_id, and invoke the graph.
+
+    With ?mode=async the task is queued on the worker pool and 202 is returned
+    immediately with the thread_id; poll GET /api/task/{thread_id} for progress.
+
+    In sync mode, ?trace=true (or an X-Trace header) records a span trace of
+    the run and ?profile=true (or X-Profile) samples it with the profiler;
+    the response links them (trace_url, profile_url) when this request ran
+    the graph, not when it joined a run in flight or the ticket was done.
+
+    Resubmitting a ticket resumes its thread from the last checkpoint (see
+    run_flow); ?restart=true reruns it from the start instead.
     """
     try:
-        # Build the dict in the same format as the original code expects:
-        task_response = task_data.model_dump()
-        
         # Construct a unique thread_id. For example:
         thread_id = "task_" + task_response["result"][0]["number"]
  
-        # Now invoke the graph asynchronously
-        output = graph.ainvoke(
-            {"task_response": task_response},
-            config={"configurable": {"thread_id": thread_id}}
-        )
+        if mode == "async":
+            try:
+                task_pool.submit(thread_id, task_response, restart=restart)
+            except QueueFullError as e:
+                raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+            return JSONResponse(
+                status_code=202,
+                content={"thread_id": thread_id, "status": "queued", "queue_depth": task_pool.depth}
+            )
  
-        # Since ainvoke returns an Awaitable, we either await it in an async route
-        # or wrap it in a sync call. Because this route is sync, let's do:
-        return await output
+        trace = trace or bool(x_trace)
+        profile = profile or bool(x_profile)
+        captured = {}
+        final_state = await run_flow(
+            thread_id, task_response, trace=trace, profile=profile, restart=restart, captured=captured
+        )
+        # The log lives outside the graph state; return it inline as before.
+        log = await get_execution_log().read(thread_id, final_state.get("run_id"), limit=None)
+        response = {**final_state, "execution_log": log["entries"]}
+        # Only when this request ran the graph: a joined or already completed run recorded nothing for it.
+        if trace and captured.get("trace"):
+            response["trace_url"] = f"/api/task/{thread_id}/trace"
+        if profile and captured.get("profile"):
+            response["profile_url"] = f"/api/task/{thread_id}/profile"
+        return FastJSONResponse(response)
  
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error executing flow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
  
+async def run_batch_item(thread_id: str, task_response: dict, slots: asyncio.Semaphore, restart: bool = False) -> dict:
+    """Run one ticket of a batch and summarise the outcome as one NDJSON record."""
+    number = task_response["result"][0]["number"]
+    async with slots:
+        started_at = time.perf_counter()
+        try:
+            final_state = await run_flow(thread_id, task_response, restart=restart)
+        except Exception as e:
+            logging.error(f"Batch flow for {thread_id} failed: {e}")
+            return {"thread_id": thread_id, "number": number, "status": "failed", "error": str(e),
+                    "duration": round(time.perf_counter() - started_at, 3)}
+    return {
+        "thread_id": thread_id,
+        "number": number,
+        "status": "completed",
+        "flow_name": final_state.get("flow_name"),
+        "error_occurred": final_state.get("error_occurred"),
+        "actions_completed": len(final_state.get("completed_actions") or []),
+        "duration": round(time.perf_counter() - started_at, 3),
+    }
+
+@app.post("/api/tasks/batch")
+async def execute_flow_batch(task_response: dict = Depends(read_task_payload), restart: bool = False):
+    """
+    Run every task of an APIResponse, each on its own graph thread, with at
+    most BATCH_MAX_CONCURRENCY in flight. Outcomes are streamed back as
+    NDJSON, one line per task, in completion order. A ticket number that
+    appears twice in the batch is reported as skipped, since both copies
+    would share one checkpoint thread. Tickets resume like POST /api/task
+    unless ?restart=true.
+    """
+    slots = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    items, duplicates = {}, []
+    for task in task_response["result"]:
+        thread_id = "task_" + task["number"]
+        if thread_id in items:
+            duplicates.append({"thread_id": thread_id, "number": task["number"], "status": "skipped",
+                               "error": "Duplicate ticket number in batch."})
+            continue
+        items[thread_id] = {**task_response, "result": [task]}
+
+    async def stream():
+        jobs = [asyncio.create_task(run_batch_item(t, payload, slots, restart)) for t, payload in items.items()]
+        try:
+            for record in duplicates:
+                yield dumps(record) + b"\n"
+            for finished in asyncio.as_completed(jobs):
+                yield dumps(await finished) + b"\n"
+        finally:
+            # Client went away: do not keep running flows nobody will read.
+            for job in jobs:
+                job.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/api/task/{thread_id}")
+async def get_flow_status(thread_id: str):
+    """
+    Report progress of a flow from the checkpointer, plus its queue status
+    when it was submitted in async mode.
+    """
+    job = task_pool.get_status(thread_id) if task_pool is not None else None
+    snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    values = snapshot.values or {}
+    if not values and job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown thread_id: {thread_id}")
+
+    if job is not None:
+        status = job["status"]
+    else:
+        status = "running" if snapshot.next else "completed"
+    return {
+        "thread_id": thread_id,
+        "status": status,
+        "error": job["error"] if job else "",
+        "flow_name": values.get("flow_name"),
+        "action_index": values.get("action_index"),
+        "actions_total": len(values.get("actions_list") or []),
+        "current_action": values.get("current_action"),
+        "error_occurred": values.get("error_occurred"),
+        "execution_log_count": values.get("execution_log_count"),
+        "next_nodes": list(snapshot.next),
+    }
+
+@app.get("/api/task/{thread_id}/log")
+async def get_flow_log(thread_id: str, run_id: Optional[str] = None, after: int = 0, limit: int = 100):
+    """
+    Page through a thread's execution log (latest run unless run_id is given).
+    Pass next_after from the response as ?after= to fetch the next page.
+    """
+    page = await get_execution_log().read(thread_id, run_id, after=after, limit=min(max(limit, 1), 1000))
+    if page["run_id"] is None:
+        raise HTTPException(status_code=404, detail=f"No execution log for thread_id: {thread_id}")
+    return page
+
+@app.get("/api/task/{thread_id}/trace")
+async def get_flow_trace(thread_id: str):
+    """Chrome trace-event JSON of the last traced run (open in chrome://tracing or Perfetto)."""
+    trace = get_trace(thread_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"No trace recorded for thread_id: {thread_id}")
+    return trace
+
+@app.get("/api/task/{thread_id}/profile")
+async def get_flow_profile(thread_id: str):
+    """Collapsed stacks of the last profiled run, for flamegraph.pl or speedscope."""
+    profiler = get_profile(thread_id)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail=f"No profile recorded for thread_id: {thread_id}")
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"X-Profile-Samples": str(sum(profiler.samples.values())), "X-Profile-Duration": f"{profiler.duration:.3f}"},
+    )
+
+@app.post("/api/poller/poll")
+async def run_poller_once():
+    """Run one ServiceNow poll now (also when POLLER_ENABLED is off) and report what it picked up."""
+    return await init_servicenow_poller(run_flow).poll_once()
+
+@app.get("/api/maintenance/checkpoints")
+async def checkpoint_stats():
+    """Row counts and file sizes of the checkpoint database."""
+    return await get_checkpoint_maintenance().stats()
+
+@app.post("/api/maintenance/checkpoints")
+async def run_checkpoint_maintenance(vacuum: bool = False):
+    """
+    Prune completed threads and expired log runs / ticket payloads and checkpoint
+    the WAL now; ?vacuum=true also rebuilds the file.
+    """
+    maintenance = get_checkpoint_maintenance()
+    result = await maintenance.prune_completed()
+    task_data = await maintenance.prune_task_data() if maintenance.task_data_days > 0 else {}
+    if vacuum:
+        await maintenance.vacuum()
+    return {
+        "pruned": result,
+        "pruned_task_data": task_data,
+        "wal_checkpoint": await maintenance.wal_checkpoint(),
+        "stats": await maintenance.stats(),
+    }
+
 if __name__ == "__main__":
     # Run the app using uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+In-process Prometheus metrics, rendered by GET /metrics in main.py.
+
+Counters, gauges and histograms are plain dicts of floats keyed by label
+values. They are only updated from the event loop thread, so the hot path
+takes no lock: an observation is one dict lookup, one bisect and a couple
+of float additions. Rendering walks the dicts at scrape time.
+"""
+import os
+import time
+import bisect
+import functools
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds; covers in-process actions (ms) up to slow scripts (minutes).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# -----------------------------------------------------------------------
+# Metric Types
+# -----------------------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Read the value from `function` at scrape time (e.g. a queue depth)."""
+        self._functions[self._key(labels)] = function
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        for key, function in list(self._functions.items()):
+            try:
+                values[key] = float(function())
+            except Exception:
+                continue
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (non-cumulative) + overflow slot, sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# -----------------------------------------------------------------------
+# Registry
+# -----------------------------------------------------------------------
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+GRAPH_RUNS = REGISTRY.register(Counter(
+    "flow_graph_runs_total", "Completed graph runs by flow and outcome (success, error, exception).", ("flow_name", "outcome")))
+GRAPH_RUN_SECONDS = REGISTRY.register(Histogram(
+    "flow_graph_run_seconds", "Wall time of one graph run.", ("flow_name", "outcome")))
+NODE_SECONDS = REGISTRY.register(Histogram(
+    "flow_node_seconds", "Wall time of one graph node invocation.", ("node", "status"), FAST_BUCKETS + DEFAULT_BUCKETS[-6:]))
+SCRIPT_SECONDS = REGISTRY.register(Histogram(
+    "flow_action_script_seconds", "Wall time of one action script, including slot waits.", ("flow_name", "script", "interpreter", "status")))
+SERVICENOW_SECONDS = REGISTRY.register(Histogram(
+    "servicenow_request_seconds", "ServiceNow Table API request latency.", ("operation", "status")))
+CHECKPOINT_WRITE_SECONDS = REGISTRY.register(Histogram(
+    "checkpoint_write_seconds", "Checkpointer write latency.", ("operation",), FAST_BUCKETS))
+ACTION_CACHE_REQUESTS = REGISTRY.register(Counter(
+    "action_cache_requests_total", "Lookups of cacheable actions by result (hit_memory, hit_sqlite, coalesced, miss).",
+    ("flow_name", "script", "result")))
+SINGLE_FLIGHT_REQUESTS = REGISTRY.register(Counter(
+    "flow_single_flight_requests_total", "Ticket submissions by how they were served (leader, joined, recent).", ("result",)))
+TICKETS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "flow_tickets_in_flight", "Tickets currently running through the graph."))
+TICKETS_QUEUED = REGISTRY.register(Gauge(
+    "flow_tickets_queued", "Tickets waiting in the async task queue."))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def timed_node(function: Callable) -> Callable:
+    """Wrap an async graph node so each call lands in flow_node_seconds under its function name."""
+    if not METRICS_ENABLED:
+        return function
+    node = function.__name__
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await function(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - started, node=node, status=status)
+
+    return wrapper
+
+
+def instrument_checkpointer(saver) -> None:
+    """Time aput/aput_writes on every SQLite saver behind `saver` (one per shard)."""
+    if not METRICS_ENABLED:
+        return
+    for shard in getattr(saver, "shards", [saver]):
+        for operation in ("aput", "aput_writes"):
+            original = getattr(shard, operation)
+
+            async def timed(*args, _original=original, _operation=operation, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await _original(*args, **kwargs)
+                finally:
+                    CHECKPOINT_WRITE_SECONDS.observe(time.perf_counter() - started, operation=_operation)
+
+            setattr(shard, operation, timed)
+
+
+def observe(histogram: Histogram, started: float, **labels) -> Optional[float]:
+    """Record perf_counter() - started on `histogram`; returns the elapsed seconds."""
+    if not METRICS_ENABLED:
+        return None
+    elapsed = time.perf_counter() - started
+    histogram.observe(elapsed, **labels)
+    return elapsed
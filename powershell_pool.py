@@ -0,0 +1,364 @@
+import os
+import re
+import json
+import time
+import base64
+import shlex
+import asyncio
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+from script_io import PROTOCOL_VERSION
+from script_runner import POWERSHELL_EXECUTABLE, kill_process_tree
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+# POWERSHELL_POOL_SIZE=0 disables the pool and every .ps1 action gets its own process.
+POWERSHELL_POOL_SIZE = int(os.getenv("POWERSHELL_POOL_SIZE", "0"))
+POWERSHELL_POOL_MAX_USES = int(os.getenv("POWERSHELL_POOL_MAX_USES", "200"))
+POWERSHELL_POOL_HEALTH_SECONDS = float(os.getenv("POWERSHELL_POOL_HEALTH_SECONDS", "30"))
+POWERSHELL_POOL_PING_TIMEOUT = float(os.getenv("POWERSHELL_POOL_PING_TIMEOUT", "10"))
+# Comma-separated modules imported once per worker, e.g. "ActiveDirectory".
+POWERSHELL_POOL_PRELOAD_MODULES = os.getenv("POWERSHELL_POOL_PRELOAD_MODULES", "")
+# Overrides the whole worker command line, e.g. to run a stub interpreter on Linux.
+POWERSHELL_POOL_COMMAND = os.getenv("POWERSHELL_POOL_COMMAND", "")
+# Parsed ticket payloads each worker keeps between requests.
+WORKER_TASK_CACHE = int(os.getenv("POWERSHELL_POOL_TASK_CACHE", "16"))
+
+# Every response line starts with this marker; anything else on stdout is stray
+# host output (e.g. [Console]::WriteLine in a script) and is skipped.
+RESPONSE_MARKER = "@@LGW@@"
+STREAM_LIMIT = 16 * 1024 * 1024
+
+# `exit` (or [Environment]::Exit) in a script body dot-sourced into the host
+# loop ends the worker itself, so such scripts get their own process.
+_EXIT_CALL = re.compile(r"\bexit\b", re.IGNORECASE)
+
+# -----------------------------------------------------------------------
+# Worker Host Script
+# -----------------------------------------------------------------------
+# Protocol (script_io version 1): one JSON request per stdin line
+#   {"id": 1, "op": "run", "v": 1, "script": "...", "task_file": "<path>", "inputs": {...}}
+#   {"id": 2, "op": "ping"}
+# and one response per stdout line, prefixed with RESPONSE_MARKER:
+#   {"id": 1, "exit_code": 0, "stdout": "...", "stderr": "...", "result": "<json>"|null}
+# The ticket is read from task_file, which script_io writes once per payload,
+# and each worker keeps the last WORKER_TASK_CACHE parsed tickets, so
+# consecutive steps of a flow neither resend nor re-parse it. `result` is
+# whatever the script passed to Write-ActionResult.
+WORKER_HOST_SCRIPT = r"""
+$ProgressPreference = 'SilentlyContinue'
+__PRELOAD__
+$stdin = [Console]::In
+$stdout = [Console]::Out
+$taskCache = [ordered]@{}
+function Write-ActionResult($Result) {
+    $script:actionResult = if ($Result -is [string]) { $Result } else { $Result | ConvertTo-Json -Compress -Depth 10 }
+}
+while ($true) {
+    $line = $stdin.ReadLine()
+    if ($null -eq $line) { break }
+    $request = $line | ConvertFrom-Json
+    if ($request.op -eq 'ping') {
+        $stdout.WriteLine('__MARKER__' + (@{ id = $request.id; op = 'pong' } | ConvertTo-Json -Compress))
+        $stdout.Flush()
+        continue
+    }
+    $exitCode = 0
+    $errorText = ''
+    $records = @()
+    $script:actionResult = $null
+    try {
+        if (-not $taskCache.Contains($request.task_file)) {
+            if ($taskCache.Count -ge __TASK_CACHE__) { $taskCache.RemoveAt(0) }
+            $taskCache[$request.task_file] = Get-Content -Raw -LiteralPath $request.task_file | ConvertFrom-Json
+        }
+        $jsonObject = $taskCache[$request.task_file]
+        $records = & {
+            $SCTASK_RESPONSE = $jsonObject.result
+            $ADDITIONAL_VARIABLES = $request.inputs
+            . ([scriptblock]::Create($request.script))
+        } *>&1
+    } catch {
+        $exitCode = 1
+        $errorText = $_ | Out-String
+    }
+    $errors = $records | Where-Object { $_ -is [System.Management.Automation.ErrorRecord] }
+    $output = $records | Where-Object { $_ -isnot [System.Management.Automation.ErrorRecord] }
+    if ($errors) { $errorText = (($errors | Out-String) + $errorText) }
+    $response = @{
+        id = $request.id
+        exit_code = $exitCode
+        stdout = ($output | Out-String)
+        stderr = $errorText
+        result = $script:actionResult
+    } | ConvertTo-Json -Compress
+    $stdout.WriteLine('__MARKER__' + $response)
+    $stdout.Flush()
+}
+"""
+
+
+@lru_cache(maxsize=256)
+def calls_exit(script: str) -> bool:
+    """True if the script may call exit; a word match, so comments and strings count too."""
+    return _EXIT_CALL.search(script) is not None
+
+
+def build_worker_command() -> List[str]:
+    if POWERSHELL_POOL_COMMAND:
+        return shlex.split(POWERSHELL_POOL_COMMAND)
+    preload = "\n".join(
+        f"Import-Module {name.strip()} -ErrorAction SilentlyContinue"
+        for name in POWERSHELL_POOL_PRELOAD_MODULES.split(",") if name.strip()
+    )
+    script = (
+        WORKER_HOST_SCRIPT.replace("__PRELOAD__", preload)
+        .replace("__MARKER__", RESPONSE_MARKER)
+        .replace("__TASK_CACHE__", str(max(1, WORKER_TASK_CACHE)))
+    )
+    encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+    return [POWERSHELL_EXECUTABLE, "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+class WorkerError(Exception):
+    """The worker process died or spoke out of protocol."""
+
+
+# -----------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------
+class PowerShellWorker:
+    """One long-lived PowerShell process serving framed requests over stdin/stdout."""
+
+    def __init__(self, command: List[str]):
+        self.command = command
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.uses = 0
+        self.last_used = time.monotonic()
+        self._next_id = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        kwargs = {"creationflags": 0x00000200} if os.name == "nt" else {"start_new_session": True}
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=STREAM_LIMIT,
+            **kwargs
+        )
+
+    async def _call(self, request: dict) -> dict:
+        if not self.alive:
+            raise WorkerError("PowerShell worker is not running.")
+        self._next_id += 1
+        request["id"] = self._next_id
+        self.process.stdin.write(json.dumps(request).encode() + b"\n")
+        await self.process.stdin.drain()
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise WorkerError(f"PowerShell worker exited (code {self.process.returncode}).")
+            text = line.decode(errors="replace").strip()
+            if not text.startswith(RESPONSE_MARKER):
+                logging.debug(f"PowerShell worker stray output: {text}")
+                continue
+            response = json.loads(text[len(RESPONSE_MARKER):])
+            if response.get("id") != request["id"]:
+                raise WorkerError(f"Out-of-order response {response.get('id')} for request {request['id']}.")
+            return response
+
+    async def execute(self, script: str, task_file: str, inputs: dict) -> dict:
+        self.uses += 1
+        self.last_used = time.monotonic()
+        return await self._call({
+            "op": "run",
+            "v": PROTOCOL_VERSION,
+            "script": script,
+            "task_file": task_file,
+            "inputs": inputs,
+        })
+
+    async def ping(self, timeout: float = POWERSHELL_POOL_PING_TIMEOUT) -> bool:
+        try:
+            response = await asyncio.wait_for(self._call({"op": "ping"}), timeout=timeout)
+            return response.get("op") == "pong"
+        except (WorkerError, asyncio.TimeoutError, ValueError, OSError):
+            return False
+
+    def kill(self) -> None:
+        if self.process is not None:
+            kill_process_tree(self.process)
+
+    async def close(self) -> None:
+        """Kill the worker and reap it, so its pipes are closed on this loop."""
+        self.kill()
+        if self.process is not None:
+            await self.process.wait()
+
+
+# -----------------------------------------------------------------------
+# Pool
+# -----------------------------------------------------------------------
+class PowerShellPool:
+    """
+    Bounded pool of warm PowerShell workers.
+
+    Workers are spawned lazily up to `size`, recycled after `max_uses`
+    requests, killed on timeout or protocol errors, and pinged while idle
+    by a background health check.
+    """
+
+    def __init__(
+        self,
+        size: int = POWERSHELL_POOL_SIZE,
+        max_uses: int = POWERSHELL_POOL_MAX_USES,
+        health_interval: float = POWERSHELL_POOL_HEALTH_SECONDS,
+        command: Optional[List[str]] = None,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.health_interval = health_interval
+        self.command = command or build_worker_command()
+        self._idle: List[PowerShellWorker] = []
+        self._total = 0
+        self._available: Optional[asyncio.Condition] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.spawned = 0
+        self.recycled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def accepts(self, script: str) -> bool:
+        """Whether a script can run on a warm worker (the pool is enabled and it does not call exit)."""
+        return self.enabled and not calls_exit(script)
+
+    def _condition(self) -> asyncio.Condition:
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+
+    async def _acquire(self) -> PowerShellWorker:
+        available = self._condition()
+        async with available:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive:
+                        return worker
+                    self._total -= 1
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                await available.wait()
+        worker = PowerShellWorker(self.command)
+        try:
+            await worker.start()
+        except Exception:
+            await self._discard(None)
+            raise
+        self.spawned += 1
+        return worker
+
+    async def _release(self, worker: PowerShellWorker) -> None:
+        if not worker.alive or worker.uses >= self.max_uses:
+            if worker.alive:
+                self.recycled += 1
+            await self._discard(worker)
+            return
+        available = self._condition()
+        async with available:
+            self._idle.append(worker)
+            available.notify()
+
+    async def _discard(self, worker: Optional[PowerShellWorker]) -> None:
+        if worker is not None:
+            await worker.close()
+        available = self._condition()
+        async with available:
+            self._total -= 1
+            available.notify()
+
+    async def execute(self, script: str, task_file: str, inputs: dict, timeout: float) -> dict:
+        """
+        Run a script on a warm worker. Returns the same shape as
+        script_runner.run_process (ExitCode, Stdout, Stderr, Result, TimedOut, BytesOut).
+        """
+        worker = await self._acquire()
+        try:
+            response = await asyncio.wait_for(worker.execute(script, task_file, inputs), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self._discard(worker)
+            return {"ExitCode": None, "Stdout": "", "Stderr": "", "Result": None, "TimedOut": True, "BytesOut": 0}
+        except BaseException:
+            await self._discard(worker)
+            raise
+        await self._release(worker)
+
+        stdout = response.get("stdout") or ""
+        stderr = response.get("stderr") or ""
+        result = response.get("result") or None
+        return {
+            "ExitCode": response.get("exit_code", 1),
+            "Stdout": stdout,
+            "Stderr": stderr,
+            "Result": result,
+            "TimedOut": False,
+            "BytesOut": len(stdout) + len(stderr) + len(result or ""),
+        }
+
+    async def check_health(self) -> None:
+        """Ping every idle worker and drop the ones that do not answer."""
+        available = self._condition()
+        async with available:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            if await worker.ping():
+                await self._release(worker)
+            else:
+                logging.warning("PowerShell worker failed health check; replacing it.")
+                await self._discard(worker)
+
+    async def start(self) -> None:
+        if self.enabled and self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        available = self._condition()
+        async with available:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for worker in idle:
+            await worker.close()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+
+_pool: Optional[PowerShellPool] = None
+
+
+def get_powershell_pool() -> PowerShellPool:
+    """Return the process-wide PowerShell pool (disabled when POWERSHELL_POOL_SIZE=0)."""
+    global _pool
+    if _pool is None:
+        _pool = PowerShellPool()
+    return _pool
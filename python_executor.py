@@ -0,0 +1,265 @@
+import os
+import ast
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import ModuleType
+from typing import Dict, Optional, Set, Tuple
+
+from script_runner import interpreter_slots, SCRIPT_TIMEOUT_SECONDS
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+PYTHON_EXECUTOR_ENABLED = os.getenv("PYTHON_EXECUTOR_ENABLED", "true").lower() in ("1", "true", "yes")
+PYTHON_EXECUTOR_WORKERS = int(os.getenv("PYTHON_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Top-level statements allowed in a module that is imported rather than spawned.
+# Anything else (e.g. reading sys.argv at import time) marks a legacy script.
+# Assignments are only allowed with literal values, see _is_literal().
+_IMPORT_SAFE_NODES = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Assign, ast.AnnAssign)
+
+
+# -----------------------------------------------------------------------
+# Action Modules
+# -----------------------------------------------------------------------
+def _is_main_guard(node: ast.stmt) -> bool:
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+    )
+
+
+def _is_literal(node: Optional[ast.expr]) -> bool:
+    """Constants and tuples/lists/sets/dicts of constants; evaluating them has no side effects."""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return isinstance(node.operand, ast.Constant)
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        return all(_is_literal(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(key is not None and _is_literal(key) for key in node.keys) and all(_is_literal(v) for v in node.values)
+    return False
+
+
+def inspect_action(source: str) -> Optional[dict]:
+    """
+    Decide whether a .py action can be imported and called in-process.
+    Returns {"is_async": bool, "trusted": bool} for modules that define a
+    top-level main(inputs) and do nothing else at import time, else None.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    entry = None
+    trusted = False
+    for node in tree.body:
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue  # docstring
+        if _is_main_guard(node):
+            continue
+        if not isinstance(node, _IMPORT_SAFE_NODES):
+            return None
+        if isinstance(node, ast.Assign) and not _is_literal(node.value):
+            return None
+        if isinstance(node, ast.AnnAssign) and node.value is not None and not _is_literal(node.value):
+            return None
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "main":
+            entry = node
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "TRUSTED" for t in node.targets):
+            trusted = isinstance(node.value, ast.Constant) and node.value.value is True
+
+    if entry is None:
+        return None
+    return {"is_async": isinstance(entry, ast.AsyncFunctionDef), "trusted": trusted}
+
+
+def _load_module(path: str, source: str) -> ModuleType:
+    # Compiled from the inspected source text, never re-read from `path`: a file
+    # rewritten after inspection must not run under the old version key. This also
+    # keeps __pycache__ entries out of action folders.
+    name = "action_" + os.path.splitext(os.path.basename(path))[0].replace(" ", "_").replace("-", "_")
+    module = ModuleType(name)
+    module.__file__ = path
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module
+
+
+# Per-process cache: path -> (version, module). Used both in the server process
+# (in-loop actions) and inside each ProcessPoolExecutor worker.
+_module_cache: Dict[str, Tuple[float, ModuleType]] = {}
+
+
+def get_action_module(path: str, version, source: str) -> ModuleType:
+    cached = _module_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, _load_module(path, source))
+        _module_cache[path] = cached
+    return cached[1]
+
+
+class ActionExit(Exception):
+    """SystemExit/KeyboardInterrupt raised by an in-loop action, carried out of its task as an ordinary error."""
+
+
+async def _call_main(module: ModuleType, inputs: dict):
+    # A task that raises SystemExit re-raises it out of the event loop, so it
+    # is converted inside the coroutine the task runs.
+    try:
+        return await module.main(inputs)
+    except (SystemExit, KeyboardInterrupt) as e:
+        raise ActionExit(f"{type(e).__name__}: {e}") from e
+
+
+def _run_in_worker(path: str, version, source: str, inputs: dict):
+    """Entry point executed inside a pool process."""
+    module = get_action_module(path, version, source)
+    result = module.main(inputs)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+# -----------------------------------------------------------------------
+# Executor
+# -----------------------------------------------------------------------
+class PythonActionExecutor:
+    """
+    Runs .py actions that expose main(inputs) without spawning an interpreter
+    per call. Modules are inspected once per (path, version) and then either
+    awaited in the event loop (async main with TRUSTED = True) or called in a
+    ProcessPoolExecutor for isolation. Legacy scripts are left to the
+    subprocess path in script_runner.
+
+    A pool whose worker is stuck on a timed-out action is retired: new
+    actions go to a fresh pool, and the old pool's workers are killed once
+    the other actions still running on it have finished.
+    """
+
+    def __init__(self, workers: int = PYTHON_EXECUTOR_WORKERS, enabled: bool = PYTHON_EXECUTOR_ENABLED):
+        self.workers = workers
+        self.enabled = enabled
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[ProcessPoolExecutor, Set[Future]] = {}  # pool -> futures still awaited
+        self._inspected: Dict[str, Tuple[float, Optional[dict], str]] = {}  # path -> (version, inspection, source)
+
+    def describe(self, path: str, source: Optional[str] = None, version: Optional[str] = None) -> Optional[dict]:
+        """
+        Return the cached inspect_action() result for the current version of
+        the file, plus that version and the inspected source, which is what
+        run() executes. `source`/`version` come from the flow manifest;
+        without them the file's mtime is the version.
+        """
+        if version is None:
+            version = os.stat(path).st_mtime
+        cached = self._inspected.get(path)
+        if cached is None or cached[0] != version:
+            if source is None:
+                with open(path, "r", encoding="utf-8") as f:
+                    source = f.read()
+            cached = (version, inspect_action(source), source)
+            self._inspected[path] = cached
+        if cached[1] is None:
+            return None
+        return {**cached[1], "version": version, "source": cached[2]}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def _retire_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Send new actions to a fresh pool; `pool` has a stuck worker (e.g. after a timeout)."""
+        if self._pool is pool:
+            self._pool = None
+
+    def _finished(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        """Stop tracking `future`; kill a retired pool once nothing else runs on it."""
+        running = self._running.get(pool)
+        if running is not None:
+            running.discard(future)
+            if running:
+                return
+            del self._running[pool]
+        if pool is not self._pool:
+            _kill_pool(pool)
+
+    async def run(self, path: str, info: dict, inputs: dict, timeout: float = SCRIPT_TIMEOUT_SECONDS) -> dict:
+        """
+        Call main(inputs) for an action described by `describe()`.
+        Returns ExitCode, Outputs, Error, TimedOut, Duration, QueueWait, Mode.
+        """
+        in_loop = info["is_async"] and info["trusted"]
+        per_interpreter_slots, global_slots = interpreter_slots("python")
+        queued_at = time.perf_counter()
+        async with per_interpreter_slots, global_slots:
+            started_at = time.perf_counter()
+            outputs, error, timed_out = None, "", False
+            pool = future = None
+            try:
+                if in_loop:
+                    module = get_action_module(path, info["version"], info["source"])
+                    outputs = await asyncio.wait_for(_call_main(module, inputs), timeout=timeout)
+                else:
+                    pool = self._get_pool()
+                    future = pool.submit(_run_in_worker, path, info["version"], info["source"], inputs)
+                    self._running.setdefault(pool, set()).add(future)
+                    outputs = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                timed_out = True
+                if pool is not None:
+                    self._retire_pool(pool)
+            except ActionExit as e:
+                error = str(e)
+            except BaseException as e:
+                # SystemExit/KeyboardInterrupt from a pool worker are the action's failure, not the server's.
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                if future is not None:
+                    self._finished(pool, future)
+            finished_at = time.perf_counter()
+
+        return {
+            "ExitCode": 0 if not error and not timed_out else 1,
+            "Outputs": outputs,
+            "Error": error,
+            "TimedOut": timed_out,
+            "Duration": round(finished_at - started_at, 4),
+            "QueueWait": round(started_at - queued_at, 4),
+            "Mode": "in_loop" if in_loop else "process_pool",
+        }
+
+    async def stop(self) -> None:
+        for pool in [p for p in self._running if p is not self._pool]:
+            _kill_pool(pool)
+        self._running.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[PythonActionExecutor] = None
+
+
+def get_python_executor() -> PythonActionExecutor:
+    """Return the process-wide Python action executor."""
+    global _executor
+    if _executor is None:
+        _executor = PythonActionExecutor()
+    return _executor
@@ -0,0 +1,151 @@
+"""
+Script I/O protocol between run_script and action scripts.
+
+Protocol 1 (SCRIPT_IO_PROTOCOL=1 in the child's environment):
+  - The ticket payload is written once per payload to a file in a private
+    spill directory (memory-backed /dev/shm when available) and named by
+    SCRIPT_IO_TASK_FILE. Every step of every flow on that payload reuses
+    the file, so the ticket is never re-serialized per step.
+  - The step's input variables arrive as one JSON document on stdin.
+  - The structured result is written as one JSON document to the file
+    descriptor named by SCRIPT_IO_RESULT_FD (POSIX only); stdout and stderr
+    stay free for log output. Scripts that write nothing there, and all
+    scripts on Windows, are parsed from stdout as before.
+
+.py and .js actions opt in with a marker comment in their first lines
+(`# script-io: 1` or `// script-io: 1`); unmarked ones still get their
+inputs as a JSON command-line argument. .ps1 actions always use protocol 1:
+the fixed header run_script prepends reads $SCTASK_RESPONSE and
+$ADDITIONAL_VARIABLES from the task file and stdin, and defines
+Write-ActionResult for the result descriptor.
+"""
+import os
+import re
+import shutil
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+PROTOCOL_VERSION = 1
+# Parent of the per-process spill directory; defaults to /dev/shm, else the temp dir.
+SCRIPT_IO_DIR = os.getenv("SCRIPT_IO_DIR", "")
+# Task files kept on disk; the least recently used are deleted beyond this.
+SCRIPT_IO_MAX_FILES = int(os.getenv("SCRIPT_IO_MAX_FILES", "1024"))
+RESULT_LIMIT = 16 * 1024 * 1024
+
+ENV_PROTOCOL = "SCRIPT_IO_PROTOCOL"
+ENV_TASK_FILE = "SCRIPT_IO_TASK_FILE"
+ENV_RESULT_FD = "SCRIPT_IO_RESULT_FD"
+
+_MARKER = re.compile(r"^\s*(?:#|//)\s*script-io:\s*(\d+)\s*$", re.MULTILINE)
+_MARKER_SCAN_CHARS = 1024
+
+# Prepended to every one-shot .ps1 action. It embeds no ticket data, so it
+# is the same string for every step and needs no quoting.
+POWERSHELL_HEADER = (
+    "$ADDITIONAL_VARIABLES = [Console]::In.ReadToEnd() | ConvertFrom-Json; "
+    "$SCTASK_RESPONSE = (Get-Content -Raw -LiteralPath $env:SCRIPT_IO_TASK_FILE | ConvertFrom-Json).result; "
+    "function Write-ActionResult($Result) { "
+    "$text = if ($Result -is [string]) { $Result } else { $Result | ConvertTo-Json -Compress -Depth 10 }; "
+    "if ($env:SCRIPT_IO_RESULT_FD) { [System.IO.File]::WriteAllText(\"/dev/fd/$($env:SCRIPT_IO_RESULT_FD)\", $text) } "
+    "else { Write-Output $text } }; "
+)
+
+
+def declared_protocol(script_text: str) -> int:
+    """Protocol version a .py/.js script declares with its `script-io:` marker (0 = legacy argv)."""
+    match = _MARKER.search(script_text[:_MARKER_SCAN_CHARS])
+    return int(match.group(1)) if match else 0
+
+
+def result_channel_supported() -> bool:
+    return os.name != "nt"
+
+
+async def open_result_reader(read_fd: int):
+    """(transport, StreamReader) over the parent's end of the result pipe; close the transport when done."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=RESULT_LIMIT)
+    pipe = os.fdopen(read_fd, "rb", 0)
+    try:
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    except BaseException:
+        pipe.close()
+        raise
+    return transport, reader
+
+
+# -----------------------------------------------------------------------
+# Task Files
+# -----------------------------------------------------------------------
+class TaskFileStore:
+    """Write-once spill files of ticket payloads, keyed by their task_ref."""
+
+    def __init__(self, base_dir: str = SCRIPT_IO_DIR, max_files: int = SCRIPT_IO_MAX_FILES):
+        self.base_dir = base_dir
+        self.max_files = max_files
+        self.directory: Optional[str] = None
+        self._files: "OrderedDict[str, str]" = OrderedDict()  # ref -> path
+        self.writes = 0
+
+    def _ensure_directory(self) -> str:
+        if self.directory is None:
+            base = self.base_dir or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+            # mkdtemp creates the directory 0700: payloads carry ticket data.
+            self.directory = tempfile.mkdtemp(prefix="script-io-", dir=base)
+            logging.info(f"Script I/O task files in {self.directory}")
+        return self.directory
+
+    def path_for(self, task_json: str, task_ref: Optional[str] = None) -> str:
+        """Path of the file holding `task_json`, writing it on first use."""
+        ref = task_ref or hashlib.sha256(task_json.encode()).hexdigest()
+        path = self._files.get(ref)
+        if path is not None and os.path.exists(path):
+            self._files.move_to_end(ref)
+            return path
+        path = os.path.join(self._ensure_directory(), f"{ref}.json")
+        staging = f"{path}.{os.getpid()}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            f.write(task_json)
+        os.replace(staging, path)
+        self.writes += 1
+        self._files[ref] = path
+        while len(self._files) > self.max_files:
+            _, old = self._files.popitem(last=False)
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+    def close(self) -> None:
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+        self._files.clear()
+
+
+_task_files: Optional[TaskFileStore] = None
+
+
+def get_task_files() -> TaskFileStore:
+    """Return the process-wide TaskFileStore used by script_runner."""
+    global _task_files
+    if _task_files is None:
+        _task_files = TaskFileStore()
+    return _task_files
+
+
+def close_task_files() -> None:
+    """Delete the spill directory. Called from the FastAPI shutdown event."""
+    if _task_files is not None:
+        _task_files.close()
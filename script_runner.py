@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+from typing import Dict, List, Optional, Union
+
+from script_io import (
+    ENV_PROTOCOL, ENV_RESULT_FD, ENV_TASK_FILE, POWERSHELL_HEADER, PROTOCOL_VERSION,
+    declared_protocol, get_task_files, open_result_reader, result_channel_supported,
+)
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+POWERSHELL_EXECUTABLE = os.getenv("POWERSHELL_EXECUTABLE", "powershell")
+SCRIPT_TIMEOUT_SECONDS = float(os.getenv("SCRIPT_TIMEOUT_SECONDS", "300"))
+SCRIPT_MAX_CONCURRENCY = int(os.getenv("SCRIPT_MAX_CONCURRENCY", "16"))
+
+INTERPRETERS = {
+    ".py": "python",
+    ".js": "node",
+    ".ps1": "powershell",
+}
+
+
+def _interpreter_limit(interpreter: str) -> int:
+    """Per-interpreter slot count, e.g. SCRIPT_MAX_CONCURRENCY_POWERSHELL=4."""
+    return int(os.getenv(f"SCRIPT_MAX_CONCURRENCY_{interpreter.upper()}", str(SCRIPT_MAX_CONCURRENCY)))
+
+
+# Semaphores are created lazily so they bind to the running event loop.
+_global_slots: Optional[asyncio.Semaphore] = None
+_interpreter_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def interpreter_slots(interpreter: str):
+    """
+    Return the (per-interpreter, global) semaphores a script must hold to
+    run, in the order to acquire them: a script queued behind its own
+    interpreter's limit must not sit on a global slot another interpreter
+    could use.
+    """
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(SCRIPT_MAX_CONCURRENCY)
+    if interpreter not in _interpreter_slots:
+        _interpreter_slots[interpreter] = asyncio.Semaphore(_interpreter_limit(interpreter))
+    return _interpreter_slots[interpreter], _global_slots
+
+
+# -----------------------------------------------------------------------
+# Process Execution
+# -----------------------------------------------------------------------
+def kill_process_tree(process: asyncio.subprocess.Process) -> None:
+    """Kill the process and everything it spawned."""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            import subprocess
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_process(
+    command: List[str],
+    interpreter: str,
+    timeout: float = SCRIPT_TIMEOUT_SECONDS,
+    stdin: Optional[bytes] = None,
+    env: Optional[dict] = None,
+    result_channel: bool = False,
+) -> dict:
+    """
+    Run a command as an asyncio subprocess under the global and per-interpreter
+    concurrency limits. The whole process tree is killed after `timeout` seconds.
+    `stdin` is written to the child's standard input; with `result_channel`
+    the child also gets a pipe named by SCRIPT_IO_RESULT_FD (POSIX only).
+
+    Returns:
+        dict: ExitCode, Stdout, Stderr, Result (text written to the result
+        channel, or None), TimedOut, Duration (seconds, excluding time spent
+        waiting for a slot), QueueWait, BytesOut.
+    """
+    per_interpreter_slots, global_slots = interpreter_slots(interpreter)
+    queued_at = time.perf_counter()
+    async with per_interpreter_slots, global_slots:
+        started_at = time.perf_counter()
+        kwargs = {"creationflags": 0x00000200} if os.name == "nt" else {"start_new_session": True}
+        read_fd = write_fd = None
+        if result_channel and result_channel_supported():
+            read_fd, write_fd = os.pipe()
+            env = {**(env if env is not None else os.environ), ENV_RESULT_FD: str(write_fd)}
+            kwargs["pass_fds"] = (write_fd,)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                **kwargs
+            )
+        except BaseException:
+            if read_fd is not None:
+                os.close(read_fd)
+            raise
+        finally:
+            if write_fd is not None:
+                os.close(write_fd)
+        result_transport = result_reader = None
+        if read_fd is not None:
+            result_transport, result_reader = await open_result_reader(read_fd)
+
+        async def collect():
+            stdout, stderr = await process.communicate(stdin)
+            # EOF once the script and everything it spawned have exited.
+            result = await result_reader.read() if result_reader is not None else None
+            return stdout, stderr, result
+
+        timed_out = False
+        try:
+            stdout, stderr, result = await asyncio.wait_for(collect(), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            kill_process_tree(process)
+            stdout, stderr = await process.communicate()
+            result = None
+        except asyncio.CancelledError:
+            kill_process_tree(process)
+            raise
+        finally:
+            if result_transport is not None:
+                result_transport.close()
+        finished_at = time.perf_counter()
+
+    return {
+        "ExitCode": process.returncode,
+        "Stdout": stdout.decode(errors="replace"),
+        "Stderr": stderr.decode(errors="replace"),
+        "Result": result.decode(errors="replace") if result else None,
+        "TimedOut": timed_out,
+        "Duration": round(finished_at - started_at, 4),
+        "QueueWait": round(started_at - queued_at, 4),
+        "BytesOut": len(stdout) + len(stderr) + len(result or b""),
+    }
+
+
+async def run_pooled_powershell(script: str, task_file: str, inputs: dict, timeout: float) -> dict:
+    """Run a .ps1 body on a warm worker from the PowerShell pool, under the same slots as run_process."""
+    pool = get_powershell_pool()
+    per_interpreter_slots, global_slots = interpreter_slots("powershell")
+    queued_at = time.perf_counter()
+    async with per_interpreter_slots, global_slots:
+        started_at = time.perf_counter()
+        result = await pool.execute(script, task_file, inputs, timeout)
+        finished_at = time.perf_counter()
+    result["Duration"] = round(finished_at - started_at, 4)
+    result["QueueWait"] = round(started_at - queued_at, 4)
+    return result
+
+
+def get_powershell_pool():
+    # Imported lazily: powershell_pool depends on this module.
+    from powershell_pool import get_powershell_pool as _get_pool
+    return _get_pool()
+
+
+def get_python_executor():
+    # Imported lazily: python_executor depends on this module.
+    from python_executor import get_python_executor as _get_executor
+    return _get_executor()
+
+
+# -----------------------------------------------------------------------
+# Asynchronous Helper Functions
+# -----------------------------------------------------------------------
+def _result(status: str, outputs, output_message: str, error_message: str, stats: Optional[dict] = None) -> dict:
+    result = {
+        "Status": status,
+        "Outputs": outputs,
+        "OutputMessage": output_message,
+        "ErrorMessage": error_message,
+    }
+    if stats is not None:
+        result["Stats"] = stats
+    return result
+
+
+async def run_script(
+    script_path: str,
+    inputs: dict,
+    task_response: Union[dict, str],
+    timeout: float = SCRIPT_TIMEOUT_SECONDS,
+    script_text: Optional[str] = None,
+    version: Optional[str] = None,
+    task_ref: Optional[str] = None,
+) -> dict:
+    """
+    Execute a script based on its file extension asynchronously.
+    Supports:
+      - Python (.py): Modules exposing main(inputs) run on the PythonActionExecutor;
+        other scripts run with 'python'.
+      - Node.js (.js): Runs with 'node' interpreter.
+      - PowerShell (.ps1): Runs with POWERSHELL_EXECUTABLE; $SCTASK_RESPONSE and
+        $ADDITIONAL_VARIABLES are defined by a fixed header prepended to the script.
+        When the PowerShell pool is enabled the script runs on a warm worker instead,
+        unless it calls exit.
+    Spawned scripts speak the script_io protocol: inputs on stdin, the ticket
+    in SCRIPT_IO_TASK_FILE, the result on SCRIPT_IO_RESULT_FD. .py/.js scripts
+    without a `script-io: 1` marker also get the inputs as a JSON argument.
+
+    Args:
+        script_path (str): Path to the script file.
+        inputs (dict): Input data for the script.
+        task_response (dict | str): The ServiceNow task payload, or its JSON text.
+        timeout (float): Wall-clock limit in seconds before the process tree is killed.
+        script_text (str): Cached script source (from the flow manifest); skips reading the file.
+        version (str): Content hash of script_text, used to key cached Python modules.
+        task_ref (str): Content hash of the payload (task_store); names its task file.
+
+    Returns:
+        dict: Execution result containing:
+            - Status: "Success" or "Error"
+            - Outputs: Parsed outputs from the script (if available)
+            - OutputMessage: The result channel text, else raw stdout of the script
+            - ErrorMessage: Any error message encountered
+            - Stats: Duration, QueueWait, ExitCode, BytesOut, TimedOut
+    """
+    if script_text is None and not os.path.exists(script_path):
+        error_msg = f"Script file not found: {script_path}"
+        logging.error(error_msg)
+        return _result("Error", {}, "", error_msg)
+
+    ext = os.path.splitext(script_path)[1].lower()
+    interpreter = INTERPRETERS.get(ext)
+    if interpreter is None:
+        error_msg = f"Unsupported script file type: {ext}"
+        logging.error(error_msg)
+        return _result("Error", {}, "", error_msg)
+
+    if ext == ".py":
+        executor = get_python_executor()
+        info = executor.describe(script_path, script_text, version) if executor.enabled else None
+        if info is not None:
+            return await run_python_action(executor, script_path, info, inputs, timeout)
+
+    task_json = task_response if isinstance(task_response, str) else json.dumps(task_response)
+    inputs_json = json.dumps(inputs)
+    try:
+        # Written once per ticket payload; later steps reuse the file.
+        task_file = get_task_files().path_for(task_json, task_ref)
+        env = {**os.environ, ENV_PROTOCOL: str(PROTOCOL_VERSION), ENV_TASK_FILE: task_file}
+        if script_text is not None:
+            file_content = script_text
+        else:
+            with open(script_path, 'r') as script_file:
+                file_content = script_file.read()
+
+        if ext in [".py", ".js"]:
+            executable = sys.executable if ext == ".py" else interpreter
+            command = [executable, script_path]
+            if declared_protocol(file_content) < PROTOCOL_VERSION:
+                # Legacy script: inputs as a JSON command-line argument.
+                command.append(inputs_json)
+            logging.info(f"Executing {interpreter} script: {script_path}")
+        else:
+            command = [POWERSHELL_EXECUTABLE, "-NoProfile", "-NonInteractive", "-Command", POWERSHELL_HEADER + file_content]
+            logging.info(f"Executing PowerShell script: {script_path}")
+
+        if ext == ".ps1" and get_powershell_pool().accepts(file_content):
+            proc = await run_pooled_powershell(file_content, task_file, inputs, timeout)
+        else:
+            proc = await run_process(
+                command, interpreter, timeout=timeout, stdin=inputs_json.encode(), env=env, result_channel=True
+            )
+    except Exception as e:
+        logging.error(f"Exception occurred during script execution: {e}")
+        return _result("Error", {}, "", str(e))
+
+    stats = {k: proc[k] for k in ("Duration", "QueueWait", "ExitCode", "BytesOut", "TimedOut")}
+    stdout_decoded = proc["Stdout"].strip().replace('\r\n', ' ')
+    stderr_decoded = proc["Stderr"].strip().replace('\r\n', ' ')
+    logging.info(
+        f"{script_path} finished: exit={proc['ExitCode']} duration={proc['Duration']}s "
+        f"wait={proc['QueueWait']}s bytes_out={proc['BytesOut']}"
+    )
+
+    if proc["TimedOut"]:
+        error_msg = f"Script timed out after {timeout}s and was killed: {script_path}"
+        logging.error(error_msg)
+        return _result("Error", {}, stdout_decoded, error_msg, stats)
+
+    # A result written to the result channel wins; stdout is then only log output.
+    output_message = stdout_decoded
+    if proc.get("Result"):
+        output_message = proc["Result"].strip()
+        stats["ResultChannel"] = True
+        if stdout_decoded:
+            logging.debug(f"{script_path} output: {stdout_decoded}")
+
+    if proc["ExitCode"] == 0:
+        try:
+            outputs = json.loads(output_message)
+        except json.JSONDecodeError:
+            outputs = output_message
+        return _result("Success", outputs, output_message, "", stats)
+
+    logging.error(f"Script execution error: {stderr_decoded}")
+    return _result("Error", {}, output_message, stderr_decoded, stats)
+
+
+async def run_python_action(executor, script_path: str, info: dict, inputs: dict, timeout: float) -> dict:
+    """Run a .py action's main(inputs) through the PythonActionExecutor and shape it like run_script."""
+    logging.info(f"Executing python action in {'event loop' if info['is_async'] and info['trusted'] else 'process pool'}: {script_path}")
+    res = await executor.run(script_path, info, inputs, timeout=timeout)
+    outputs = res["Outputs"]
+    output_message = outputs if isinstance(outputs, str) else json.dumps(outputs)
+    stats = {
+        "Duration": res["Duration"],
+        "QueueWait": res["QueueWait"],
+        "ExitCode": res["ExitCode"],
+        "BytesOut": len(output_message or ""),
+        "TimedOut": res["TimedOut"],
+        "Mode": res["Mode"],
+    }
+    logging.info(f"{script_path} finished: exit={res['ExitCode']} duration={res['Duration']}s wait={res['QueueWait']}s")
+
+    if res["TimedOut"]:
+        error_msg = f"Script timed out after {timeout}s and was killed: {script_path}"
+        logging.error(error_msg)
+        return _result("Error", {}, "", error_msg, stats)
+    if res["Error"]:
+        logging.error(f"Script execution error: {res['Error']}")
+        return _result("Error", {}, "", res["Error"], stats)
+    return _result("Success", outputs, output_message, "", stats)
+
+
+async def run_powershell_command(command: str, timeout: float = SCRIPT_TIMEOUT_SECONDS) -> dict:
+    """Execute a PowerShell command without blocking the event loop and return status and output."""
+    try:
+        proc = await run_process(
+            [POWERSHELL_EXECUTABLE, "-NoProfile", "-NonInteractive", "-Command", command],
+            "powershell",
+            timeout=timeout,
+        )
+        if proc["TimedOut"]:
+            return {"Status": "Error", "OutputMessage": proc["Stdout"].strip(), "ErrorMessage": f"Timed out after {timeout}s"}
+        return {
+            "Status": "Success" if proc["ExitCode"] == 0 else "Error",
+            "OutputMessage": proc["Stdout"].strip(),
+            "ErrorMessage": proc["Stderr"].strip(),
+        }
+    except Exception as e:
+        return {
+            "Status": "Error",
+            "OutputMessage": "",
+            "ErrorMessage": str(e)
+        }
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import SERVICENOW_SECONDS, observe
+from tracing import span
+
+# -----------------------------------------------------------------------
+# Load Environment Variables
+# -----------------------------------------------------------------------
+load_dotenv()
+SERVICENOW_ENDPOINT = os.getenv("SERVICENOW_ENDPOINT", "https://hexawaretechnologiesincdemo8.service-now.com")
+SERVICENOW_MAX_CONNECTIONS = int(os.getenv("SERVICENOW_MAX_CONNECTIONS", "20"))
+SERVICENOW_MAX_KEEPALIVE = int(os.getenv("SERVICENOW_MAX_KEEPALIVE", "10"))
+SERVICENOW_KEEPALIVE_EXPIRY = float(os.getenv("SERVICENOW_KEEPALIVE_EXPIRY", "30"))
+SERVICENOW_TIMEOUT = float(os.getenv("SERVICENOW_TIMEOUT", "30"))
+SERVICENOW_HTTP2 = os.getenv("SERVICENOW_HTTP2", "false").lower() in ("1", "true", "yes")
+
+JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+
+# -----------------------------------------------------------------------
+# Shared ServiceNow Client
+# -----------------------------------------------------------------------
+class ServiceNowClient:
+    """
+    Long-lived ServiceNow Table API client.
+
+    Wraps a single httpx.AsyncClient so every graph node reuses pooled
+    keep-alive connections instead of paying a TCP+TLS handshake per call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = SERVICENOW_ENDPOINT,
+        auth: Optional[tuple] = None,
+        max_connections: int = SERVICENOW_MAX_CONNECTIONS,
+        max_keepalive_connections: int = SERVICENOW_MAX_KEEPALIVE,
+        keepalive_expiry: float = SERVICENOW_KEEPALIVE_EXPIRY,
+        timeout: float = SERVICENOW_TIMEOUT,
+        http2: bool = SERVICENOW_HTTP2,
+    ):
+        if auth is None:
+            auth = (os.getenv("SERVICENOW_USER"), os.getenv("SERVICENOW_PWD"))
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning("SERVICENOW_HTTP2 requested but 'h2' is not installed; using HTTP/1.1.")
+                http2 = False
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=auth,
+            headers=JSON_HEADERS,
+            http2=http2,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def request(
+        self, method: str, path: str, timeout: Optional[float] = None, operation: Optional[str] = None, **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request relative to the instance URL. `timeout` overrides the
+        client default; `operation` labels the latency metric (defaults to the method).
+        """
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span(f"servicenow {operation or method}", "http", method=method, path=path):
+                response = await self._client.request(method, path, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            observe(SERVICENOW_SECONDS, started, operation=operation or method, status=status)
+
+    async def update_record(self, table_name: str, sys_id: str, fields: dict, timeout: Optional[float] = None) -> httpx.Response:
+        """PUT the given fields onto /api/now/table/<table_name>/<sys_id>."""
+        return await self.request(
+            "PUT", f"/api/now/table/{table_name}/{sys_id}", timeout=timeout, operation=f"update_record:{table_name}", json=fields
+        )
+
+    async def patch_record(self, table_name: str, sys_id: str, fields: dict, timeout: Optional[float] = None) -> httpx.Response:
+        """PATCH only the given fields onto /api/now/table/<table_name>/<sys_id>."""
+        return await self.request(
+            "PATCH", f"/api/now/table/{table_name}/{sys_id}", timeout=timeout, operation=f"patch_record:{table_name}", json=fields
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_client: Optional[ServiceNowClient] = None
+
+
+async def init_servicenow_client(**kwargs) -> ServiceNowClient:
+    """Create the process-wide client. Called once from init_graph()."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = ServiceNowClient(**kwargs)
+    return _client
+
+
+def get_servicenow_client() -> ServiceNowClient:
+    """Return the process-wide client, creating it lazily if init was skipped."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = ServiceNowClient()
+    return _client
+
+
+async def close_servicenow_client() -> None:
+    """Close pooled connections. Called from the FastAPI shutdown event."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
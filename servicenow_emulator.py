@@ -0,0 +1,360 @@
+"""
+Local stand-in for the ServiceNow Table API, backed by servicenow_db/sn_database.db.
+
+Serves GET/POST on /api/now/table/{table} and GET/PUT/PATCH on
+/api/now/table/{table}/{sys_id} for sc_task and sys_user_group, with
+optional injected latency and error rates, so the flow engine can be
+load-tested offline (point SERVICENOW_ENDPOINT at it).
+
+CLI:
+    python servicenow_emulator.py [--db servicenow_db/sn_database.db] [--port 8010]
+        [--latency-ms 0] [--jitter-ms 0] [--error-rate 0] [--seed 0]
+"""
+import os
+import re
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiosqlite
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+SN_EMULATOR_DB_PATH = os.getenv("SN_EMULATOR_DB_PATH", os.path.join("servicenow_db", "sn_database.db"))
+SN_EMULATOR_LATENCY_MS = float(os.getenv("SN_EMULATOR_LATENCY_MS", "0"))
+SN_EMULATOR_JITTER_MS = float(os.getenv("SN_EMULATOR_JITTER_MS", "0"))
+# Fraction (0..1) of requests answered with SN_EMULATOR_ERROR_STATUS instead of being served.
+SN_EMULATOR_ERROR_RATE = float(os.getenv("SN_EMULATOR_ERROR_RATE", "0"))
+SN_EMULATOR_ERROR_STATUS = int(os.getenv("SN_EMULATOR_ERROR_STATUS", "503"))
+
+SYS_USER_GROUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sys_user_group (
+    sys_id VARCHAR(255),
+    name VARCHAR(255),
+    description TEXT,
+    manager VARCHAR(255),
+    email VARCHAR(255),
+    type VARCHAR(255),
+    active BOOLEAN,
+    sys_created_on DATETIME,
+    sys_created_by VARCHAR(255),
+    sys_updated_on DATETIME,
+    sys_updated_by VARCHAR(255),
+    sys_mod_count INT
+)
+"""
+
+INDEXES = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_sc_task_sys_id ON sc_task (sys_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sc_task_number ON sc_task (number)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_sys_user_group_sys_id ON sys_user_group (sys_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sys_user_group_name ON sys_user_group (name)",
+)
+
+# Columns whose ServiceNow name is an SQL keyword are stored with a trailing underscore.
+RENAMED_COLUMNS = {"order": "order_"}
+# Journal fields: writes append to comments_and_work_notes instead of overwriting history.
+JOURNAL_FIELDS = ("work_notes", "comments")
+
+
+_QUERY_CLAUSE = re.compile(r"^([a-z0-9_.]+?)(IN|>=|<=|!=|=|>|<)(.*)$", re.DOTALL)
+
+
+def parse_query(query: str) -> tuple:
+    """
+    Split an encoded query into ([(field, operator, value)], [(field, descending)]).
+    Supports the AND-only subset: =, !=, >, >=, <, <=, IN, ORDERBY and
+    ORDERBYDESC. Raises ValueError on anything else.
+    """
+    conditions, order_by = [], []
+    for clause in filter(None, query.split("^")):
+        if clause.startswith("ORDERBYDESC"):
+            order_by.append((clause[len("ORDERBYDESC"):], True))
+            continue
+        if clause.startswith("ORDERBY"):
+            order_by.append((clause[len("ORDERBY"):], False))
+            continue
+        match = _QUERY_CLAUSE.match(clause)
+        if match is None:
+            raise ValueError(clause)
+        conditions.append(match.groups())
+    return conditions, order_by
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _result(result, status: int = 200) -> JSONResponse:
+    # Records are flat dicts of strings, so FastAPI's jsonable_encoder pass
+    # (the bulk of per-request CPU) is skipped by returning the response directly.
+    return JSONResponse(status_code=status, content={"result": result})
+
+
+def _error(status: int, message: str, detail: str = "") -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"message": message, "detail": detail}, "status": "failure"})
+
+
+# -----------------------------------------------------------------------
+# Table Store
+# -----------------------------------------------------------------------
+class TableStore:
+    """Async access to the emulator tables over one WAL-mode aiosqlite connection."""
+
+    def __init__(self, db_path: str = SN_EMULATOR_DB_PATH):
+        self.db_path = db_path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self.columns: Dict[str, List[str]] = {}
+
+    async def open(self) -> None:
+        self._conn = await aiosqlite.connect(self.db_path)
+        self._conn.row_factory = aiosqlite.Row
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")
+        await self._conn.execute(SYS_USER_GROUP_SCHEMA)
+        for statement in INDEXES:
+            await self._conn.execute(statement)
+        await self._conn.commit()
+        async with self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'") as cursor:
+            tables = [row[0] for row in await cursor.fetchall()]
+        for table in tables:
+            async with self._conn.execute(f'PRAGMA table_info("{table}")') as cursor:
+                self.columns[table] = [row[1] for row in await cursor.fetchall()]
+        logging.info(f"ServiceNow emulator serving {sorted(self.columns)} from {self.db_path}")
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _record(self, row: aiosqlite.Row, fields: Optional[List[str]] = None) -> dict:
+        record = {}
+        for column in row.keys():
+            name = "order" if column == "order_" else column
+            if fields is None or name in fields:
+                value = row[column]
+                record[name] = "" if value is None else str(value)
+        return record
+
+    def _writable(self, table: str, fields: dict) -> dict:
+        """Map request fields onto table columns, dropping unknown ones like ServiceNow does."""
+        columns = self.columns[table]
+        values = {}
+        for name, value in fields.items():
+            column = RENAMED_COLUMNS.get(name, name)
+            if column in columns and column != "sys_id":
+                values[column] = value if value is None or isinstance(value, (int, float)) else str(value)
+        return values
+
+    async def get(self, table: str, sys_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        rows = await self._conn.execute_fetchall(f'SELECT * FROM "{table}" WHERE sys_id = ?', (sys_id,))
+        return self._record(rows[0], fields) if rows else None
+
+    async def query(
+        self,
+        table: str,
+        conditions: List[tuple],
+        limit: int,
+        offset: int,
+        fields: Optional[List[str]] = None,
+        order_by: Optional[List[tuple]] = None,
+    ) -> List[dict]:
+        """`conditions` are (field, operator, value) from parse_query; `order_by` is (field, descending)."""
+        clauses, params = [], []
+        for name, operator, value in conditions:
+            column = f'"{RENAMED_COLUMNS.get(name, name)}"'
+            if operator == "IN":
+                values = value.split(",")
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            else:
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+        sql = f'SELECT * FROM "{table}"' + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+        if order_by:
+            sql += " ORDER BY " + ", ".join(
+                f'"{RENAMED_COLUMNS.get(name, name)}"' + (" DESC" if descending else "") for name, descending in order_by
+            )
+        rows = await self._conn.execute_fetchall(sql + " LIMIT ? OFFSET ?", (*params, limit, offset))
+        return [self._record(row, fields) for row in rows]
+
+    async def insert(self, table: str, fields: dict) -> dict:
+        values = self._writable(table, fields)
+        now = _now()
+        defaults = {"sys_created_on": now, "sys_updated_on": now, "sys_mod_count": 0}
+        values.update({k: v for k, v in defaults.items() if k in self.columns[table] and k not in values})
+        values["sys_id"] = uuid.uuid4().hex
+        names = ", ".join(f'"{k}"' for k in values)
+        marks = ", ".join("?" for _ in values)
+        rows = await self._conn.execute_fetchall(
+            f'INSERT INTO "{table}" ({names}) VALUES ({marks}) RETURNING *', tuple(values.values())
+        )
+        await self._conn.commit()
+        return self._record(rows[0])
+
+    async def update(self, table: str, sys_id: str, fields: dict) -> Optional[dict]:
+        values = self._writable(table, fields)
+        assignments = [f'"{k}" = ?' for k in values]
+        params = list(values.values())
+        columns = self.columns[table]
+        entries = [f"{_now()} ({journal})\n{fields[journal]}" for journal in JOURNAL_FIELDS if fields.get(journal)]
+        if entries and "comments_and_work_notes" in columns:
+            assignments.append("comments_and_work_notes = ? || char(10) || char(10) || COALESCE(comments_and_work_notes, '')")
+            params.append("\n\n".join(reversed(entries)))
+        if "sys_mod_count" in columns:
+            assignments.append("sys_mod_count = COALESCE(sys_mod_count, 0) + 1")
+        if "sys_updated_on" in columns and "sys_updated_on" not in values:
+            assignments.append("sys_updated_on = ?")
+            params.append(_now())
+        rows = await self._conn.execute_fetchall(
+            f'UPDATE "{table}" SET {", ".join(assignments)} WHERE sys_id = ? RETURNING *', (*params, sys_id)
+        )
+        await self._conn.commit()
+        return self._record(rows[0]) if rows else None
+
+    async def seed(self, table: str, count: int) -> int:
+        """Clone the first row of `table` into `count` tickets with fresh sys_id/number."""
+        async with self._conn.execute(f'SELECT * FROM "{table}" LIMIT 1') as cursor:
+            template = await cursor.fetchone()
+        if template is None:
+            return 0
+        columns = list(template.keys())
+        marks = ", ".join("?" for _ in columns)
+        names = ", ".join(f'"{c}"' for c in columns)
+        rows = []
+        for index in range(count):
+            row = dict(template)
+            row["sys_id"] = uuid.uuid4().hex
+            if "number" in row:
+                row["number"] = f"SCTASK9{index:07d}"
+            rows.append(tuple(row[c] for c in columns))
+        await self._conn.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({marks})', rows)
+        await self._conn.commit()
+        return count
+
+
+# -----------------------------------------------------------------------
+# API
+# -----------------------------------------------------------------------
+class FaultInjector:
+    """
+    ASGI middleware adding latency/jitter and random errors. `faults` is read
+    on every request, so tests can change it on a running app.
+    """
+
+    def __init__(self, app, faults: dict):
+        self.app = app
+        self.faults = faults
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            faults = self.faults
+            delay = faults["latency_ms"] + (random.uniform(0, faults["jitter_ms"]) if faults["jitter_ms"] else 0)
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            if faults["error_rate"] and random.random() < faults["error_rate"]:
+                response = _error(faults["error_status"], "Injected failure", "SN_EMULATOR_ERROR_RATE")
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def create_app(
+    db_path: str = SN_EMULATOR_DB_PATH,
+    latency_ms: float = SN_EMULATOR_LATENCY_MS,
+    jitter_ms: float = SN_EMULATOR_JITTER_MS,
+    error_rate: float = SN_EMULATOR_ERROR_RATE,
+    error_status: int = SN_EMULATOR_ERROR_STATUS,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI(title="ServiceNow Table API emulator")
+    store = TableStore(db_path)
+    app.state.store = store
+    app.state.faults = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "error_status": error_status}
+
+    @app.on_event("startup")
+    async def startup():
+        await store.open()
+        if seed:
+            seeded = await store.seed("sc_task", seed)
+            logging.info(f"Seeded {seeded} sc_task rows.")
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await store.close()
+
+    app.add_middleware(FaultInjector, faults=app.state.faults)
+
+    def parse_fields(request: Request) -> Optional[List[str]]:
+        fields = request.query_params.get("sysparm_fields")
+        return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    @app.get("/api/now/table/{table}")
+    async def list_records(table: str, request: Request):
+        if table not in store.columns:
+            return _error(400, "Invalid table", table)
+        params = request.query_params
+        try:
+            conditions, order_by = parse_query(params.get("sysparm_query", ""))
+        except ValueError as e:
+            return _error(400, "Unsupported query", str(e))
+        for name in [c[0] for c in conditions] + [o[0] for o in order_by]:
+            if RENAMED_COLUMNS.get(name, name) not in store.columns[table]:
+                return _error(400, "Unsupported query", name)
+        limit = int(params.get("sysparm_limit", "1000"))
+        offset = int(params.get("sysparm_offset", "0"))
+        return _result(await store.query(table, conditions, limit, offset, parse_fields(request), order_by))
+
+    @app.post("/api/now/table/{table}")
+    async def create_record(table: str, request: Request):
+        if table not in store.columns:
+            return _error(400, "Invalid table", table)
+        return _result(await store.insert(table, await request.json()), status=201)
+
+    @app.get("/api/now/table/{table}/{sys_id}")
+    async def get_record(table: str, sys_id: str, request: Request):
+        if table not in store.columns:
+            return _error(400, "Invalid table", table)
+        record = await store.get(table, sys_id, parse_fields(request))
+        if record is None:
+            return _error(404, "No Record found", "Record doesn't exist or ACL restricts the record retrieval")
+        return _result(record)
+
+    @app.api_route("/api/now/table/{table}/{sys_id}", methods=["PUT", "PATCH"])
+    async def update_record(table: str, sys_id: str, request: Request):
+        if table not in store.columns:
+            return _error(400, "Invalid table", table)
+        record = await store.update(table, sys_id, await request.json())
+        if record is None:
+            return _error(404, "No Record found", "Record doesn't exist or ACL restricts the record retrieval")
+        return _result(record)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local ServiceNow Table API emulator.")
+    parser.add_argument("--db", default=SN_EMULATOR_DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency-ms", type=float, default=SN_EMULATOR_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=SN_EMULATOR_JITTER_MS)
+    parser.add_argument("--error-rate", type=float, default=SN_EMULATOR_ERROR_RATE)
+    parser.add_argument("--error-status", type=int, default=SN_EMULATOR_ERROR_STATUS)
+    parser.add_argument("--seed", type=int, default=0, help="Clone the first sc_task row into this many extra tickets.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    uvicorn.run(
+        create_app(args.db, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed),
+        host=args.host, port=args.port, log_level="warning", access_log=False,
+    )
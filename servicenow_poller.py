@@ -0,0 +1,232 @@
+"""
+Incremental ServiceNow poller: an ingestion path alongside POST /api/task.
+
+Every POLLER_INTERVAL_SECONDS it pulls open sc_task records of the
+assignment groups declared in flow_details.yml that changed since the
+last watermark, pages through them with sysparm_limit/sysparm_offset,
+asks only for the fields the graph reads (sysparm_fields) and runs each
+ticket whose short_description has a flow, at most
+POLLER_MAX_CONCURRENCY at a time.
+
+The watermark is the newest sys_updated_on seen plus the sys_ids that
+carry exactly that timestamp (the query uses >=, so ties across pages or
+polls are neither lost nor run twice). It is stored in SQLite and only
+advanced once the tickets of a poll have finished, so a restart neither
+rescans old tickets nor drops ones that were in flight; those resume from
+their checkpoints. A ticket whose thread already completed and that shows
+up again (re-opened) is run again from the start.
+
+Point SERVICENOW_ENDPOINT at servicenow_emulator.py to run it offline.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import aiosqlite
+from dotenv import load_dotenv
+
+from checkpoint_maintenance import apply_pragmas
+from flow_registry import get_flow_registry
+from servicenow_client import get_servicenow_client
+from task_store import TASK_FIELDS
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+POLLER_ENABLED = os.getenv("POLLER_ENABLED", "false").lower() in ("1", "true", "yes")
+POLLER_INTERVAL_SECONDS = float(os.getenv("POLLER_INTERVAL_SECONDS", "30"))
+POLLER_PAGE_SIZE = int(os.getenv("POLLER_PAGE_SIZE", "100"))
+POLLER_MAX_RECORDS = int(os.getenv("POLLER_MAX_RECORDS", "1000"))  # per poll
+POLLER_MAX_CONCURRENCY = int(os.getenv("POLLER_MAX_CONCURRENCY", "4"))
+POLLER_TABLE = os.getenv("POLLER_TABLE", "sc_task")
+# sc_task states picked up; 1 = Open.
+POLLER_STATES = os.getenv("POLLER_STATES", "1")
+# Where polling starts on first run, as "YYYY-MM-DD HH:MM:SS" (UTC).
+POLLER_START_WATERMARK = os.getenv("POLLER_START_WATERMARK", "1970-01-01 00:00:00")
+# Defaults to <DATABASE_PATH without extension>.poller.sqlite next to the checkpoints.
+POLLER_DB_PATH = os.getenv("POLLER_DB_PATH", "")
+
+POLL_FIELDS = TASK_FIELDS + ("sys_updated_on", "state", "assignment_group")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS poller_watermark (
+    name TEXT PRIMARY KEY,
+    updated_on TEXT NOT NULL,
+    seen_sys_ids TEXT NOT NULL,
+    saved_at REAL NOT NULL
+)
+"""
+
+
+# -----------------------------------------------------------------------
+# Poller
+# -----------------------------------------------------------------------
+class ServiceNowPoller:
+    """Polls ServiceNow for new work and feeds it to `run_job(thread_id, task_response, rerun_completed=True)`."""
+
+    def __init__(
+        self,
+        run_job: Callable[..., Awaitable[dict]],
+        table: str = POLLER_TABLE,
+        interval: float = POLLER_INTERVAL_SECONDS,
+        page_size: int = POLLER_PAGE_SIZE,
+        max_records: int = POLLER_MAX_RECORDS,
+        max_concurrency: int = POLLER_MAX_CONCURRENCY,
+        db_path: str = POLLER_DB_PATH,
+    ):
+        self.run_job = run_job
+        self.table = table
+        self.interval = interval
+        self.page_size = page_size
+        self.max_records = max_records
+        self.max_concurrency = max_concurrency
+        self.db_path = db_path
+        self.watermark = POLLER_START_WATERMARK
+        self.seen: set = set()
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self) -> None:
+        if self._conn is not None:
+            return
+        if not self.db_path:
+            base, _ = os.path.splitext(os.getenv("DATABASE_PATH") or "state.sqlite")
+            self.db_path = base + ".poller.sqlite"
+        self._conn = await aiosqlite.connect(self.db_path, check_same_thread=False)
+        await apply_pragmas(self._conn)
+        await self._conn.execute(SCHEMA)
+        await self._conn.commit()
+        rows = await self._conn.execute_fetchall(
+            "SELECT updated_on, seen_sys_ids FROM poller_watermark WHERE name = ?", (self.table,)
+        )
+        if rows:
+            self.watermark, self.seen = rows[0][0], set(json.loads(rows[0][1]))
+        logging.info(f"ServiceNow poller for {self.table} starts at watermark {self.watermark}")
+
+    async def save_watermark(self) -> None:
+        await self._conn.execute(
+            "INSERT OR REPLACE INTO poller_watermark (name, updated_on, seen_sys_ids, saved_at) VALUES (?, ?, ?, ?)",
+            (self.table, self.watermark, json.dumps(sorted(self.seen)), time.time()),
+        )
+        await self._conn.commit()
+
+    def build_query(self, groups: List[str]) -> str:
+        clauses = [
+            f"assignment_groupIN{','.join(groups)}",
+            f"stateIN{POLLER_STATES}",
+            f"sys_updated_on>={self.watermark}",
+            "ORDERBYsys_updated_on",
+        ]
+        return "^".join(clauses)
+
+    async def fetch_updates(self, groups: List[str]) -> List[dict]:
+        """All records changed since the watermark (up to max_records), oldest first."""
+        client = get_servicenow_client()
+        query = self.build_query(groups)
+        records, offset = [], 0
+        # Fetch every page before running anything: runs change ticket state,
+        # which would shift the offsets of later pages.
+        while len(records) < self.max_records:
+            response = await client.request(
+                "GET",
+                f"/api/now/table/{self.table}",
+                operation=f"poll:{self.table}",
+                params={
+                    "sysparm_query": query,
+                    "sysparm_fields": ",".join(POLL_FIELDS),
+                    "sysparm_limit": str(min(self.page_size, self.max_records - len(records))),
+                    "sysparm_offset": str(offset),
+                    "sysparm_exclude_reference_link": "true",
+                },
+            )
+            response.raise_for_status()
+            page = response.json().get("result") or []
+            records.extend(page)
+            offset += len(page)
+            if len(page) < self.page_size:
+                break
+        return records
+
+    async def poll_once(self) -> dict:
+        """One poll: fetch, run the new tickets, then advance and persist the watermark."""
+        await self.open()
+        registry = get_flow_registry()
+        if not registry.loaded:
+            await registry.start()
+        groups = registry.assignment_groups()
+        if not groups:
+            logging.warning("ServiceNow poller: no assignment_group in flow_details.yml; nothing to poll.")
+            return {"fetched": 0, "dispatched": 0, "watermark": self.watermark}
+
+        records = await self.fetch_updates(groups)
+        fresh = [r for r in records if not (r.get("sys_updated_on") == self.watermark and r.get("sys_id") in self.seen)]
+        runnable = [r for r in fresh if r.get("number") and registry.lookup(r.get("short_description") or "")]
+        for record in fresh:
+            if record not in runnable:
+                logging.debug(f"ServiceNow poller: skipping {record.get('number')}, no flow for {record.get('short_description')!r}")
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def dispatch(record: dict) -> None:
+            async with slots:
+                try:
+                    await self.run_job("task_" + record["number"], {"result": [record]}, rerun_completed=True)
+                except Exception as e:
+                    logging.error(f"ServiceNow poller: flow for {record['number']} failed: {e}")
+
+        await asyncio.gather(*(dispatch(r) for r in runnable))
+
+        if fresh:
+            newest = max(r.get("sys_updated_on") or "" for r in fresh)
+            ties = {r["sys_id"] for r in fresh if r.get("sys_updated_on") == newest}
+            self.seen = (self.seen | ties) if newest == self.watermark else ties
+            self.watermark = newest
+            await self.save_watermark()
+        logging.info(
+            f"ServiceNow poller: fetched {len(records)}, ran {len(runnable)}, watermark {self.watermark}"
+        )
+        return {"fetched": len(records), "dispatched": len(runnable), "watermark": self.watermark}
+
+    async def _run_periodically(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logging.error(f"ServiceNow poller failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        await self.open()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+_poller: Optional[ServiceNowPoller] = None
+
+
+def init_servicenow_poller(run_job: Callable[..., Awaitable[dict]]) -> ServiceNowPoller:
+    """Create the process-wide poller around `run_job`. Called from the FastAPI startup event."""
+    global _poller
+    if _poller is None:
+        _poller = ServiceNowPoller(run_job)
+    return _poller
+
+
+def get_servicenow_poller() -> Optional[ServiceNowPoller]:
+    return _poller
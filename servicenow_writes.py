@@ -0,0 +1,149 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from servicenow_client import get_servicenow_client
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+# When enabled, work notes are held back and posted as one consolidated note
+# at flow end (or every SERVICENOW_WORKNOTE_FLUSH_SECONDS, if > 0).
+SERVICENOW_CONSOLIDATE_WORKNOTES = os.getenv("SERVICENOW_CONSOLIDATE_WORKNOTES", "false").lower() in ("1", "true", "yes")
+SERVICENOW_WORKNOTE_FLUSH_SECONDS = float(os.getenv("SERVICENOW_WORKNOTE_FLUSH_SECONDS", "0"))
+WORKNOTE_SEPARATOR = "\n\n"
+
+RecordKey = Tuple[str, str]
+
+
+# -----------------------------------------------------------------------
+# Write-behind Buffer
+# -----------------------------------------------------------------------
+class ServiceNowWriteBuffer:
+    """
+    Per-record write-behind buffer for ServiceNow Table API updates.
+
+    Nodes `stage()` field updates (state, work_notes, assignment_group, ...)
+    for a (table, sys_id) record; `flush()` merges everything pending for
+    that record into a single PATCH. Later values of the same field win,
+    work notes are concatenated in order.
+    """
+
+    def __init__(
+        self,
+        consolidate_worknotes: bool = SERVICENOW_CONSOLIDATE_WORKNOTES,
+        flush_interval: float = SERVICENOW_WORKNOTE_FLUSH_SECONDS,
+    ):
+        self.consolidate_worknotes = consolidate_worknotes
+        self.flush_interval = flush_interval
+        self._fields: Dict[RecordKey, dict] = {}
+        self._notes: Dict[RecordKey, List[str]] = {}
+        self._locks: Dict[RecordKey, asyncio.Lock] = {}
+        self._lock_users: Dict[RecordKey, int] = {}
+        self._timer_task: Optional[asyncio.Task] = None
+        self.requests_sent = 0
+
+    def stage(self, table_name: str, sys_id: str, **fields) -> None:
+        """Queue field updates for a record. `work_notes` is appended, not overwritten."""
+        key = (table_name, sys_id)
+        note = fields.pop("work_notes", None)
+        if note:
+            self._notes.setdefault(key, []).append(note)
+        if fields:
+            self._fields.setdefault(key, {}).update(fields)
+
+    def has_pending(self, table_name: str, sys_id: str) -> bool:
+        key = (table_name, sys_id)
+        return bool(self._fields.get(key) or self._notes.get(key))
+
+    async def flush(self, table_name: str, sys_id: str, final: bool = False) -> bool:
+        """
+        Send pending updates for a record as one PATCH.
+        In consolidated mode work notes are only included when `final` is True.
+        Returns True if a request was sent. On failure the updates are re-queued
+        and a RuntimeError is raised.
+        """
+        key = (table_name, sys_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        # Flushers holding or waiting on the lock; it is only dropped when none are left,
+        # so two PATCHes for one record can never be in flight together.
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                return await self._send(key, final)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    async def _send(self, key: RecordKey, final: bool) -> bool:
+        table_name, sys_id = key
+        fields = self._fields.pop(key, {})
+        notes = []
+        if final or not self.consolidate_worknotes:
+            notes = self._notes.pop(key, [])
+        body = dict(fields)
+        if notes:
+            body["work_notes"] = WORKNOTE_SEPARATOR.join(notes)
+        if not body:
+            return False
+
+        try:
+            resp = await get_servicenow_client().patch_record(table_name, sys_id, body)
+            if resp.status_code != 200:
+                raise Exception(f"ServiceNow returned {resp.status_code}: {resp.text}")
+        except Exception as e:
+            self._requeue(key, fields, notes)
+            raise RuntimeError(f"Failed to update {table_name}/{sys_id}: {e}")
+
+        self.requests_sent += 1
+        return True
+
+    async def flush_all(self, final: bool = False) -> None:
+        """Flush every record with pending updates, logging (not raising) failures."""
+        keys = set(self._fields) | set(self._notes)
+        for table_name, sys_id in keys:
+            try:
+                await self.flush(table_name, sys_id, final=final)
+            except RuntimeError as e:
+                logging.error(f"Write-behind flush failed: {e}")
+
+    def _requeue(self, key: RecordKey, fields: dict, notes: List[str]) -> None:
+        # Anything staged while the request was in flight is newer and wins.
+        self._fields[key] = {**fields, **self._fields.get(key, {})}
+        if notes:
+            self._notes[key] = notes + self._notes.get(key, [])
+
+    async def start(self) -> None:
+        """Start the periodic work-note flush when consolidation and a timer are configured."""
+        if self.consolidate_worknotes and self.flush_interval > 0 and self._timer_task is None:
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the timer and push out anything still pending."""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        await self.flush_all(final=True)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_all(final=True)
+
+
+_buffer: Optional[ServiceNowWriteBuffer] = None
+
+
+def get_write_buffer() -> ServiceNowWriteBuffer:
+    """Return the process-wide write-behind buffer."""
+    global _buffer
+    if _buffer is None:
+        _buffer = ServiceNowWriteBuffer()
+    return _buffer
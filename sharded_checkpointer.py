@@ -0,0 +1,165 @@
+"""
+Checkpointer that spreads graph threads over several SQLite files.
+
+Every thread_id maps to one shard by a stable hash, and each shard is an
+ordinary AsyncSqliteSaver with its own aiosqlite connection (and thus its
+own writer thread and lock), so checkpoint writes of unrelated tickets no
+longer queue behind one connection. Drop-in for AsyncSqliteSaver in
+`builder.compile(checkpointer=...)`.
+
+CHECKPOINT_SHARDS=1 (the default) keeps the single DATABASE_PATH file.
+"""
+import os
+import zlib
+import heapq
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from checkpoint_maintenance import apply_pragmas
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+CHECKPOINT_SHARDS = int(os.getenv("CHECKPOINT_SHARDS", "1"))
+
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """state_db/stateMemory.sqlite -> state_db/stateMemory.shard0.sqlite, ..."""
+    base, ext = os.path.splitext(db_path)
+    return [f"{base}.shard{i}{ext}" for i in range(shards)]
+
+
+def _thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    if not config:
+        return None
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return None if thread_id is None else str(thread_id)
+
+
+# -----------------------------------------------------------------------
+# Sharded Saver
+# -----------------------------------------------------------------------
+class ShardedSqliteSaver(BaseCheckpointSaver[str]):
+    """Routes every checkpoint call to the AsyncSqliteSaver owning the thread_id."""
+
+    def __init__(self, shards: List[AsyncSqliteSaver]):
+        super().__init__(serde=shards[0].serde)
+        self.shards = shards
+
+    @classmethod
+    async def open(cls, db_path: str, shards: int) -> "ShardedSqliteSaver":
+        savers = []
+        for path in shard_paths(db_path, shards):
+            conn = await aiosqlite.connect(path, check_same_thread=False)
+            await apply_pragmas(conn)
+            savers.append(AsyncSqliteSaver(conn))
+        return cls(savers)
+
+    def shard_for(self, thread_id: str) -> AsyncSqliteSaver:
+        # crc32 rather than hash(): the mapping must survive restarts.
+        return self.shards[zlib.crc32(thread_id.encode()) % len(self.shards)]
+
+    def _route(self, config: RunnableConfig) -> AsyncSqliteSaver:
+        thread_id = _thread_id(config)
+        if thread_id is None:
+            raise ValueError("ShardedSqliteSaver needs configurable.thread_id to pick a shard.")
+        return self.shard_for(thread_id)
+
+    async def aclose(self) -> None:
+        for shard in self.shards:
+            await shard.conn.close()
+
+    # Async API -------------------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._route(config).aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if _thread_id(config) is not None:
+            async for item in self._route(config).alist(config, filter=filter, before=before, limit=limit):
+                yield item
+            return
+        # No thread_id: merge the shards newest-first, as a single file would order them.
+        per_shard = []
+        for shard in self.shards:
+            per_shard.append([item async for item in shard.alist(config, filter=filter, before=before, limit=limit)])
+        merged = heapq.merge(*per_shard, key=lambda t: t.config["configurable"]["checkpoint_id"], reverse=True)
+        for count, item in enumerate(merged):
+            if limit is not None and count >= limit:
+                break
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await self._route(config).aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        await self._route(config).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.shard_for(str(thread_id)).adelete_thread(thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await self._route(config).aget_delta_channel_history(config=config, channels=channels)
+
+    # Sync API (used outside the event loop, e.g. graph.get_state from a thread) --
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._route(config).get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if _thread_id(config) is not None:
+            yield from self._route(config).list(config, filter=filter, before=before, limit=limit)
+            return
+        # No thread_id: merge the shards newest-first, as alist() does. Each shard is
+        # drained (at most `limit` rows) so no shard iterator is abandoned half-way.
+        per_shard = [list(shard.list(config, filter=filter, before=before, limit=limit)) for shard in self.shards]
+        merged = heapq.merge(*per_shard, key=lambda t: t.config["configurable"]["checkpoint_id"], reverse=True)
+        for count, item in enumerate(merged):
+            if limit is not None and count >= limit:
+                break
+            yield item
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return self._route(config).put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        self._route(config).put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.shard_for(str(thread_id)).delete_thread(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        return self.shards[0].get_next_version(current, channel)
+
+
+async def open_checkpointer(db_path: str, shards: int = CHECKPOINT_SHARDS) -> BaseCheckpointSaver:
+    """AsyncSqliteSaver on `db_path` for one shard, ShardedSqliteSaver otherwise."""
+    if shards <= 1:
+        conn = await aiosqlite.connect(db_path, check_same_thread=False)
+        await apply_pragmas(conn)
+        return AsyncSqliteSaver(conn)
+    return await ShardedSqliteSaver.open(db_path, shards)
+
+
+async def close_checkpointer(saver: BaseCheckpointSaver) -> None:
+    """Close the connection(s) opened by open_checkpointer; aiosqlite's worker threads keep the process alive otherwise."""
+    if isinstance(saver, ShardedSqliteSaver):
+        await saver.aclose()
+    else:
+        await saver.conn.close()
@@ -0,0 +1,104 @@
+"""
+Single-flight execution of graph runs per thread_id.
+
+A ticket submitted again while its run is still in flight attaches to
+that run and receives its final state instead of starting a second
+ainvoke on the same thread (which would repeat every script and
+ServiceNow call and race on the checkpointer). A run that completed less
+than SINGLE_FLIGHT_WINDOW_SECONDS ago is answered from its result as well,
+which absorbs retry storms that arrive just after completion.
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from metrics import SINGLE_FLIGHT_REQUESTS
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+SINGLE_FLIGHT_WINDOW_SECONDS = float(os.getenv("SINGLE_FLIGHT_WINDOW_SECONDS", "5"))
+SINGLE_FLIGHT_RETENTION = int(os.getenv("SINGLE_FLIGHT_RETENTION", "1000"))
+
+
+class SingleFlight:
+    """Collapses concurrent (and just-finished) calls with the same key into one."""
+
+    def __init__(self, window: float = SINGLE_FLIGHT_WINDOW_SECONDS, retention: int = SINGLE_FLIGHT_RETENTION):
+        self.window = window
+        self.retention = retention
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._recent: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (finished_at, result), oldest first
+
+    def _recent_result(self, key: str):
+        now = time.monotonic()
+        while self._recent:
+            finished_at, _ = next(iter(self._recent.values()))
+            if now - finished_at < self.window and len(self._recent) <= self.retention:
+                break
+            self._recent.popitem(last=False)
+        entry = self._recent.get(key)
+        return entry[1] if entry is not None else None
+
+    def forget(self, key: str) -> None:
+        """Drop a remembered result so the next call runs again (e.g. an explicit restart)."""
+        self._recent.pop(key, None)
+
+    async def run(self, key: str, call: Callable[[], Awaitable]):
+        """Await `call()` unless a run for `key` is in flight or finished within the window."""
+        if self.window > 0:
+            result = self._recent_result(key)
+            if result is not None:
+                SINGLE_FLIGHT_REQUESTS.inc(result="recent")
+                return result
+
+        waiting = self._inflight.get(key)
+        if waiting is not None:
+            SINGLE_FLIGHT_REQUESTS.inc(result="joined")
+            try:
+                return await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                if not waiting.cancelled():
+                    raise
+                # The run we joined was cancelled, not us: start it again.
+                return await self.run(key, call)
+
+        SINGLE_FLIGHT_REQUESTS.inc(result="leader")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; do not warn about an unretrieved exception.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(result)
+        if self.window > 0:
+            self._recent[key] = (time.monotonic(), result)
+            self._recent.move_to_end(key)
+        return result
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide SingleFlight used by main.run_flow."""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
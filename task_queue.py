@@ -0,0 +1,89 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+TASK_QUEUE_MAX_DEPTH = int(os.getenv("TASK_QUEUE_MAX_DEPTH", "100"))
+TASK_STATUS_RETENTION = int(os.getenv("TASK_STATUS_RETENTION", "10000"))
+
+
+class QueueFullError(Exception):
+    """Raised when the task queue is at TASK_QUEUE_MAX_DEPTH."""
+
+
+# -----------------------------------------------------------------------
+# Bounded In-process Worker Pool
+# -----------------------------------------------------------------------
+class TaskWorkerPool:
+    """
+    Runs graph invocations on a fixed number of asyncio workers fed by a
+    bounded queue. `submit` never blocks: when the queue is full it raises
+    QueueFullError so the API can push back on the caller.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[..., Awaitable[dict]],
+        workers: int = TASK_WORKERS,
+        max_depth: int = TASK_QUEUE_MAX_DEPTH,
+        status_retention: int = TASK_STATUS_RETENTION,
+    ):
+        self._run_job = run_job
+        self._worker_count = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_depth)
+        self._workers: List[asyncio.Task] = []
+        self._status: "OrderedDict[str, dict]" = OrderedDict()
+        self._status_retention = status_retention
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        return sum(1 for s in self._status.values() if s["status"] == "running")
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker(i)) for i in range(self._worker_count)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, thread_id: str, payload: dict, **options) -> None:
+        """Queue a job, or raise QueueFullError if the queue is at capacity. `options` are passed to run_job."""
+        try:
+            self._queue.put_nowait((thread_id, payload, options))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Task queue is full ({self._queue.maxsize} pending).")
+        self._set_status(thread_id, "queued")
+
+    def get_status(self, thread_id: str) -> Optional[dict]:
+        return self._status.get(thread_id)
+
+    def _set_status(self, thread_id: str, status: str, error: str = "") -> None:
+        self._status[thread_id] = {"status": status, "error": error}
+        self._status.move_to_end(thread_id)
+        while len(self._status) > self._status_retention:
+            self._status.popitem(last=False)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            thread_id, payload, options = await self._queue.get()
+            self._set_status(thread_id, "running")
+            try:
+                await self._run_job(thread_id, payload, **options)
+                self._set_status(thread_id, "completed")
+            except Exception as e:
+                logging.error(f"Worker {worker_id}: flow for {thread_id} failed: {e}")
+                self._set_status(thread_id, "failed", str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,145 @@
+"""
+Content-addressed store for ServiceNow ticket payloads.
+
+The full APIResponse of a ticket is immutable for the lifetime of a flow,
+so it is written once to the `task_blobs` table keyed by the SHA-256 of
+its canonical JSON. Graph state carries only that key (`task_ref`) and a
+slim projection of the fields nodes read (`task`), which keeps every
+checkpoint small. Scripts that need the whole payload (the PowerShell
+header) read the cached JSON text by reference.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Set
+
+import aiosqlite
+from dotenv import load_dotenv
+
+from checkpoint_maintenance import apply_pragmas
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+# Defaults to <DATABASE_PATH without extension>.blobs.sqlite next to the checkpoints.
+TASK_BLOB_DB_PATH = os.getenv("TASK_BLOB_DB_PATH", "")
+TASK_BLOB_CACHE_SIZE = int(os.getenv("TASK_BLOB_CACHE_SIZE", "1024"))
+
+# The only ticket fields graph nodes use; everything else stays in the blob.
+TASK_FIELDS = ("sys_id", "sys_class_name", "number", "short_description", "description")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_blobs (
+    sha256 TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def canonical_json(payload: dict) -> str:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+def slim_task(task_response: dict) -> dict:
+    """Project result[0] of an APIResponse onto TASK_FIELDS ({} if there is no task)."""
+    tasks = task_response.get("result") or []
+    if not tasks:
+        return {}
+    return {field: tasks[0].get(field) for field in TASK_FIELDS}
+
+
+# -----------------------------------------------------------------------
+# Blob Store
+# -----------------------------------------------------------------------
+class TaskBlobStore:
+    """SQLite-backed, deduplicating payload store with an in-memory LRU of JSON text."""
+
+    def __init__(self, db_path: str = TASK_BLOB_DB_PATH, cache_size: int = TASK_BLOB_CACHE_SIZE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    async def open(self) -> None:
+        if self._conn is not None:
+            return
+        if not self.db_path:
+            base, _ = os.path.splitext(os.getenv("DATABASE_PATH") or "state.sqlite")
+            self.db_path = base + ".blobs.sqlite"
+        self._conn = await aiosqlite.connect(self.db_path, check_same_thread=False)
+        await apply_pragmas(self._conn)
+        await self._conn.execute(SCHEMA)
+        await self._conn.commit()
+        logging.info(f"Task blob store opened at {self.db_path}")
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _remember(self, ref: str, text: str) -> None:
+        self._cache[ref] = text
+        self._cache.move_to_end(ref)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def put(self, payload: dict) -> str:
+        """
+        Store `payload` if it is new and return its reference (SHA-256 hex).
+        A payload stored before has its created_at re-stamped, so retention
+        (prune) measures age from the latest submission that used it.
+        """
+        text = canonical_json(payload)
+        ref = hashlib.sha256(text.encode()).hexdigest()
+        await self.open()
+        await self._conn.execute(
+            "INSERT INTO task_blobs (sha256, payload, created_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (sha256) DO UPDATE SET created_at = excluded.created_at",
+            (ref, text, time.time()),
+        )
+        await self._conn.commit()
+        self._remember(ref, text)
+        return ref
+
+    async def get_json(self, ref: str) -> str:
+        """Canonical JSON text of a stored payload. Raises KeyError for unknown refs."""
+        text = self._cache.get(ref)
+        if text is None:
+            await self.open()
+            rows = await self._conn.execute_fetchall("SELECT payload FROM task_blobs WHERE sha256 = ?", (ref,))
+            if not rows:
+                raise KeyError(f"Unknown task payload reference: {ref}")
+            text = rows[0][0]
+        self._remember(ref, text)
+        return text
+
+    async def get(self, ref: str) -> dict:
+        return json.loads(await self.get_json(ref))
+
+    async def prune(self, before: float, keep: Set[str] = frozenset()) -> int:
+        """Delete payloads last stored before `before` (epoch seconds), except the refs in `keep`."""
+        await self.open()
+        rows = await self._conn.execute_fetchall("SELECT sha256 FROM task_blobs WHERE created_at < ?", (before,))
+        stale = [(ref,) for ref, in rows if ref not in keep]
+        if stale:
+            await self._conn.executemany("DELETE FROM task_blobs WHERE sha256 = ?", stale)
+            await self._conn.commit()
+            for ref, in stale:
+                self._cache.pop(ref, None)
+        return len(stale)
+
+
+_store: Optional[TaskBlobStore] = None
+
+
+def get_task_store() -> TaskBlobStore:
+    """Return the process-wide TaskBlobStore. Call `await store.open()` at startup."""
+    global _store
+    if _store is None:
+        _store = TaskBlobStore()
+    return _store
@@ -0,0 +1,115 @@
+import os
+import json
+import asyncio
+
+import action_cache
+from action_cache import ActionCache, action_cache_key
+from flow_manifest import compile_flow_manifest
+
+USE_CASES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "UseCases")
+
+
+class CountingAction:
+    """Returns run_script-shaped results: `status` is the exit status, `reported` the script's own Status."""
+
+    def __init__(self, status="Success", delay=0.01, reported="Success"):
+        self.calls = 0
+        self.status = status
+        self.reported = reported
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        outputs = {"Status": self.reported, "n": self.calls}
+        return {"Status": self.status, "Outputs": outputs, "OutputMessage": json.dumps(outputs)}
+
+
+def test_concurrent_misses_share_one_run_and_later_calls_hit_memory():
+    cache = ActionCache(db_path="")
+    action = CountingAction()
+
+    async def scenario():
+        key = action_cache_key("sha", {"OwnerEmail": "a@example.com"}, ("OwnerEmail",))
+        first = await asyncio.gather(*(cache.get_or_run(key, 60, action) for _ in range(4)))
+        later = await cache.get_or_run(key, 60, action)
+        return first, later
+
+    first, later = asyncio.run(scenario())
+    assert action.calls == 1
+    assert sorted(r.get("Stats", {}).get("Cached", "miss") for r in first) == ["inflight"] * 3 + ["miss"]
+    assert later["Stats"]["Cached"] == "memory"
+
+
+def test_errors_are_not_cached_and_entries_expire(monkeypatch):
+    cache = ActionCache(db_path="")
+    failing = CountingAction(status="Error", delay=0)
+    ok = CountingAction(delay=0)
+    now = [1000.0]
+    monkeypatch.setattr(action_cache.time, "time", lambda: now[0])
+
+    async def scenario():
+        await cache.get_or_run("k1", 60, failing)
+        await cache.get_or_run("k1", 60, failing)
+        await cache.get_or_run("k2", 60, ok)
+        now[0] += 61
+        await cache.get_or_run("k2", 60, ok)
+
+    asyncio.run(scenario())
+    assert failing.calls == 2
+    assert ok.calls == 2
+
+
+def test_exit_0_with_an_error_reported_in_the_output_is_not_cached():
+    cache = ActionCache(db_path="")
+    unreachable = CountingAction(delay=0, reported="Error")
+    not_json = CountingAction(delay=0)
+
+    async def not_json_run():
+        result = await not_json()
+        return {**result, "OutputMessage": "Get-ADUser : Unable to contact the server."}
+
+    async def scenario():
+        for _ in range(2):
+            await cache.get_or_run("owner", 300, unreachable)
+            await cache.get_or_run("user", 300, not_json_run)
+
+    asyncio.run(scenario())
+    assert (unreachable.calls, not_json.calls) == (2, 2)
+
+
+def test_key_depends_only_on_listed_inputs_and_script_hash():
+    key = action_cache_key("sha1", {"OwnerEmail": "a", "uniquegroupname": "g1"}, ("OwnerEmail",))
+    assert key == action_cache_key("sha1", {"OwnerEmail": "a", "uniquegroupname": "g2"}, ("OwnerEmail",))
+    assert key != action_cache_key("sha2", {"OwnerEmail": "a"}, ("OwnerEmail",))
+    assert key != action_cache_key("sha1", {"OwnerEmail": "b"}, ("OwnerEmail",))
+
+
+def test_sqlite_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    action = CountingAction(delay=0)
+
+    async def scenario():
+        first = ActionCache(db_path=path)
+        await first.open()
+        await first.get_or_run("k", 60, action)
+        await first.close()
+        second = ActionCache(db_path=path)
+        await second.open()
+        result = await second.get_or_run("k", 60, action)
+        await second.close()
+        return result
+
+    assert asyncio.run(scenario())["Stats"]["Cached"] == "sqlite"
+    assert action.calls == 1
+
+
+def test_checks_guarding_a_create_are_not_cacheable():
+    # A cached "does not exist / free" answer would let a second ticket for the
+    # same name through to the create step, where it fails late.
+    group = compile_flow_manifest("SecurityGroupCreation", USE_CASES)
+    assert set(group.cache_policies) == {
+        "3 - Check_Owner_Existance.ps1",
+        "5 - Check_User_existence_output_samaccount.ps1",
+    }
+    assert compile_flow_manifest("ADUserCreation", USE_CASES).cache_policies == {}
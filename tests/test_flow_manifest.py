@@ -0,0 +1,51 @@
+import os
+import asyncio
+
+import pytest
+
+from flow_manifest import ManifestStore, compile_flow_manifest
+
+SEQUENTIAL = {"1 - a.py": [], "2 - b.py": ["1 - a.py"]}
+
+
+def make_flow(root, spec=None):
+    flow_dir = root / "TestFlow"
+    flow_dir.mkdir(exist_ok=True)
+    for name in SEQUENTIAL:
+        (flow_dir / name).write_text("print('ok')\n")
+    if spec is not None:
+        (flow_dir / "flow.yml").write_text(spec)
+    return flow_dir
+
+
+@pytest.mark.parametrize("spec", [
+    "- 1 - a.py\n- 2 - b.py\n",
+    "just a string\n",
+    "depends_on: [1 - a.py]\n",
+    "depends_on:\n  2 - b.py: 7\ncacheable:\n  1 - a.py: 300\n",
+])
+def test_malformed_flow_spec_falls_back_to_sequential(tmp_path, spec):
+    make_flow(tmp_path, spec)
+    manifest = compile_flow_manifest("TestFlow", str(tmp_path))
+    assert manifest.dependencies == SEQUENTIAL
+    assert manifest.cache_policies == {}
+
+
+def test_watcher_survives_a_flow_spec_that_is_not_a_mapping(tmp_path):
+    flow_dir = make_flow(tmp_path)
+    store = ManifestStore(str(tmp_path), poll_interval=0.01)
+
+    async def scenario():
+        await store.start()
+        (flow_dir / "flow.yml").write_text("- not\n- a mapping\n")
+        os.utime(flow_dir / "flow.yml", (2000, 2000))
+        await asyncio.sleep(0.1)
+        (flow_dir / "flow.yml").write_text("depends_on:\n  2 - b.py: []\n")
+        os.utime(flow_dir / "flow.yml", (3000, 3000))
+        await asyncio.sleep(0.1)
+        alive = not store._watch_task.done()
+        await store.stop()
+        return alive
+
+    assert asyncio.run(scenario())
+    assert store.get("TestFlow").dependencies == {"1 - a.py": [], "2 - b.py": []}
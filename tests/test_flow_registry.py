@@ -0,0 +1,34 @@
+import os
+import asyncio
+
+from flow_registry import FlowRegistry
+
+VALID = 'flows:\n  - short_description: "{name}"\n    flow_name: "TestFlow"\n    reassignment_group: "grp"\n'
+
+
+def write(path, text, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_watcher_keeps_previous_index_on_bad_edits_and_keeps_running(tmp_path):
+    path = str(tmp_path / "flow_details.yml")
+    write(path, VALID.format(name="First"), 1000)
+    registry = FlowRegistry(path, poll_interval=0.01)
+
+    async def scenario():
+        await registry.start()
+        seen = []
+        for mtime, text in enumerate(("flows: [unclosed\n", "- just\n- a list\n", "flows:\n  - 42\n"), start=1001):
+            write(path, text, mtime)
+            await asyncio.sleep(0.05)
+            seen.append((registry.lookup("First") is not None, registry._watch_task.done()))
+        write(path, VALID.format(name="Second"), 2000)
+        await asyncio.sleep(0.05)
+        seen.append((registry.lookup("Second") is not None, registry._watch_task.done()))
+        await registry.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == [(True, False)] * 4
+    assert registry.lookup("First") is None
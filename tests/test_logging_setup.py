@@ -0,0 +1,36 @@
+import queue
+import logging
+
+from logging_setup import DeferredQueueHandler, TextFormatter
+
+
+def queued_logger(name):
+    records = queue.SimpleQueue()
+    logger = logging.getLogger(name)
+    logger.handlers = [DeferredQueueHandler(records)]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, records
+
+
+def test_container_args_are_rendered_before_the_state_changes():
+    logger, records = queued_logger("test_logging_setup.containers")
+    state = {"action_index": 1, "completed_actions": ["1 - a.py"]}
+    logger.debug("%s: %s", "state", state)
+    state["action_index"] = 2
+    state["completed_actions"].append("2 - b.py")
+    for i in range(100):
+        state[f"k{i}"] = i
+
+    record = records.get_nowait()
+    assert record.args is None
+    assert record.getMessage() == "state: {'action_index': 1, 'completed_actions': ['1 - a.py']}"
+
+
+def test_scalar_args_are_left_to_the_listener():
+    logger, records = queued_logger("test_logging_setup.scalars")
+    logger.info("%s finished: exit=%s duration=%ss", "step.ps1", 0, 0.25)
+
+    record = records.get_nowait()
+    assert record.args == ("step.ps1", 0, 0.25)
+    assert TextFormatter("%(message)s").format(record) == "step.ps1 finished: exit=0 duration=0.25s"
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+import script_runner
+from powershell_pool import PowerShellPool, calls_exit
+
+STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "stub_powershell_worker.py")
+USE_CASES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "UseCases")
+
+
+@pytest.fixture
+def task_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("STUB_STARTUP_SECONDS", "0")
+    monkeypatch.setenv("STUB_LATENCY_SECONDS", "0")
+    path = tmp_path / "task.json"
+    path.write_text(json.dumps({"result": [{"number": "SCTASK0000001"}]}), encoding="utf-8")
+    return str(path)
+
+
+def make_pool(**options):
+    return PowerShellPool(size=options.pop("size", 2), health_interval=0, command=[sys.executable, STUB], **options)
+
+
+def test_requests_and_responses_are_framed_past_stray_output(task_file):
+    pool = make_pool()
+
+    async def scenario():
+        try:
+            return [await pool.execute(script, task_file, {"a": 1}, timeout=10) for script in ("[Console]::WriteLine('x')", "Write-Output 1")]
+        finally:
+            await pool.stop()
+
+    results = asyncio.run(scenario())
+    assert [json.loads(r["Result"])["OutputMessage"].endswith("SCTASK0000001") for r in results] == [True, True]
+    assert [r["ExitCode"] for r in results] == [0, 0]
+    assert pool.spawned == 1
+
+
+def test_workers_are_recycled_after_max_uses(task_file):
+    pool = make_pool(max_uses=2)
+
+    async def scenario():
+        try:
+            for _ in range(5):
+                await pool.execute("Write-Output 1", task_file, {}, timeout=10)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+    assert (pool.spawned, pool.recycled) == (3, 2)
+
+
+def test_health_check_replaces_dead_idle_workers(task_file):
+    pool = make_pool()
+
+    async def scenario():
+        try:
+            await asyncio.gather(*(pool.execute("Start-Sleep 0.1", task_file, {}, timeout=10) for _ in range(2)))
+            dead, healthy = pool._idle
+            dead.kill()
+            await dead.process.wait()
+            await pool.check_health()
+            state = (pool._idle == [healthy], pool._total)
+            await pool.execute("Write-Output 1", task_file, {}, timeout=10)
+            return state
+        finally:
+            await pool.stop()
+
+    assert asyncio.run(scenario()) == (True, 1)
+    assert pool.spawned == 2
+
+
+def test_timed_out_worker_is_discarded_and_the_pool_recovers(task_file):
+    pool = make_pool(size=1)
+
+    async def scenario():
+        try:
+            timed_out = await pool.execute("Start-Sleep 5", task_file, {}, timeout=0.3)
+            total = pool._total
+            after = await pool.execute("Write-Output 1", task_file, {}, timeout=10)
+            return timed_out, total, after
+        finally:
+            await pool.stop()
+
+    timed_out, total, after = asyncio.run(scenario())
+    assert timed_out["TimedOut"] and total == 0
+    assert after["ExitCode"] == 0 and pool.spawned == 2
+
+
+def test_scripts_that_call_exit_bypass_the_pool(monkeypatch, task_file):
+    pool = make_pool()
+    monkeypatch.setattr(script_runner, "get_powershell_pool", lambda: pool)
+    used = []
+
+    def runner(name):
+        async def run(*args, **kwargs):
+            used.append(name)
+            return {"ExitCode": 0, "Stdout": "", "Stderr": "", "Result": None, "TimedOut": False, "BytesOut": 0, "Duration": 0, "QueueWait": 0}
+        return run
+
+    pooled, spawned = runner("pool"), runner("process")
+
+    monkeypatch.setattr(script_runner, "run_pooled_powershell", pooled)
+    monkeypatch.setattr(script_runner, "run_process", spawned)
+
+    async def scenario():
+        for script in ("Write-Output 'ok'", "if ($bad) { Exit }\nWrite-Output 'ok'"):
+            await script_runner.run_script("step.ps1", {}, "{}", script_text=script, task_ref="ref")
+
+    asyncio.run(scenario())
+    assert used == ["pool", "process"]
+
+
+def test_shipped_scripts_that_call_exit_are_detected():
+    def script(name):
+        with open(os.path.join(USE_CASES, "ADUserCreation", name), encoding="utf-8") as f:
+            return f.read()
+
+    assert calls_exit(script("2 - DisplayNameValidation.ps1"))
+    assert calls_exit(script("4 - ADUserCreation.ps1"))
+    assert not calls_exit("$Exitcode = 'User Created Successfully'; $Exitcode")
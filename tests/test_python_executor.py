@@ -0,0 +1,122 @@
+import asyncio
+
+from python_executor import PythonActionExecutor, inspect_action
+
+MODULE_ACTION = """
+import json
+
+TRUSTED = True
+DEFAULTS = {"retries": 3, "groups": ("a", "b")}
+LIMIT: int = -1
+
+async def main(inputs):
+    return {"Status": "Success", "version": 1, **inputs}
+"""
+
+
+def test_module_with_literal_assignments_is_import_safe():
+    assert inspect_action(MODULE_ACTION) == {"is_async": True, "trusted": True}
+
+
+def test_assignments_with_side_effects_mark_a_legacy_script():
+    assert inspect_action("import requests\nr = requests.get('http://x')\ndef main(inputs):\n    return r\n") is None
+    assert inspect_action("import sys, json\nargs = json.loads(sys.argv[1])\ndef main(inputs):\n    return args\n") is None
+    assert inspect_action("import os\nHOME: str = os.environ['HOME']\ndef main(inputs):\n    return {}\n") is None
+    assert inspect_action("def main(inputs):\n    return {}\nmain({})\n") is None
+
+
+def _run(executor, path, info, inputs):
+    async def call():
+        try:
+            return await executor.run(path, info, inputs, timeout=30)
+        finally:
+            await executor.stop()
+    return asyncio.run(call())
+
+
+def test_runs_the_inspected_source_even_if_the_file_changed(tmp_path):
+    path = tmp_path / "action.py"
+    path.write_text(MODULE_ACTION)
+    executor = PythonActionExecutor(workers=1)
+    info = executor.describe(str(path), MODULE_ACTION, "sha-v1")
+    path.write_text(MODULE_ACTION.replace('"version": 1', '"version": 2'))
+
+    result = _run(executor, str(path), info, {"a": 1})
+    assert result["Mode"] == "in_loop"
+    assert result["Outputs"] == {"Status": "Success", "version": 1, "a": 1}
+
+
+def test_process_pool_runs_the_inspected_source(tmp_path):
+    source = MODULE_ACTION.replace("TRUSTED = True", "TRUSTED = False")
+    path = tmp_path / "pooled_action.py"
+    path.write_text("raise SystemExit('stale file must not be loaded')\n")
+    executor = PythonActionExecutor(workers=1)
+    info = executor.describe(str(path), source, "sha-v1")
+
+    result = _run(executor, str(path), info, {"a": 2})
+    assert result["Mode"] == "process_pool"
+    assert result["Error"] == ""
+    assert result["Outputs"]["a"] == 2
+
+
+EXITING_ACTION = """
+import sys
+
+def main(inputs):
+    sys.exit(inputs.get("code", 1))
+"""
+
+SLEEPING_ACTION = """
+import time
+
+def main(inputs):
+    time.sleep(inputs["sleep"])
+    return {"Status": "Success", "slept": inputs["sleep"]}
+"""
+
+
+def test_sys_exit_in_an_action_is_reported_as_its_error(tmp_path):
+    pooled = tmp_path / "exiting.py"
+    in_loop = tmp_path / "exiting_async.py"
+    executor = PythonActionExecutor(workers=1)
+    pooled_info = executor.describe(str(pooled), EXITING_ACTION, "sha-exit")
+    async_source = "import sys\nTRUSTED = True\n\nasync def main(inputs):\n    raise SystemExit(3)\n"
+    in_loop_info = executor.describe(str(in_loop), async_source, "sha-exit-async")
+
+    async def scenario():
+        try:
+            first = await executor.run(str(pooled), pooled_info, {"code": 1}, timeout=30)
+            second = await executor.run(str(in_loop), in_loop_info, {}, timeout=30)
+            # The pool worker survives the action's SystemExit.
+            third = await executor.run(str(pooled), pooled_info, {"code": 2}, timeout=30)
+            return first, second, third
+        finally:
+            await executor.stop()
+
+    first, second, third = asyncio.run(scenario())
+    assert (first["ExitCode"], first["Error"]) == (1, "SystemExit: 1")
+    assert (second["Mode"], second["Error"]) == ("in_loop", "SystemExit: 3")
+    assert third["Error"] == "SystemExit: 2"
+
+
+def test_timeout_does_not_break_actions_running_alongside(tmp_path):
+    path = tmp_path / "sleeping.py"
+    executor = PythonActionExecutor(workers=2)
+    info = executor.describe(str(path), SLEEPING_ACTION, "sha-sleep")
+
+    async def scenario():
+        try:
+            # Warm both workers so the stuck action does not delay the other one's start.
+            await asyncio.gather(*(executor.run(str(path), info, {"sleep": 0.2}, timeout=30) for _ in range(2)))
+            stuck = asyncio.create_task(executor.run(str(path), info, {"sleep": 30}, timeout=0.5))
+            slow = asyncio.create_task(executor.run(str(path), info, {"sleep": 1.5}, timeout=30))
+            stuck, slow = await asyncio.gather(stuck, slow)
+            after = await executor.run(str(path), info, {"sleep": 0}, timeout=30)
+            return stuck, slow, after
+        finally:
+            await executor.stop()
+
+    stuck, slow, after = asyncio.run(scenario())
+    assert stuck["TimedOut"]
+    assert (slow["Error"], slow["Outputs"]) == ("", {"Status": "Success", "slept": 1.5})
+    assert after["Error"] == "" and not executor._running
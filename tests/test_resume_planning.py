@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import main
+import flow_logic
+
+
+class FakeGraph:
+    """Checkpointed thread state plus a record of what each ainvoke was started with."""
+
+    def __init__(self, values=None, next=()):
+        self.snapshot = SimpleNamespace(values=values or {}, next=next)
+        self.inputs = []
+
+    async def aget_state(self, config):
+        return self.snapshot
+
+    async def ainvoke(self, graph_input, config=None):
+        self.inputs.append(graph_input)
+        return {"flow_name": "TestFlow", "error_occurred": False}
+
+
+class FakeTaskStore:
+    async def put(self, task_response):
+        return "ref"
+
+
+TASK = {"result": [{"number": "S1", "sys_id": "abc", "short_description": "Test"}]}
+
+
+def invoke(monkeypatch, graph, **options):
+    monkeypatch.setattr(main, "graph", graph)
+    monkeypatch.setattr(main, "get_task_store", lambda: FakeTaskStore())
+    return asyncio.run(main.invoke_flow("task_S1", TASK, **options))
+
+
+def test_new_thread_starts_from_start(monkeypatch):
+    graph = FakeGraph()
+    invoke(monkeypatch, graph)
+    assert [(i["resume"], i["task_ref"]) for i in graph.inputs] == [(False, "ref")]
+
+
+def test_interrupted_run_continues_from_its_checkpoint(monkeypatch):
+    graph = FakeGraph({"flow_name": "TestFlow"}, next=("execute_actions",))
+    invoke(monkeypatch, graph)
+    assert graph.inputs == [None]
+
+
+def test_failed_run_is_resumed_and_completed_run_is_not_invoked_again(monkeypatch):
+    failed = FakeGraph({"flow_name": "TestFlow", "error_occurred": True})
+    invoke(monkeypatch, failed)
+    assert [i["resume"] for i in failed.inputs] == [True]
+
+    done = FakeGraph({"flow_name": "TestFlow", "error_occurred": False, "run_id": "r1"})
+    assert invoke(monkeypatch, done)["run_id"] == "r1"
+    assert done.inputs == []
+
+
+def test_restart_runs_a_completed_thread_from_start(monkeypatch):
+    graph = FakeGraph({"flow_name": "TestFlow", "error_occurred": False})
+    invoke(monkeypatch, graph, restart=True)
+    assert [i["resume"] for i in graph.inputs] == [False]
+
+
+def test_resume_keeps_successful_actions_and_retries_failed_ones(monkeypatch):
+    logged = []
+    monkeypatch.setattr(flow_logic, "log_execution", lambda run_id, *entries: logged.append((run_id, entries)) or len(entries))
+    state = {"run_id": "r1", "completed_actions": ["1 - a.py", "2 - b.py", "3 - c.py"], "failed_actions": ["3 - c.py"]}
+    update = flow_logic.resume_flow_state(state, {"flow_name": "TestFlow", "reassignment_group": "grp"}, {"action": "x"})
+    assert update["completed_actions"].value == ["1 - a.py", "2 - b.py"]
+    assert update["failed_actions"].value == []
+    assert update["action_index"] == 2
+    assert logged[0][0] == "r1"
+    assert logged[0][1][1] == {"action": "resume_flow", "skipped_actions": ["1 - a.py", "2 - b.py"], "retried_actions": ["3 - c.py"]}
@@ -0,0 +1,50 @@
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import script_runner
+from script_runner import kill_process_tree, run_process
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+
+
+def limit_slots(monkeypatch, total, **per_interpreter):
+    monkeypatch.setattr(script_runner, "SCRIPT_MAX_CONCURRENCY", total)
+    monkeypatch.setattr(script_runner, "_global_slots", None)
+    monkeypatch.setattr(script_runner, "_interpreter_slots", {})
+    for interpreter, limit in per_interpreter.items():
+        monkeypatch.setenv(f"SCRIPT_MAX_CONCURRENCY_{interpreter.upper()}", str(limit))
+
+
+def test_interpreter_limit_does_not_starve_other_interpreters(monkeypatch):
+    limit_slots(monkeypatch, 2, powershell=1)
+
+    async def scenario():
+        powershell = [asyncio.create_task(run_process(SLEEP, "powershell")) for _ in range(3)]
+        await asyncio.sleep(0)
+        python = await run_process(SLEEP, "python")
+        return await asyncio.gather(*powershell), python
+
+    powershell, python = asyncio.run(scenario())
+    # Queued .ps1 scripts wait on their own limit, not on a global slot.
+    assert python["QueueWait"] < 0.2
+    waits = sorted(r["QueueWait"] for r in powershell)
+    assert waits[1] >= 0.25 and waits[2] >= 0.55
+
+
+def test_global_limit_caps_all_interpreters(monkeypatch):
+    limit_slots(monkeypatch, 2)
+
+    async def scenario():
+        return await asyncio.gather(*(run_process(SLEEP, name) for name in ("python", "node", "powershell")))
+
+    waits = sorted(r["QueueWait"] for r in asyncio.run(scenario()))
+    assert waits[1] < 0.2 and waits[2] >= 0.25
+
+
+def test_kill_process_tree_tolerates_a_process_that_already_exited(monkeypatch):
+    def gone(*args):
+        raise ProcessLookupError()
+
+    monkeypatch.setattr(script_runner.os, "killpg", gone)
+    kill_process_tree(SimpleNamespace(returncode=None, pid=1 << 22, kill=gone))
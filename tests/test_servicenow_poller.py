@@ -0,0 +1,135 @@
+import re
+import asyncio
+from types import SimpleNamespace
+
+import main
+import servicenow_poller
+from servicenow_poller import ServiceNowPoller
+
+
+class FakeResponse:
+    def __init__(self, result):
+        self._result = result
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"result": self._result}
+
+
+class FakeTable:
+    """sc_task rows served with the >= watermark filter, ordering and paging of the Table API."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = []
+
+    async def request(self, method, path, operation=None, params=None):
+        self.requests.append(params)
+        since = re.search(r"sys_updated_on>=([^^]+)", params["sysparm_query"]).group(1)
+        matching = sorted((r for r in self.rows if r["sys_updated_on"] >= since), key=lambda r: r["sys_updated_on"])
+        offset, limit = int(params["sysparm_offset"]), int(params["sysparm_limit"])
+        return FakeResponse(matching[offset:offset + limit])
+
+
+class FakeRegistry:
+    loaded = True
+
+    def assignment_groups(self):
+        return ["grp"]
+
+    def lookup(self, short_description):
+        return {"flow_name": "TestFlow"} if short_description == "Test" else None
+
+
+def row(number, updated_on, short_description="Test"):
+    return {"sys_id": f"id-{number}", "number": number, "sys_updated_on": updated_on, "short_description": short_description}
+
+
+def make_poller(monkeypatch, tmp_path, rows, page_size=2):
+    table = FakeTable(rows)
+    monkeypatch.setattr(servicenow_poller, "get_servicenow_client", lambda: table)
+    monkeypatch.setattr(servicenow_poller, "get_flow_registry", lambda: FakeRegistry())
+    runs = []
+
+    async def run_job(thread_id, task_response, **options):
+        runs.append((thread_id, options))
+        return {}
+
+    poller = ServiceNowPoller(run_job, page_size=page_size, db_path=str(tmp_path / "poller.sqlite"))
+    return poller, table, runs
+
+
+def test_poll_pages_through_all_changes_and_runs_only_tickets_with_a_flow(monkeypatch, tmp_path):
+    rows = [row(f"T{i}", f"2026-01-01 00:00:0{i}") for i in range(5)] + [row("X", "2026-01-01 00:00:09", "Other")]
+    poller, table, runs = make_poller(monkeypatch, tmp_path, rows)
+
+    async def scenario():
+        try:
+            return await poller.poll_once()
+        finally:
+            await poller.stop()
+
+    result = asyncio.run(scenario())
+    assert [p["sysparm_offset"] for p in table.requests] == ["0", "2", "4", "6"]
+    assert result == {"fetched": 6, "dispatched": 5, "watermark": "2026-01-01 00:00:09"}
+    assert sorted(t for t, _ in runs) == [f"task_T{i}" for i in range(5)]
+
+
+def test_ties_at_the_watermark_run_once_and_survive_a_restart(monkeypatch, tmp_path):
+    rows = [row("A", "2026-01-01 00:00:05"), row("B", "2026-01-01 00:00:05")]
+    poller, table, runs = make_poller(monkeypatch, tmp_path, rows)
+
+    async def scenario():
+        await poller.poll_once()
+        await poller.poll_once()
+        await poller.stop()
+        rows.append(row("C", "2026-01-01 00:00:05"))
+        reloaded, _, later_runs = make_poller(monkeypatch, tmp_path, rows)
+        await reloaded.open()
+        state = (reloaded.watermark, set(reloaded.seen))
+        await reloaded.poll_once()
+        await reloaded.stop()
+        return state, later_runs
+
+    (watermark, seen), later_runs = asyncio.run(scenario())
+    assert sorted(t for t, _ in runs) == ["task_A", "task_B"]
+    assert (watermark, seen) == ("2026-01-01 00:00:05", {"id-A", "id-B"})
+    assert [t for t, _ in later_runs] == ["task_C"]
+
+
+def test_reopened_ticket_is_dispatched_again_with_rerun_completed(monkeypatch, tmp_path):
+    rows = [row("A", "2026-01-01 00:00:05")]
+    poller, table, runs = make_poller(monkeypatch, tmp_path, rows)
+
+    async def scenario():
+        await poller.poll_once()
+        rows[0] = row("A", "2026-01-02 00:00:00")
+        await poller.poll_once()
+        await poller.stop()
+
+    asyncio.run(scenario())
+    assert runs == [("task_A", {"rerun_completed": True})] * 2
+
+
+def test_plan_run_starts_a_completed_thread_over_only_when_asked(monkeypatch):
+    snapshots = {
+        "done": SimpleNamespace(values={"flow_name": "TestFlow", "error_occurred": False}, next=()),
+        "interrupted": SimpleNamespace(values={"flow_name": "TestFlow"}, next=("execute_actions",)),
+        "failed": SimpleNamespace(values={"flow_name": "TestFlow", "error_occurred": True}, next=()),
+    }
+
+    async def aget_state(config):
+        return snapshots[config["configurable"]["thread_id"]]
+
+    monkeypatch.setattr(main, "graph", SimpleNamespace(aget_state=aget_state))
+
+    def plan(thread_id, rerun_completed):
+        config = {"configurable": {"thread_id": thread_id}}
+        return asyncio.run(main.plan_run(config, False, rerun_completed))
+
+    assert plan("done", False)[1] == "completed"
+    assert plan("done", True) == ({"resume": False}, "run")
+    assert plan("interrupted", True) == (None, "resumed")
+    assert plan("failed", True) == ({"resume": True}, "run")
@@ -0,0 +1,68 @@
+import asyncio
+
+import servicenow_writes
+from servicenow_writes import ServiceNowWriteBuffer
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+
+class SlowClient:
+    """Records PATCH bodies and how many were in flight at once."""
+
+    def __init__(self, on_first_response=None):
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.on_first_response = on_first_response
+
+    async def patch_record(self, table_name, sys_id, body):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.bodies.append(body)
+        self.in_flight -= 1
+        if self.on_first_response is not None:
+            # Runs before any flusher waiting on the record lock wakes up.
+            asyncio.get_running_loop().call_soon(self.on_first_response)
+            self.on_first_response = None
+        return FakeResponse()
+
+
+def test_staged_updates_coalesce_into_one_patch(monkeypatch):
+    client = SlowClient()
+    monkeypatch.setattr(servicenow_writes, "get_servicenow_client", lambda: client)
+    buffer = ServiceNowWriteBuffer(consolidate_worknotes=False)
+
+    async def scenario():
+        buffer.stage("sc_task", "1", state="2", work_notes="a")
+        buffer.stage("sc_task", "1", state="3", work_notes="b")
+        assert await buffer.flush("sc_task", "1")
+        assert not await buffer.flush("sc_task", "1")
+
+    asyncio.run(scenario())
+    assert client.bodies == [{"state": "3", "work_notes": "a\n\nb"}]
+
+
+def test_one_patch_in_flight_per_record_while_flushers_wait(monkeypatch):
+    buffer = ServiceNowWriteBuffer(consolidate_worknotes=False)
+    client = SlowClient(on_first_response=lambda: buffer.stage("sc_task", "1", state="2"))
+    monkeypatch.setattr(servicenow_writes, "get_servicenow_client", lambda: client)
+
+    async def scenario():
+        buffer.stage("sc_task", "1", state="1")
+        first = asyncio.create_task(buffer.flush("sc_task", "1"))
+        await asyncio.sleep(0)
+        # Waits on the record lock with nothing staged yet; picks up state=2.
+        second = asyncio.create_task(buffer.flush("sc_task", "1"))
+        await first
+        buffer.stage("sc_task", "1", state="3")
+        third = asyncio.create_task(buffer.flush("sc_task", "1"))
+        assert await asyncio.gather(second, third) == [True, True]
+
+    asyncio.run(scenario())
+    assert client.max_in_flight == 1
+    assert client.bodies == [{"state": "1"}, {"state": "2"}, {"state": "3"}]
+    assert buffer._locks == {}
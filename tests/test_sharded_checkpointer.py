@@ -0,0 +1,58 @@
+import asyncio
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from sharded_checkpointer import ShardedSqliteSaver, close_checkpointer, open_checkpointer
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+async def _fill(saver, threads):
+    for thread_id in threads:
+        await saver.aput(_config(thread_id), empty_checkpoint(), {"source": "input", "step": -1}, {})
+
+
+def test_threads_route_to_one_stable_shard_and_list_merges_newest_first(tmp_path):
+    threads = [f"task_SC{i}" for i in range(12)]
+
+    async def scenario():
+        saver = await open_checkpointer(str(tmp_path / "state.sqlite"), shards=3)
+        assert isinstance(saver, ShardedSqliteSaver)
+        try:
+            await _fill(saver, threads)
+            for thread_id in threads:
+                owner = saver.shard_for(thread_id)
+                for shard in saver.shards:
+                    found = await shard.aget_tuple(_config(thread_id))
+                    assert (found is not None) == (shard is owner)
+            assert len({id(saver.shard_for(t)) for t in threads}) > 1
+
+            everything = [t async for t in saver.alist(None)]
+            # Sync list() is called off the event loop thread, as LangGraph does.
+            listed = await asyncio.to_thread(lambda: list(saver.list(None)))
+            limited = await asyncio.to_thread(lambda: list(saver.list(None, limit=5)))
+            one = await asyncio.to_thread(lambda: list(saver.list(_config(threads[0]))))
+            return everything, listed, limited, one
+        finally:
+            await close_checkpointer(saver)
+
+    everything, listed, limited, one = asyncio.run(scenario())
+    ids = [t.config["configurable"]["checkpoint_id"] for t in everything]
+    assert len(ids) == len(threads) and ids == sorted(ids, reverse=True)
+    assert [t.config["configurable"]["checkpoint_id"] for t in listed] == ids
+    assert [t.config["configurable"]["checkpoint_id"] for t in limited] == ids[:5]
+    assert [t.config["configurable"]["thread_id"] for t in one] == [threads[0]]
+
+
+def test_close_checkpointer_closes_every_connection(tmp_path):
+    async def scenario():
+        single = await open_checkpointer(str(tmp_path / "single.sqlite"), shards=1)
+        sharded = await open_checkpointer(str(tmp_path / "sharded.sqlite"), shards=2)
+        await close_checkpointer(single)
+        await close_checkpointer(sharded)
+        return [single.conn] + [shard.conn for shard in sharded.shards]
+
+    for conn in asyncio.run(scenario()):
+        assert conn._connection is None
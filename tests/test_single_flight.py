@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+import main
+import single_flight
+from single_flight import SingleFlight
+
+
+class CountingRun:
+    def __init__(self, delay=0.01, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"run": self.calls}
+
+
+def test_concurrent_submissions_share_one_run():
+    flight = SingleFlight(window=0)
+    run = CountingRun()
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("task_S1", run) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert run.calls == 1
+    assert results == [{"run": 1}] * 5
+    assert not flight.in_flight("task_S1")
+
+
+def test_other_threads_are_not_collapsed():
+    flight = SingleFlight(window=0)
+    run = CountingRun()
+
+    async def scenario():
+        await asyncio.gather(flight.run("task_S1", run), flight.run("task_S2", run))
+
+    asyncio.run(scenario())
+    assert run.calls == 2
+
+
+def test_finished_run_answers_within_the_window_until_forgotten_or_expired(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(single_flight.time, "monotonic", lambda: now[0])
+    flight = SingleFlight(window=5)
+    run = CountingRun(delay=0)
+
+    async def scenario():
+        await flight.run("task_S1", run)
+        now[0] += 4
+        recent = await flight.run("task_S1", run)
+        flight.forget("task_S1")
+        await flight.run("task_S1", run)
+        now[0] += 6
+        expired = await flight.run("task_S1", run)
+        return recent, expired
+
+    recent, expired = asyncio.run(scenario())
+    assert recent == {"run": 1}
+    assert expired == {"run": 3}
+    assert run.calls == 3
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight(window=5)
+    failing = CountingRun(error=RuntimeError("boom"))
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.run("task_S1", failing) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.run("task_S1", failing)
+        return results
+
+    results = asyncio.run(scenario())
+    assert [type(r) for r in results] == [RuntimeError] * 3
+    assert failing.calls == 2
+
+
+def test_waiter_starts_again_when_the_leader_is_cancelled():
+    flight = SingleFlight(window=0)
+    run = CountingRun(delay=0.05)
+
+    async def scenario():
+        leader = asyncio.create_task(flight.run("task_S1", run))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run("task_S1", run))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == {"run": 2}
+    assert run.calls == 2
+
+
+def test_run_flow_deduplicates_submissions_but_not_restarts(monkeypatch):
+    flight = SingleFlight(window=5)
+    invocations = []
+
+    async def invoke_flow(thread_id, task_response, callbacks, trace, profile, restart, rerun_completed, captured):
+        invocations.append((restart, rerun_completed))
+        await asyncio.sleep(0.01)
+        return {"runs": len(invocations)}
+
+    monkeypatch.setattr(main, "get_single_flight", lambda: flight)
+    monkeypatch.setattr(main, "invoke_flow", invoke_flow)
+
+    async def scenario():
+        await asyncio.gather(*(main.run_flow("task_S1", {}) for _ in range(3)))
+        await main.run_flow("task_S1", {})
+        await main.run_flow("task_S1", {}, restart=True)
+        await main.run_flow("task_S1", {}, rerun_completed=True)
+
+    asyncio.run(scenario())
+    assert invocations == [(False, False), (True, False), (False, True)]
+
+
+def test_run_flow_does_not_remember_a_failed_run(monkeypatch):
+    flight = SingleFlight(window=5)
+    invocations = []
+
+    async def invoke_flow(thread_id, task_response, callbacks, trace, profile, restart, rerun_completed, captured):
+        invocations.append(thread_id)
+        return {"error_occurred": len(invocations) == 1}
+
+    monkeypatch.setattr(main, "get_single_flight", lambda: flight)
+    monkeypatch.setattr(main, "invoke_flow", invoke_flow)
+
+    async def scenario():
+        failed = await main.run_flow("task_S1", {})
+        resumed = await main.run_flow("task_S1", {})
+        remembered = await main.run_flow("task_S1", {})
+        return failed, resumed, remembered
+
+    failed, resumed, remembered = asyncio.run(scenario())
+    assert failed["error_occurred"] and not resumed["error_occurred"]
+    assert remembered is resumed
+    assert len(invocations) == 2
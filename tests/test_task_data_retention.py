@@ -0,0 +1,75 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import execution_log
+import task_store
+from checkpoint_maintenance import CheckpointMaintenance
+from execution_log import ExecutionLogStore
+from task_store import TaskBlobStore
+
+
+class FakeGraph:
+    """aget_state() for threads: the ones in `active` are mid-run."""
+
+    def __init__(self, refs, active):
+        self.refs = refs
+        self.active = active
+
+    async def aget_state(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        next_nodes = ("execute_flow_script",) if thread_id in self.active else ()
+        return SimpleNamespace(next=next_nodes, values={"task_ref": self.refs[thread_id]})
+
+
+def test_expired_runs_and_payloads_are_pruned_except_mid_run_threads(tmp_path, monkeypatch):
+    log = ExecutionLogStore(db_path=str(tmp_path / "log.sqlite"), flush_interval=0)
+    blobs = TaskBlobStore(db_path=str(tmp_path / "blobs.sqlite"))
+    monkeypatch.setattr(execution_log, "_store", log)
+    monkeypatch.setattr(task_store, "_store", blobs)
+
+    async def scenario():
+        await log.start()
+        refs = {}
+        for thread_id in ("task_done", "task_active"):
+            refs[thread_id] = await blobs.put({"result": [{"number": thread_id}]})
+            log.append(thread_id, "run1", [{"action": "update_ticket_state"}, {"script": "1 - step.py"}])
+        maintenance = CheckpointMaintenance(object(), FakeGraph(refs, active={"task_active"}))
+
+        kept = await maintenance.prune_task_data(max_age_seconds=3600)
+        await asyncio.sleep(0.01)
+        pruned = await maintenance.prune_task_data(max_age_seconds=0)
+
+        done_log = await log.read("task_done", "run1")
+        active_log = await log.read("task_active", "run1")
+        active_blob = await blobs.get(refs["task_active"])
+        try:
+            await blobs.get(refs["task_done"])
+            done_blob = True
+        except KeyError:
+            done_blob = False
+        await log.stop()
+        await blobs.close()
+        return kept, pruned, done_log, active_log, active_blob, done_blob
+
+    kept, pruned, done_log, active_log, active_blob, done_blob = asyncio.run(scenario())
+    assert kept == {"log_rows": 0, "task_blobs": 0}
+    assert pruned == {"log_rows": 2, "task_blobs": 1}
+    assert done_log["entries"] == [] and not done_blob
+    assert len(active_log["entries"]) == 2
+    assert active_blob == {"result": [{"number": "task_active"}]}
+
+
+def test_resubmitting_a_payload_restamps_it(tmp_path):
+    blobs = TaskBlobStore(db_path=str(tmp_path / "blobs.sqlite"))
+
+    async def scenario():
+        ref = await blobs.put({"result": [{"number": "SC1"}]})
+        cutoff = time.time()
+        await asyncio.sleep(0.01)
+        assert await blobs.put({"result": [{"number": "SC1"}]}) == ref
+        removed = await blobs.prune(cutoff)
+        await blobs.close()
+        return removed
+
+    assert asyncio.run(scenario()) == 0
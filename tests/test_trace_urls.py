@@ -0,0 +1,55 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import main
+from single_flight import SingleFlight
+
+TASK = {"result": [{"number": "S1", "sys_id": "abc", "short_description": "Test"}]}
+
+
+class FakeGraph:
+    """Runs once, slowly enough for a second request to join; the thread is completed afterwards."""
+
+    def __init__(self):
+        self.snapshot = SimpleNamespace(values={}, next=())
+
+    async def aget_state(self, config):
+        return self.snapshot
+
+    async def ainvoke(self, graph_input, config=None):
+        await asyncio.sleep(0.05)
+        final_state = {"flow_name": "TestFlow", "error_occurred": False, "run_id": "r1"}
+        self.snapshot = SimpleNamespace(values=final_state, next=())
+        return final_state
+
+
+class FakeLog:
+    async def read(self, thread_id, run_id, limit=None):
+        return {"entries": []}
+
+
+class FakeTaskStore:
+    async def put(self, task_response):
+        return "ref"
+
+
+def test_trace_url_only_for_the_request_that_ran_the_graph(monkeypatch):
+    monkeypatch.setattr(main, "graph", FakeGraph())
+    flight = SingleFlight(window=0)
+    monkeypatch.setattr(main, "get_single_flight", lambda: flight)
+    monkeypatch.setattr(main, "get_execution_log", lambda: FakeLog())
+    monkeypatch.setattr(main, "get_task_store", lambda: FakeTaskStore())
+
+    def request():
+        return main.execute_flow(task_response=TASK, mode="sync", trace=True, profile=True, restart=False, x_trace=None, x_profile=None)
+
+    async def scenario():
+        leader, joined = await asyncio.gather(request(), request())
+        completed = await request()
+        return [json.loads(r.body) for r in (leader, joined, completed)]
+
+    leader, joined, completed = asyncio.run(scenario())
+    assert (leader["trace_url"], leader["profile_url"]) == ("/api/task/task_S1/trace", "/api/task/task_S1/profile")
+    assert "trace_url" not in joined and "profile_url" not in joined
+    assert "trace_url" not in completed and "profile_url" not in completed
@@ -0,0 +1,230 @@
+"""
+Per-ticket span tracing and on-demand sampling profiles of graph runs.
+
+A traced run binds a Trace to a context variable; graph nodes, action
+scripts and ServiceNow calls open spans on it, and child asyncio tasks
+(LangGraph's parallel branches) inherit it. Untraced runs see None, so a
+span costs one ContextVar lookup. The finished trace is kept per thread_id
+and exported as Chrome trace-event JSON (chrome://tracing, Perfetto).
+
+Profiles come from a stdlib sampler thread that records the event loop
+thread's stack every PROFILE_INTERVAL_SECONDS and emits collapsed stacks
+("frame;frame;frame count" lines, readable by flamegraph.pl and speedscope).
+The loop is shared, so a profile also contains whatever other tickets ran
+concurrently; profile a ticket on an idle instance for a clean picture.
+"""
+import os
+import sys
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# -----------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------
+load_dotenv()
+# Trace every run, not only those requested with ?trace=true / X-Trace.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_RETENTION = int(os.getenv("TRACE_RETENTION", "200"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+# -----------------------------------------------------------------------
+# Spans
+# -----------------------------------------------------------------------
+class Trace:
+    """Chrome trace events of one run. Each asyncio task gets its own lane (tid)."""
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.origin = time.perf_counter()
+        self.events: List[dict] = []
+        self._lanes: Dict[int, int] = {}
+
+    def lane(self) -> int:
+        task = asyncio.current_task()
+        key = id(task) if task is not None else 0
+        if key not in self._lanes:
+            self._lanes[key] = len(self._lanes) + 1
+        return self._lanes[key]
+
+    def add(self, name: str, cat: str, started: float, finished: float, tid: int, args: dict) -> None:
+        self.events.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((started - self.origin) * 1e6, 1),
+            "dur": round((finished - started) * 1e6, 1),
+            "pid": 1,
+            "tid": tid,
+            "args": args,
+        })
+
+    def to_chrome(self) -> dict:
+        lanes = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": f"task {tid}"}}
+            for tid in self._lanes.values()
+        ]
+        return {
+            "traceEvents": [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.thread_id}}] + lanes + self.events,
+            "displayTimeUnit": "ms",
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "cat", "args", "started", "tid")
+
+    def __init__(self, trace: Trace, name: str, cat: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.tid = self.trace.lane()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.trace.add(self.name, self.cat, self.started, time.perf_counter(), self.tid, self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, cat: str = "", **args):
+    """Context manager timing a block on the current run's trace; a no-op when untraced."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, cat, args)
+
+
+def traced_node(function: Callable) -> Callable:
+    """Wrap an async graph node in a span named after the function."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return await function(*args, **kwargs)
+        with _Span(trace, name, "node", {}):
+            return await function(*args, **kwargs)
+
+    return wrapper
+
+
+# -----------------------------------------------------------------------
+# Sampling Profiler
+# -----------------------------------------------------------------------
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+# -----------------------------------------------------------------------
+# Per-thread Capture Store
+# -----------------------------------------------------------------------
+_captures: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def _store(thread_id: str, key: str, value) -> None:
+    capture = _captures.setdefault(thread_id, {})
+    capture[key] = value
+    _captures.move_to_end(thread_id)
+    while len(_captures) > TRACE_RETENTION:
+        _captures.popitem(last=False)
+
+
+def get_trace(thread_id: str) -> Optional[dict]:
+    """Chrome trace-event JSON of the last traced run of `thread_id`."""
+    trace = _captures.get(thread_id, {}).get("trace")
+    return trace.to_chrome() if trace is not None else None
+
+
+def get_profile(thread_id: str) -> Optional[SamplingProfiler]:
+    return _captures.get(thread_id, {}).get("profile")
+
+
+class capture_run:
+    """
+    Async context manager around one graph invocation: binds a Trace when
+    `trace` (or TRACING_ENABLED) is set and runs the sampler when `profile`
+    is set. Results are stored under thread_id when the block exits.
+    """
+
+    def __init__(self, thread_id: str, trace: bool = False, profile: bool = False):
+        self.thread_id = thread_id
+        self.trace = Trace(thread_id) if (trace or TRACING_ENABLED) else None
+        self.profiler = SamplingProfiler() if profile else None
+        self._token = None
+
+    async def __aenter__(self):
+        if self.trace is not None:
+            self._token = _current_trace.set(self.trace)
+        if self.profiler is not None:
+            self.profiler.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            _store(self.thread_id, "profile", self.profiler.stop())
+        if self.trace is not None:
+            _current_trace.reset(self._token)
+            _store(self.thread_id, "trace", self.trace)
+        return False